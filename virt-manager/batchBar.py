@@ -0,0 +1,53 @@
+from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtWidgets import QWidget, QHBoxLayout, QLabel, QPushButton, \
+    QProgressBar, QSizePolicy
+from functools import partial
+
+BATCH_BUTTONS = (("boot", "Boot"), ("shutdown", "Shut down"),
+                 ("forceShutdown", "Force off"), ("suspend", "Suspend"),
+                 ("resume", "Resume"))
+
+
+class BatchActionBar(QWidget):
+    actionRequested = pyqtSignal(str)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.mainLayout = QHBoxLayout()
+        self.mainLayout.setContentsMargins(0, 0, 0, 0)
+        self.mainLayout.addWidget(QLabel("Selected:"))
+
+        self.buttons: list[QPushButton] = []
+        for action, text in BATCH_BUTTONS:
+            button = QPushButton(text)
+            button.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+            button.clicked.connect(partial(self.actionRequested.emit, action))
+            self.mainLayout.addWidget(button)
+            self.buttons.append(button)
+
+        self.progressBar = QProgressBar()
+        self.progressBar.setVisible(False)
+        self.statusLabel = QLabel()
+        self.mainLayout.addWidget(self.progressBar)
+        self.mainLayout.addWidget(self.statusLabel)
+        self.mainLayout.addStretch()
+        self.setLayout(self.mainLayout)
+
+    def startBatch(self, total: int) -> None:
+        for button in self.buttons:
+            button.setEnabled(False)
+        self.progressBar.setRange(0, total)
+        self.progressBar.setValue(0)
+        self.progressBar.setVisible(True)
+        self.statusLabel.setText("0/{}".format(total))
+
+    def setProgress(self, done: int, total: int, result) -> None:
+        self.progressBar.setValue(done)
+        self.statusLabel.setText("{}/{}".format(done, total))
+
+    def finishBatch(self, total: int, failed: int) -> None:
+        for button in self.buttons:
+            button.setEnabled(True)
+        self.progressBar.setVisible(False)
+        self.statusLabel.setText("{} done, {} failed".format(total - failed,
+                                                             failed))
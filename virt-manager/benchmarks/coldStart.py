@@ -0,0 +1,63 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Builds the launch window and quits as soon as the event loop is idle.
+GUI_SNIPPET = """
+import os, sys
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QApplication
+from launchWindow import LaunchWindow
+from resourceCache import preloadResources
+app = QApplication(sys.argv)
+preloadResources()
+window = LaunchWindow()
+QTimer.singleShot(0, app.quit)
+app.exec_()
+"""
+
+QT_CHECK_SNIPPET = "import sys, virtctl; print('PyQt5' in sys.modules)"
+
+
+def timeProcess(command: list[str], runs: int) -> list[float]:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=APP_DIR, check=True,
+                       stdout=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare cold-start time of the GUI and the CLI.")
+    parser.add_argument("--uri", default="test:///default")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    qtLoaded = subprocess.run([sys.executable, "-c", QT_CHECK_SNIPPET],
+                              cwd=APP_DIR, check=True, capture_output=True,
+                              text=True).stdout.strip()
+    print("virtctl imports PyQt5: {}".format(qtLoaded))
+
+    commands = (("python -c pass", [sys.executable, "-c", "pass"]),
+                ("virtctl --help", [sys.executable, "-m", "virtctl",
+                                    "--help"]),
+                ("virtctl list", [sys.executable, "-m", "virtctl", "list",
+                                  "--uri", args.uri]),
+                ("gui launch window", [sys.executable, "-c", GUI_SNIPPET]))
+    for label, command in commands:
+        samples = timeProcess(command, args.runs)
+        print("{}: median {:.0f} ms, min {:.0f} ms".format(
+            label, statistics.median(samples) * 1000, min(samples) * 1000))
+
+
+if __name__ == "__main__":
+    main()
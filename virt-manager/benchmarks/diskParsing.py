@@ -0,0 +1,80 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libvirtUtils import DomainDescription
+from xml.etree.ElementTree import fromstring, tostring
+import argparse
+import string
+import timeit
+
+DISK_XML_TEMPLATE = """    <disk type='file' device='disk'>
+      <driver name='qemu' type='qcow2'/>
+      <source file='/var/lib/libvirt/images/bench-{0}.qcow2'/>
+      <target dev='{0}' bus='virtio'/>
+    </disk>
+"""
+
+
+def targetName(idx: int) -> str:
+    suffix = ""
+    idx += 1
+    while idx > 0:
+        idx, remainder = divmod(idx - 1, 26)
+        suffix = string.ascii_lowercase[remainder] + suffix
+    return "vd" + suffix
+
+
+def domainXml(diskCount: int) -> str:
+    disks = "".join(DISK_XML_TEMPLATE.format(targetName(idx))
+                    for idx in range(diskCount))
+    return """<domain type='kvm'>
+  <name>bench</name>
+  <devices>
+    <emulator>/usr/bin/qemu-system-x86_64</emulator>
+{}    <interface type='network'>
+      <source network='default'/>
+      <target dev='vnet0'/>
+    </interface>
+  </devices>
+</domain>""".format(disks)
+
+
+def legacyDiskXml(xml: str) -> list[tuple[str, str]]:
+    # The per-disk XPath lookup getALlDiskInfo used before the index.
+    domainTree = fromstring(xml)
+    diskNames = [disk.attrib['dev'] for disk
+                 in domainTree.findall(".//disk[@device='disk']/target")]
+    return [(name, tostring(domainTree.find(
+        ".//disk[@device='disk']/target[@dev='{}']/..".format(name)),
+        encoding="unicode")) for name in diskNames]
+
+
+def indexedDiskXml(xml: str) -> list[tuple[str, str]]:
+    return [(diskInfo.name, diskInfo.xml)
+            for diskInfo in DomainDescription(xml).allDiskInfo()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare legacy and indexed disk enumeration.")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--disks", type=int, nargs="*",
+                        default=[1, 8, 64, 128, 256, 512])
+    args = parser.parse_args()
+
+    print("disks  legacy(ms)  indexed(ms)")
+    for diskCount in args.disks:
+        xml = domainXml(diskCount)
+        assert legacyDiskXml(xml) == indexedDiskXml(xml)
+        legacy = timeit.timeit(lambda: legacyDiskXml(xml),
+                               number=args.repeat) / args.repeat
+        indexed = timeit.timeit(lambda: indexedDiskXml(xml),
+                                number=args.repeat) / args.repeat
+        print("{:5d}  {:10.3f}  {:11.3f}".format(diskCount, legacy * 1000,
+                                                 indexed * 1000))
+
+
+if __name__ == "__main__":
+    main()
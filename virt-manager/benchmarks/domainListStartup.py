@@ -0,0 +1,58 @@
+from fleet import writeNodeXml
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ("table", "widgets")
+
+
+def runMode(mode: str, uri: str) -> None:
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    from mainWindow import MainWindow
+
+    app = QApplication(sys.argv)
+    start = time.perf_counter()
+    threshold = 0 if mode == "table" else sys.maxsize
+    window = MainWindow(uri, tableViewThreshold=threshold)
+    while not window.domainsSynced:
+        app.processEvents()
+    app.processEvents()
+    elapsed = time.perf_counter() - start
+    maxRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print("{}: startup {:.2f}s, max RSS {:.1f}MB".format(mode, elapsed,
+                                                        maxRss / 1024))
+    window.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure MainWindow startup time and RSS for a large "
+                    "test:/// fleet.")
+    parser.add_argument("--domains", type=int, default=10000)
+    parser.add_argument("--mode", choices=MODES + ("both",), default="both")
+    parser.add_argument("--uri", help="reuse an existing fixture URI")
+    args = parser.parse_args()
+
+    if args.uri is not None:
+        if args.mode == "both":
+            parser.error("--uri needs a single --mode")
+        runMode(args.mode, args.uri)
+        return
+
+    with tempfile.TemporaryDirectory() as fixtureDir:
+        uri = writeNodeXml(os.path.join(fixtureDir, "fleet.xml"),
+                           args.domains)
+        modes = MODES if args.mode == "both" else (args.mode,)
+        # Each mode runs in its own process so max RSS is not shared.
+        for mode in modes:
+            subprocess.run([sys.executable, os.path.abspath(__file__),
+                            "--mode", mode, "--uri", uri], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+from fleet import writeNodeXml
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ("table", "widgets")
+
+
+def domainRowCount(window) -> int:
+    if window.domainModel is not None:
+        return window.domainModel.rowCount()
+    return len(window.registry)
+
+
+def runOnce(mode: str, uri: str) -> None:
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    from mainWindow import MainWindow
+
+    app = QApplication(sys.argv)
+    start = time.perf_counter()
+    threshold = 0 if mode == "table" else sys.maxsize
+    window = MainWindow(uri, tableViewThreshold=threshold)
+    firstPaint = None
+    while not window.domainsSynced:
+        app.processEvents()
+        if firstPaint is None and domainRowCount(window) != 0:
+            firstPaint = time.perf_counter() - start
+    app.processEvents()
+    synced = time.perf_counter() - start
+    if firstPaint is None:
+        firstPaint = synced
+    print("first paint {:.3f}s, synced {:.3f}s".format(firstPaint, synced))
+    # Closing writes the snapshot cache for the next run.
+    window.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure time to the first painted domain list with a "
+                    "cold and a warm snapshot cache.")
+    parser.add_argument("--domains", type=int, default=2000)
+    parser.add_argument("--mode", choices=MODES, default="table")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--uri", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.uri is not None:
+        runOnce(args.mode, args.uri)
+        return
+
+    with tempfile.TemporaryDirectory() as fixtureDir:
+        uri = writeNodeXml(os.path.join(fixtureDir, "fleet.xml"),
+                           args.domains)
+        command = [sys.executable, os.path.abspath(__file__),
+                   "--mode", args.mode, "--uri", uri]
+        for run in range(args.runs):
+            cacheDir = os.path.join(fixtureDir, "cache-{}".format(run))
+            env = dict(os.environ, VIRTMANAGER_CACHE_DIR=cacheDir)
+            # Each run gets its own cache: empty first, then the one the
+            # cold run left behind.
+            for label in ("cold", "warm"):
+                print("{} cache, run {}: ".format(label, run + 1), end="",
+                      flush=True)
+                subprocess.run(command, env=env, check=True)
+
+
+if __name__ == "__main__":
+    main()
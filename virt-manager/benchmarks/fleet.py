@@ -0,0 +1,80 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import libvirt
+
+DOMAIN_XML_TEMPLATE = """<domain type='test'>
+  <name>{}</name>
+  <memory unit='KiB'>{}</memory>
+  <currentMemory unit='KiB'>{}</currentMemory>
+  <vcpu>{}</vcpu>
+  <os>
+    <type arch='x86_64'>hvm</type>
+  </os>
+</domain>"""
+
+
+def domainXml(name: str, memory: int = 1048576, vcpuCount: int = 2) -> str:
+    return DOMAIN_XML_TEMPLATE.format(name, memory, memory, vcpuCount)
+
+
+def defineFleet(conn: libvirt.virConnect, domainCount: int,
+                runningRatio: float = 0.5) -> list[libvirt.virDomain]:
+    domains = []
+    runningCount = int(domainCount * runningRatio)
+    for idx in range(domainCount):
+        domain = conn.defineXML(domainXml("bench-{:05d}".format(idx)))
+        if idx < runningCount:
+            domain.create()
+        domains.append(domain)
+    return domains
+
+
+NODE_DOMAIN_TEMPLATE = """  <domain type='test' xmlns:test='http://libvirt.org/schemas/domain/test'>
+    <name>{}</name>
+    <memory unit='KiB'>{}</memory>
+    <vcpu>{}</vcpu>
+    <os>
+      <type arch='x86_64'>hvm</type>
+    </os>
+    <devices>
+{}    </devices>
+    <test:runstate>{}</test:runstate>
+  </domain>
+"""
+
+NODE_DISK_TEMPLATE = """      <disk type='file' device='disk'>
+        <source file='/var/lib/libvirt/images/{0}-{1}.qcow2'/>
+        <target dev='{1}' bus='virtio'/>
+      </disk>
+"""
+
+
+def diskTarget(idx: int) -> str:
+    # vda, ..., vdz, vdaa, ...
+    suffix = ""
+    idx += 1
+    while idx > 0:
+        idx, remainder = divmod(idx - 1, 26)
+        suffix = chr(ord("a") + remainder) + suffix
+    return "vd" + suffix
+
+
+def writeNodeXml(path: str, domainCount: int, runningRatio: float = 0.5,
+                 memory: int = 1048576, vcpuCount: int = 2,
+                 diskCount: int = 0) -> str:
+    runningCount = int(domainCount * runningRatio)
+    with open(path, 'w') as nodeXml:
+        nodeXml.write("<node>\n")
+        for idx in range(domainCount):
+            state = libvirt.VIR_DOMAIN_RUNNING if idx < runningCount \
+                else libvirt.VIR_DOMAIN_SHUTOFF
+            name = "bench-{:05d}".format(idx)
+            disks = "".join(NODE_DISK_TEMPLATE.format(name, diskTarget(disk))
+                            for disk in range(diskCount))
+            nodeXml.write(NODE_DOMAIN_TEMPLATE.format(
+                name, memory, vcpuCount, disks, state))
+        nodeXml.write("</node>\n")
+    return "test://" + os.path.abspath(path)
@@ -0,0 +1,45 @@
+from fleet import defineFleet
+from instrumentation import instrument, instrumentation
+from libvirtUtils import DomainStatsRefresher
+import argparse
+import libvirt
+import timeit
+
+
+def legacyTick(conn) -> None:
+    for domain in conn.listAllDomains():
+        domain.info()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare libvirt calls with and without instrumentation.")
+    parser.add_argument("--uri", default="test:///default")
+    parser.add_argument("--domains", type=int, default=200)
+    parser.add_argument("--ticks", type=int, default=50)
+    args = parser.parse_args()
+
+    rawConn = libvirt.open(args.uri)
+    defineFleet(rawConn, args.domains)
+
+    # Disabled instrumentation hands back the connection untouched.
+    instrumentation.enabled = False
+    assert instrument(rawConn, args.uri) is rawConn
+    instrumentation.enabled = True
+    timedConn = instrument(rawConn, args.uri)
+
+    for label, conn in (("disabled", rawConn), ("enabled", timedConn)):
+        refresher = DomainStatsRefresher(conn, args.uri)
+        bulk = timeit.timeit(refresher.refresh, number=args.ticks)
+        perDomain = timeit.timeit(lambda: legacyTick(conn), number=args.ticks)
+        print("{}: refresh() {:.3f} ms/tick, listAllDomains+info() "
+              "{:.3f} ms/tick".format(label, bulk / args.ticks * 1000,
+                                      perDomain / args.ticks * 1000))
+    for line in instrumentation.toPrometheus().splitlines():
+        if "_count" in line:
+            print(line)
+    rawConn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import random
+import resource
+import subprocess
+import tempfile
+import time
+
+MODES = ("table", "widgets")
+PERCENTILES = (50, 95, 99)
+# Every reported number is a cost, so a rise is a regression.
+DEFAULT_THRESHOLD = 10.0
+# Seconds the child waits for the first sync and for each tick before it
+# gives up, so a hung poll fails the run instead of stalling it.
+SYNC_TIMEOUT = 600.0
+TICK_TIMEOUT = 60.0
+
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    if len(samples) == 0:
+        return {}
+    ordered = sorted(samples)
+    summary = {"p{}".format(percent): ordered[min(
+        len(ordered) - 1, (len(ordered) * percent + 99) // 100 - 1)]
+        for percent in PERCENTILES}
+    summary["max"] = ordered[-1]
+    summary["mean"] = sum(ordered) / len(ordered)
+    return summary
+
+
+def currentRssKib() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+    except OSError:
+        return 0
+    return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def rpcCount() -> int:
+    from instrumentation import instrumentation, LIBVIRT_CALL_METRIC
+    return sum(histogram.count
+               for (metric, _, _), histogram in instrumentation.snapshot()
+               if metric == LIBVIRT_CALL_METRIC)
+
+
+def processUntil(app, done, timeout: float, what: str) -> None:
+    deadline = time.perf_counter() + timeout
+    while not done():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("{} took longer than {:.0f}s".format(
+                what, timeout))
+        app.processEvents()
+
+
+class Churner:
+    # Changes guest states through the app's own connection, since every
+    # test:/// connection has a private copy of the fixture; calls go to
+    # the unwrapped connection so they stay out of the RPC counts.
+    def __init__(self, conn, seed: int) -> None:
+        import libvirt
+        from fleet import domainXml
+        from libvirtUtils import bootDomain, suspendDomain, resumeDomain, \
+            forceShutDown, destroyDomain
+        self.conn = conn
+        self.domainXml = domainXml
+        self.rng = random.Random(seed)
+        self.domains = conn.listAllDomains()
+        self.nextIdx = len(self.domains)
+        self.actions = {libvirt.VIR_DOMAIN_RUNNING: (suspendDomain,
+                                                     forceShutDown),
+                        libvirt.VIR_DOMAIN_PAUSED: (resumeDomain,
+                                                    forceShutDown),
+                        libvirt.VIR_DOMAIN_SHUTOFF: (bootDomain,
+                                                     destroyDomain)}
+        self.timings: dict[str, list[float]] = {}
+
+    def churn(self, count: int) -> None:
+        for domain in self.rng.sample(self.domains,
+                                      min(count, len(self.domains))):
+            helpers = self.actions.get(domain.info()[0])
+            if helpers is None:
+                continue
+            helper = self.rng.choice(helpers)
+            start = time.perf_counter()
+            helper(domain)
+            self.timings.setdefault(helper.__name__, []).append(
+                time.perf_counter() - start)
+            if helper.__name__ == "destroyDomain":
+                # Keeps the fleet size steady while the registry churns.
+                self.domains.remove(domain)
+                self.domains.append(self.conn.defineXML(self.domainXml(
+                    "bench-{:05d}".format(self.nextIdx))))
+                self.nextIdx += 1
+
+
+def runChild(args) -> dict:
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from instrumentation import unwrap
+    from libvirtUtils import getALlDiskInfo
+    from PyQt5.QtWidgets import QApplication
+    from mainWindow import MainWindow
+
+    app = QApplication(sys.argv)
+    start = time.perf_counter()
+    threshold = 0 if args.mode == "table" else sys.maxsize
+    window = MainWindow(args.uri, tableViewThreshold=threshold)
+    processUntil(app, lambda: window.domainsSynced, SYNC_TIMEOUT,
+                 "Startup sync")
+    app.processEvents()
+    startup = time.perf_counter() - start
+    # Ticks are driven from here so each one can be timed on its own.
+    window.timer.stop()
+
+    conn = unwrap(window.connectionManager.hosts[args.uri].conn)
+    churner = Churner(conn, args.seed)
+    tickSeconds = []
+    tickRpcs = []
+    for _ in range(args.ticks):
+        churner.churn(args.churn)
+        rpcsBefore = rpcCount()
+        tickStart = time.perf_counter()
+        window.requestUpdate()
+        processUntil(app, lambda: not window.pollInFlight, TICK_TIMEOUT,
+                     "A tick")
+        app.processEvents()
+        tickSeconds.append(time.perf_counter() - tickStart)
+        tickRpcs.append(rpcCount() - rpcsBefore)
+
+    diskSeconds = []
+    domains = conn.listAllDomains()
+    for domain in domains[:args.disk_samples]:
+        diskStart = time.perf_counter()
+        getALlDiskInfo(domain)
+        diskSeconds.append(time.perf_counter() - diskStart)
+
+    result = {
+        "startupSeconds": startup,
+        "tickSeconds": percentiles(tickSeconds),
+        "rpcsPerTick": percentiles(tickRpcs),
+        "widgets": len(app.allWidgets()),
+        "rssKib": currentRssKib(),
+        "maxRssKib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "diskInfoSeconds": percentiles(diskSeconds),
+        "lifecycleSeconds": {name: percentiles(samples) for name, samples
+                             in sorted(churner.timings.items())},
+    }
+    window.close()
+    return result
+
+
+def runSuite(args) -> dict:
+    # libvirt is only needed to run, not to compare results.
+    from fleet import writeNodeXml
+    config = {"domains": args.domains, "disks": args.disks,
+              "churn": args.churn, "ticks": args.ticks,
+              "runningRatio": args.running_ratio, "seed": args.seed}
+    results = {"config": config, "modes": {}}
+    modes = MODES if args.mode == "both" else (args.mode,)
+    with tempfile.TemporaryDirectory() as fixtureDir:
+        uri = writeNodeXml(os.path.join(fixtureDir, "fleet.xml"),
+                           args.domains, args.running_ratio,
+                           diskCount=args.disks)
+        # One process per mode so RSS and widget counts are not shared; the
+        # cache directory is empty so startup never paints a snapshot, and
+        # instrumentation counts the libvirt calls.
+        env = dict(os.environ, VIRTMANAGER_INSTRUMENT="1",
+                   VIRTMANAGER_CACHE_DIR=os.path.join(fixtureDir, "cache"))
+        for mode in modes:
+            command = [sys.executable, os.path.abspath(__file__), "run",
+                       "--child", "--mode", mode, "--uri", uri,
+                       "--ticks", str(args.ticks),
+                       "--churn", str(args.churn),
+                       "--disk-samples", str(args.disk_samples),
+                       "--seed", str(args.seed)]
+            output = subprocess.run(command, env=env, check=True,
+                                    stdout=subprocess.PIPE, text=True).stdout
+            results["modes"][mode] = json.loads(output)
+    return results
+
+
+def flatten(value, prefix: str = "") -> dict[str, float]:
+    if isinstance(value, dict):
+        flat = {}
+        for key, item in value.items():
+            flat.update(flatten(item, prefix + "." + key if prefix else key))
+        return flat
+    return {prefix: value}
+
+
+def compareRuns(baseline: dict,
+                current: dict) -> list[tuple[str, float, float, float]]:
+    # Returns (metric, baseline, current, change %) for every metric both
+    # runs report.
+    baseMetrics = flatten(baseline["modes"])
+    currentMetrics = flatten(current["modes"])
+    rows = []
+    for metric in sorted(baseMetrics.keys() & currentMetrics.keys()):
+        before = baseMetrics[metric]
+        after = currentMetrics[metric]
+        if before != 0:
+            change = (after - before) * 100 / before
+        else:
+            # Any cost appearing from nothing is a regression.
+            change = float("inf") if after > 0 else 0.0
+        rows.append((metric, before, after, change))
+    return rows
+
+
+def compareCommand(args) -> int:
+    with open(args.baseline) as baselineFile:
+        baseline = json.load(baselineFile)
+    with open(args.current) as currentFile:
+        current = json.load(currentFile)
+    if baseline["config"] != current["config"]:
+        print("warning: runs used different configs: {} vs {}".format(
+            baseline["config"], current["config"]), file=sys.stderr)
+    regressions = 0
+    for metric, before, after, change in compareRuns(baseline, current):
+        regressed = change > args.threshold
+        regressions += regressed
+        print("{:<45} {:>14.6g} {:>14.6g} {:>+8.1f}%{}".format(
+            metric, before, after, change, "  REGRESSION" if regressed
+            else ""))
+    print("{} metric(s) regressed by more than {:.0f}%".format(
+        regressions, args.threshold))
+    return 1 if regressions != 0 else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Load-test MainWindow headlessly against a synthetic "
+                    "test:/// fleet and compare runs for regressions.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    runParser = commands.add_parser("run", help="run the suite and print "
+                                                "JSON results")
+    runParser.add_argument("--domains", type=int, default=1000)
+    runParser.add_argument("--disks", type=int, default=2,
+                           help="disks per domain")
+    runParser.add_argument("--running-ratio", type=float, default=0.5)
+    runParser.add_argument("--churn", type=int, default=20,
+                           help="state changes per tick")
+    runParser.add_argument("--ticks", type=int, default=30)
+    runParser.add_argument("--disk-samples", type=int, default=50,
+                           help="domains timed with getALlDiskInfo")
+    runParser.add_argument("--mode", choices=MODES + ("both",),
+                           default="both")
+    runParser.add_argument("--seed", type=int, default=0)
+    runParser.add_argument("--output", help="write JSON here instead of "
+                                            "stdout")
+    runParser.add_argument("--child", action="store_true",
+                           help=argparse.SUPPRESS)
+    runParser.add_argument("--uri", help=argparse.SUPPRESS)
+
+    compareParser = commands.add_parser("compare", help="compare two JSON "
+                                                        "results")
+    compareParser.add_argument("baseline")
+    compareParser.add_argument("current")
+    compareParser.add_argument("--threshold", type=float,
+                               default=DEFAULT_THRESHOLD,
+                               help="percent increase counted as a "
+                                    "regression")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        return compareCommand(args)
+    if args.child:
+        print(json.dumps(runChild(args)))
+        return 0
+    output = json.dumps(runSuite(args), indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, "w") as outputFile:
+            outputFile.write(output + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from guestMemory import GuestMemory, PAGE_SIZE
+import argparse
+import time
+
+MIB = 1024 * 1024
+PATTERN = b"virt-manager needle"
+
+
+class SyntheticDomain:
+    # Serves memoryPeek from a local buffer, charging a fixed round trip
+    # per call the way a remote libvirtd would.
+    def __init__(self, size: int, roundTrip: float) -> None:
+        memory = bytearray(size)
+        for address in range(size // 7, size, size // 7):
+            memory[address:address + len(PATTERN)] = PATTERN
+        self.memory = bytes(memory)
+        self.roundTrip = roundTrip
+        self.calls = 0
+
+    def memoryPeek(self, start: int, size: int, flags: int) -> bytes:
+        self.calls += 1
+        deadline = time.perf_counter() + self.roundTrip
+        while time.perf_counter() < deadline:
+            pass
+        return self.memory[start:start + size]
+
+
+def pageScan(domain: SyntheticDomain, size: int) -> list[int]:
+    # One peek per guest page, matching within each page only.
+    matches = []
+    for address in range(0, size, PAGE_SIZE):
+        page = domain.memoryPeek(address, PAGE_SIZE, 0)
+        position = page.find(PATTERN)
+        while position != -1:
+            matches.append(address + position)
+            position = page.find(PATTERN, position + 1)
+    return matches
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Time searching synthetic guest memory with chunked "
+                    "memoryPeek reads against one read per page.")
+    parser.add_argument("--size", type=int, default=256,
+                        help="MiB of guest memory to scan")
+    parser.add_argument("--round-trip", type=float, default=0.2,
+                        help="simulated ms per memoryPeek call")
+    args = parser.parse_args()
+
+    size = args.size * MIB
+    domain = SyntheticDomain(size, args.round_trip / 1000)
+    start = time.perf_counter()
+    chunked = list(GuestMemory(domain).search(0, size, PATTERN))
+    seconds = time.perf_counter() - start
+    print("chunked: {:.0f} MiB/s, {} calls, {} matches".format(
+        args.size / seconds, domain.calls, len(chunked)))
+
+    domain.calls = 0
+    start = time.perf_counter()
+    paged = pageScan(domain, size)
+    seconds = time.perf_counter() - start
+    print("paged:   {:.0f} MiB/s, {} calls, {} matches".format(
+        args.size / seconds, domain.calls, len(paged)))
+
+
+if __name__ == "__main__":
+    main()
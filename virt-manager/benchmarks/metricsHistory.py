@@ -0,0 +1,59 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libvirtUtils import DomainStats
+from metricsStore import MetricsStore, SAMPLE_RATE
+import argparse
+import time
+import tracemalloc
+
+
+def fleetSnapshots(domainCount: int, tick: int) -> dict[str, DomainStats]:
+    snapshots = {}
+    for idx in range(domainCount):
+        stats = DomainStats("{:08x}".format(idx), "bench-{:05d}".format(idx),
+                            1, 1048576, 1048576, 2,
+                            tick * (idx % 100) * 20_000_000, "test:///default")
+        snapshots[stats.key] = stats
+    return snapshots
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure MetricsStore memory and per-tick cost.")
+    parser.add_argument("--domains", type=int, default=1000)
+    parser.add_argument("--minutes", type=int, default=60)
+    args = parser.parse_args()
+
+    capacity = args.minutes * 60 * SAMPLE_RATE
+    # Rings are allocated up front, so the first tick is all the store
+    # ever allocates; tracing every tick would only slow the run down.
+    tracemalloc.start()
+    store = MetricsStore(capacity)
+    store.record(fleetSnapshots(args.domains, 0), 0.0)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    recordTime = 0.0
+    # One extra minute so every ring has wrapped around at least once.
+    ticks = capacity + 60
+    for tick in range(1, ticks):
+        snapshots = fleetSnapshots(args.domains, tick)
+        start = time.perf_counter()
+        store.record(snapshots, float(tick))
+        recordTime += time.perf_counter() - start
+    print("{} domains x {} samples".format(args.domains, capacity))
+    print("ring buffers: {:.1f} MiB".format(store.nbytes() / 2 ** 20))
+    print("allocated by first tick: {:.1f} MiB (peak {:.1f} MiB)".format(
+        current / 2 ** 20, peak / 2 ** 20))
+    print("record(): {:.2f} ms/tick".format(recordTime / (ticks - 1) * 1000))
+    # bench-00050 burns 50 * 20ms of CPU per second on 2 vCPUs.
+    sample = fleetSnapshots(51, 0)["test:///default/{:08x}".format(50)]
+    print("cpu% of {}: {:.1f}".format(sample.name,
+                                      store.cpuPercent(sample.key)))
+
+
+if __name__ == "__main__":
+    main()
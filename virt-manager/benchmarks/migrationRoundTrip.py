@@ -0,0 +1,64 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migration import MigrationSettings, migrateDomain
+import argparse
+import libvirt
+import time
+
+
+def migrateOnce(domain: libvirt.virDomain,
+                settings: MigrationSettings) -> None:
+    progress = []
+    start = time.perf_counter()
+    outcome = migrateDomain(domain, settings, pollInterval=0.1,
+                            onProgress=progress.append)
+    elapsed = time.perf_counter() - start
+    last = progress[-1] if len(progress) != 0 else None
+    print("{}: {} in {:.3f}s, {} progress updates{}".format(
+        domain.name(), outcome, elapsed, len(progress),
+        "" if last is None else ", {} MiB sent".format(
+            last.processed // (1024 * 1024))))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Migrate a domain to a second host and back, reporting "
+                    "time and jobStats progress. Any pair of URIs the "
+                    "daemons accept works, e.g. qemu:///session and "
+                    "qemu+ssh://other/session; the test:/// driver has no "
+                    "migration support and reports that as an error.")
+    parser.add_argument("domain")
+    parser.add_argument("--source", default="qemu:///session")
+    parser.add_argument("--destination", required=True)
+    parser.add_argument("--bandwidth", type=int, default=0, help="MiB/s")
+    parser.add_argument("--max-downtime", type=int, default=0, help="ms")
+    parser.add_argument("--compressed", action="store_true")
+    parser.add_argument("--auto-converge", action="store_true")
+    args = parser.parse_args()
+
+    # Transient on both ends, so the round trip leaves both hosts as they
+    # were.
+    settings = MigrationSettings(args.destination,
+                                 compressed=args.compressed,
+                                 autoConverge=args.auto_converge,
+                                 persistent=False,
+                                 bandwidth=args.bandwidth,
+                                 maxDowntime=args.max_downtime)
+    source = libvirt.open(args.source)
+    destination = libvirt.open(args.destination)
+    try:
+        migrateOnce(source.lookupByName(args.domain), settings)
+        migrateOnce(destination.lookupByName(args.domain),
+                    settings._replace(destinationUri=args.source))
+    except libvirt.libvirtError as err:
+        print("migration failed: {}".format(err.get_error_message()))
+    finally:
+        destination.close()
+        source.close()
+
+
+if __name__ == "__main__":
+    main()
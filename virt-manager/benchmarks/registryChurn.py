@@ -0,0 +1,88 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from domainRegistry import DomainRegistry
+from libvirtUtils import DomainStats
+import argparse
+import libvirt
+import random
+import time
+
+
+def makeStats(idx: int, generation: int = 0) -> DomainStats:
+    return DomainStats("uuid-{:06d}".format(idx), "guest-{:06d}-{}".format(
+        idx, generation), libvirt.VIR_DOMAIN_RUNNING, 1048576, 1048576, 2,
+        generation, "bench")
+
+
+def churn(snapshots: dict[str, DomainStats], nextIdx: int, rate: float,
+          rng: random.Random) -> tuple[dict[str, DomainStats], int]:
+    # Replace rate of the guests with new ones, rename as many again and
+    # bump the counters of everything else.
+    snapshots = dict(snapshots)
+    keys = list(snapshots)
+    changeCount = int(len(keys) * rate)
+    for key in rng.sample(keys, changeCount):
+        del snapshots[key]
+        stats = makeStats(nextIdx)
+        snapshots[stats.key] = stats
+        nextIdx += 1
+    for key, stats in list(snapshots.items()):
+        if rng.random() < rate:
+            stats = stats._replace(name=stats.name + "r")
+        snapshots[key] = stats._replace(cpuTime=stats.cpuTime + 1)
+    return snapshots, nextIdx
+
+
+def reconcileLists(allStats: list[DomainStats],
+                   snapshots: dict[str, DomainStats]) -> None:
+    # The parallel-list scheme the registry replaced: a scan per new key
+    # and list.remove per missing one.
+    keys = [stats.key for stats in allStats]
+    for key, stats in snapshots.items():
+        if key not in keys:
+            allStats.append(stats)
+            keys.append(key)
+    for stats in list(allStats):
+        if stats.key not in snapshots:
+            allStats.remove(stats)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Time reconciling a churning fleet with DomainRegistry "
+                    "against the old parallel lists.")
+    parser.add_argument("--sizes", default="1000,4000,16000")
+    parser.add_argument("--churn", type=float, default=0.05,
+                        help="share of guests replaced per tick")
+    parser.add_argument("--ticks", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    for size in (int(size) for size in args.sizes.split(",")):
+        snapshots = {stats.key: stats
+                     for stats in (makeStats(idx) for idx in range(size))}
+        registry = DomainRegistry()
+        registry.reconcile(snapshots, dict.fromkeys(snapshots))
+        allStats = list(snapshots.values())
+        nextIdx = size
+        registrySeconds = listSeconds = 0.0
+        for _ in range(args.ticks):
+            snapshots, nextIdx = churn(snapshots, nextIdx, args.churn, rng)
+            domains = dict.fromkeys(snapshots)
+            start = time.perf_counter()
+            registry.reconcile(snapshots, domains)
+            registrySeconds += time.perf_counter() - start
+            start = time.perf_counter()
+            reconcileLists(allStats, snapshots)
+            listSeconds += time.perf_counter() - start
+        assert len(registry) == len(allStats) == len(snapshots)
+        print("{:6d} guests: registry {:.2f} ms/tick, lists {:.2f} ms/tick"
+              .format(size, registrySeconds / args.ticks * 1000,
+                      listSeconds / args.ticks * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import libvirt
+
+LOCAL_METHODS = {"name", "UUIDString", "UUID", "ID", "connect", "getURI"}
+
+
+class RpcCounter:
+    def __init__(self) -> None:
+        self.calls: dict[str, int] = {}
+
+    def total(self) -> int:
+        return sum(self.calls.values())
+
+    def reset(self) -> None:
+        self.calls.clear()
+
+
+class CountingProxy:
+    def __init__(self, target, counter: RpcCounter) -> None:
+        self._target = target
+        self._counter = counter
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._target, name)
+        if not callable(attr) or name in LOCAL_METHODS:
+            return attr
+
+        def countedCall(*args, **kwargs):
+            self._counter.calls[name] = self._counter.calls.get(name, 0) + 1
+            return self.wrap(attr(*args, **kwargs))
+        return countedCall
+
+    def wrap(self, result):
+        if isinstance(result, libvirt.virDomain):
+            return CountingProxy(result, self._counter)
+        if isinstance(result, list):
+            return [self.wrap(item) for item in result]
+        if isinstance(result, tuple) and len(result) == 2 \
+                and isinstance(result[0], libvirt.virDomain):
+            return self.wrap(result[0]), result[1]
+        return result
@@ -0,0 +1,47 @@
+from fleet import defineFleet
+from rpcCounter import CountingProxy, RpcCounter
+from libvirtUtils import DomainStatsRefresher
+import argparse
+import libvirt
+
+
+def legacyTick(conn) -> None:
+    # Mirrors the calls the per-widget MainWindow.update made for each row.
+    for domain in conn.listAllDomains():
+        domain.ID()
+        domain.name()
+        for _ in range(4):
+            domain.info()
+
+
+def bulkTick(refresher: DomainStatsRefresher) -> None:
+    refresher.refresh()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Count libvirt RPCs per MainWindow.update tick.")
+    parser.add_argument("--uri", default="test:///default")
+    parser.add_argument("--domains", type=int, default=200)
+    parser.add_argument("--ticks", type=int, default=10)
+    args = parser.parse_args()
+
+    rawConn = libvirt.open(args.uri)
+    defineFleet(rawConn, args.domains)
+    counter = RpcCounter()
+    conn = CountingProxy(rawConn, counter)
+    refresher = DomainStatsRefresher(conn)
+
+    for label, tick in (("legacy per-domain info()", lambda: legacyTick(conn)),
+                        ("bulk getAllDomainStats", lambda: bulkTick(refresher))):
+        counter.reset()
+        for _ in range(args.ticks):
+            tick()
+        perTick = counter.total() / args.ticks
+        print("{}: {:.1f} RPCs/tick {}".format(label, perTick,
+                                              dict(counter.calls)))
+    rawConn.close()
+
+
+if __name__ == "__main__":
+    main()
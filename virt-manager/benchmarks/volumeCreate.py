@@ -0,0 +1,55 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libvirtUtils import VolumeSettings, PREALLOCATION_MODES, createVolume, \
+    volumeFormat
+import argparse
+import libvirt
+import time
+
+GIB = 1024 ** 3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Create volumes with every preallocation mode and a "
+                    "linked clone, reporting time and progress callbacks.")
+    parser.add_argument("--uri", default="test:///default")
+    parser.add_argument("--pool", default="default-pool")
+    parser.add_argument("--size", type=float, default=1.0, help="GiB")
+    args = parser.parse_args()
+
+    conn = libvirt.open(args.uri)
+    pool = conn.storagePoolLookupByName(args.pool)
+    created = []
+    try:
+        for preallocation in PREALLOCATION_MODES:
+            settings = VolumeSettings("bench-{}.qcow2".format(preallocation),
+                                      int(args.size * GIB), "qcow2",
+                                      preallocation)
+            progress = []
+            start = time.perf_counter()
+            path = createVolume(pool, settings, pollInterval=0.1,
+                                onProgress=lambda *p: progress.append(p))
+            created.append(settings.name)
+            print("{}: {} in {:.3f}s, {} progress updates".format(
+                preallocation, path, time.perf_counter() - start,
+                len(progress)))
+
+        clone = VolumeSettings("bench-overlay.qcow2", 0,
+                               baseVolume=created[0], linkedClone=True)
+        path = createVolume(pool, clone)
+        created.append(clone.name)
+        overlay = pool.storageVolLookupByName(clone.name)
+        print("linked clone: {} ({}, capacity {} bytes)".format(
+            path, volumeFormat(overlay), overlay.info()[1]))
+    finally:
+        for name in created:
+            pool.storageVolLookupByName(name).delete(0)
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+import libvirt
+from libvirtUtils import DomainStats, DomainStatsRefresher
+from instrumentation import instrument
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, Thread
+from typing import NamedTuple
+import time
+
+KEEPALIVE_INTERVAL = 5
+KEEPALIVE_COUNT = 3
+RECONNECT_BACKOFF_START = 1.0
+RECONNECT_BACKOFF_MAX = 60.0
+MAX_POLL_WORKERS = 16
+
+eventLoopThread: Thread | None = None
+
+
+def runEventLoop() -> None:
+    while True:
+        libvirt.virEventRunDefaultImpl()
+
+
+def startEventLoop() -> None:
+    # Has to run before the first libvirt.open, otherwise connections
+    # never dispatch domain events or keepalive messages.
+    global eventLoopThread
+    if eventLoopThread is not None:
+        return
+    libvirt.virEventRegisterDefaultImpl()
+    eventLoopThread = Thread(target=runEventLoop, name="libvirt-events",
+                             daemon=True)
+    eventLoopThread.start()
+
+
+def parseUris(uriList: str) -> list[str]:
+    return [uri.strip() for uri in uriList.split(",") if len(uri.strip()) != 0]
+
+
+class HostPoll(NamedTuple):
+    host: str
+    snapshots: dict[str, DomainStats]
+    domains: dict[str, libvirt.virDomain]
+    error: str | None
+    reconnected: bool
+    sampledAt: float
+    # Whether any running guest's counters moved since the last poll.
+    countersChanged: bool = False
+
+
+class HostConnection:
+    def __init__(self, uri: str, onConnect=None) -> None:
+        self.uri = uri
+        self.onConnect = onConnect
+        self.conn: libvirt.virConnect | None = None
+        self.refresher: DomainStatsRefresher | None = None
+        self.lock = Lock()
+        self.backoff = RECONNECT_BACKOFF_START
+        self.nextAttempt = 0.0
+        self.lastError: str | None = None
+        self.lastSnapshots: dict[str, DomainStats] = {}
+        self.lastDomains: dict[str, libvirt.virDomain] = {}
+        self.lastSampledAt = 0.0
+        # Only the first connect runs inline; later ones run on
+        # reconnectThread and the next poll picks up the new connection.
+        self.attempted = False
+        self.reconnectThread: Thread | None = None
+        self.reconnectedPending = False
+
+    def isAlive(self) -> bool:
+        try:
+            return self.conn is not None and self.conn.isAlive() == 1
+        except libvirt.libvirtError:
+            return False
+
+    def openConnection(self) -> libvirt.virConnect:
+        conn = instrument(libvirt.open(self.uri), self.uri)
+        try:
+            conn.setKeepAlive(KEEPALIVE_INTERVAL, KEEPALIVE_COUNT)
+        except libvirt.libvirtError:
+            # Local drivers such as test:/// have no keepalive support.
+            pass
+        return conn
+
+    def useConnection(self, conn: libvirt.virConnect) -> None:
+        self.conn = conn
+        self.refresher = DomainStatsRefresher(self.conn, self.uri)
+        self.backoff = RECONNECT_BACKOFF_START
+        self.lastError = None
+        if self.onConnect is not None:
+            self.onConnect(self.uri, self.conn)
+
+    def reconnect(self) -> bool:
+        if time.monotonic() < self.nextAttempt:
+            return False
+        self.disconnect()
+        try:
+            conn = self.openConnection()
+        except libvirt.libvirtError as err:
+            self.connectionFailed(err.get_error_message())
+            return False
+        self.useConnection(conn)
+        return True
+
+    def startReconnect(self) -> None:
+        # libvirt.open can block for a whole TCP or ssh timeout, which
+        # would stall every host's tick if it ran on the poll path.
+        if self.reconnectThread is not None \
+                and self.reconnectThread.is_alive() \
+                or time.monotonic() < self.nextAttempt:
+            return
+        oldConn = self.conn
+        self.conn = None
+        self.refresher = None
+        self.reconnectThread = Thread(target=self.reconnectInBackground,
+                                      args=(oldConn,), name="reconnect",
+                                      daemon=True)
+        self.reconnectThread.start()
+
+    def reconnectInBackground(self, oldConn: libvirt.virConnect | None) \
+            -> None:
+        if oldConn is not None:
+            try:
+                oldConn.close()
+            except libvirt.libvirtError:
+                pass
+        try:
+            conn = self.openConnection()
+        except libvirt.libvirtError as err:
+            with self.lock:
+                self.connectionFailed(err.get_error_message())
+            return
+        with self.lock:
+            self.useConnection(conn)
+            self.reconnectedPending = True
+
+    def connectionFailed(self, message: str) -> None:
+        self.disconnect()
+        self.lastError = message
+        self.nextAttempt = time.monotonic() + self.backoff
+        self.backoff = min(self.backoff * 2, RECONNECT_BACKOFF_MAX)
+
+    def disconnect(self) -> None:
+        if self.conn is None:
+            return
+        try:
+            self.conn.close()
+        except libvirt.libvirtError:
+            pass
+        self.conn = None
+        self.refresher = None
+
+    def stalePoll(self) -> HostPoll:
+        return HostPoll(self.uri, self.lastSnapshots, self.lastDomains,
+                        self.lastError, False, self.lastSampledAt)
+
+    def poll(self, activeOnly: bool = False) -> HostPoll:
+        with self.lock:
+            reconnected = self.reconnectedPending
+            self.reconnectedPending = False
+            if not self.isAlive():
+                if self.attempted:
+                    self.startReconnect()
+                    return self.stalePoll()
+                self.attempted = True
+                reconnected = self.reconnect()
+                if not reconnected:
+                    return self.stalePoll()
+            try:
+                if activeOnly:
+                    snapshots = self.refresher.refreshActive()
+                else:
+                    snapshots = self.refresher.refresh()
+                self.lastSampledAt = time.monotonic()
+            except libvirt.libvirtError as err:
+                if not self.isAlive():
+                    self.connectionFailed(err.get_error_message())
+                    return self.stalePoll()
+                return HostPoll(self.uri, self.lastSnapshots,
+                                self.lastDomains, err.get_error_message(),
+                                reconnected, self.lastSampledAt)
+            countersChanged = any(
+                stats.state == libvirt.VIR_DOMAIN_RUNNING
+                and stats != self.lastSnapshots.get(key)
+                for key, stats in snapshots.items())
+            self.lastDomains = dict(self.refresher.domains)
+            if activeOnly:
+                # Guests undefined since the last full poll drop out here.
+                self.lastSnapshots = {
+                    key: stats for key, stats
+                    in {**self.lastSnapshots, **snapshots}.items()
+                    if key in self.lastDomains}
+            else:
+                self.lastSnapshots = snapshots
+            return HostPoll(self.uri, snapshots, self.lastDomains, None,
+                            reconnected, self.lastSampledAt, countersChanged)
+
+
+class ConnectionManager:
+    def __init__(self, uris: list[str], onConnect=None) -> None:
+        self.hosts = {uri: HostConnection(uri, onConnect) for uri in uris}
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(1, min(MAX_POLL_WORKERS, len(uris))),
+            thread_name_prefix="host-poll")
+
+    def pollAll(self, activeOnly: bool = False) -> list[HostPoll]:
+        return list(self.executor.map(lambda host: host.poll(activeOnly),
+                                      self.hosts.values()))
+
+    def refresher(self, uri: str) -> DomainStatsRefresher | None:
+        host = self.hosts.get(uri)
+        if host is None:
+            return None
+        return host.refresher
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
+        for host in self.hosts.values():
+            host.disconnect()
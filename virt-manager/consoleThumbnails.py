@@ -0,0 +1,133 @@
+from libvirt import VIR_DOMAIN_RUNNING, virDomain, libvirtError
+from libvirtUtils import DomainStats
+from collections import OrderedDict
+from typing import NamedTuple
+import os
+
+# Captures per second allowed against each host, e.g. 0.5 for one every
+# two seconds.
+RATE_VARIABLE = "VIRTMANAGER_THUMBNAILS_PER_SECOND"
+CAPTURES_PER_SECOND = float(os.environ.get(RATE_VARIABLE) or 2.0)
+# Seconds before a visible guest's thumbnail is captured again.
+REFRESH_INTERVAL = 10.0
+THUMBNAIL_CACHE_SIZE = 256
+THUMBNAIL_WIDTH = 160
+THUMBNAIL_HEIGHT = 100
+
+
+class ThumbnailError(Exception):
+    pass
+
+
+class CachedThumbnail(NamedTuple):
+    # Whatever the view drew from the capture; None if the capture failed,
+    # so a guest without a console is not retried every tick.
+    image: object
+    capturedAt: float
+
+
+class ThumbnailCache:
+    # Least recently shown thumbnails are evicted first.
+    def __init__(self, capacity: int = THUMBNAIL_CACHE_SIZE) -> None:
+        self.capacity = capacity
+        self.entries: OrderedDict[str, CachedThumbnail] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: str) -> CachedThumbnail | None:
+        cached = self.entries.get(key)
+        if cached is not None:
+            self.entries.move_to_end(key)
+        return cached
+
+    def peek(self, key: str) -> CachedThumbnail | None:
+        return self.entries.get(key)
+
+    def put(self, key: str, image, capturedAt: float) -> None:
+        self.entries[key] = CachedThumbnail(image, capturedAt)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def remove(self, key: str) -> bool:
+        return self.entries.pop(key, None) is not None
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+class CaptureBudget:
+    # A token bucket per host holding at most one second's captures.
+    def __init__(self, capturesPerSecond: float = CAPTURES_PER_SECOND) -> None:
+        self.capturesPerSecond = capturesPerSecond
+        self.tokens: dict[str, float] = {}
+        self.updatedAt: dict[str, float] = {}
+
+    def take(self, host: str, now: float) -> bool:
+        capacity = max(self.capturesPerSecond, 1.0)
+        lastUpdate = self.updatedAt.get(host)
+        tokens = capacity if lastUpdate is None else min(
+            capacity, self.tokens[host]
+            + (now - lastUpdate) * self.capturesPerSecond)
+        self.updatedAt[host] = now
+        if tokens < 1.0:
+            self.tokens[host] = tokens
+            return False
+        self.tokens[host] = tokens - 1.0
+        return True
+
+
+def dueCaptures(visible, cache: ThumbnailCache, budget: CaptureBudget,
+                busyHosts: set[str], now: float,
+                refreshInterval: float = REFRESH_INTERVAL) \
+        -> list[DomainStats]:
+    # Stalest visible running guests first, at most one per host that has
+    # no capture in flight, and only while that host's budget lasts.
+    stale = []
+    for stats in visible:
+        if stats.state != VIR_DOMAIN_RUNNING or stats.host in busyHosts:
+            continue
+        cached = cache.peek(stats.key)
+        capturedAt = float("-inf") if cached is None else cached.capturedAt
+        if now - capturedAt >= refreshInterval:
+            stale.append((capturedAt, stats))
+    stale.sort(key=lambda item: item[0])
+    chosen = []
+    chosenHosts = set()
+    for _, stats in stale:
+        if stats.host not in chosenHosts and budget.take(stats.host, now):
+            chosen.append(stats)
+            chosenHosts.add(stats.host)
+    return chosen
+
+
+def captureScreen(domain: virDomain, screen: int = 0) -> tuple[str, bytes]:
+    # Returns the MIME type and the raw image libvirt streamed back.
+    stream = domain.connect().newStream(0)
+    chunks = []
+    try:
+        mimeType = domain.screenshot(stream, screen, 0)
+        stream.recvAll(lambda _, data, opaque: opaque.append(data), chunks)
+        stream.finish()
+    except libvirtError:
+        stream.abort()
+        raise
+    return mimeType, b"".join(chunks)
+
+
+def captureThumbnail(domain: virDomain, width: int = THUMBNAIL_WIDTH,
+                     height: int = THUMBNAIL_HEIGHT):
+    # Decoded and downscaled on the worker thread, once per capture; QImage,
+    # unlike QPixmap, may be used off the GUI thread.
+    from PyQt5.QtCore import Qt
+    from PyQt5.QtGui import QImage
+
+    mimeType, data = captureScreen(domain)
+    image = QImage.fromData(data)
+    if image.isNull():
+        # The capture worked, so this is no libvirt failure; JobRunner
+        # reports it through onFailure all the same.
+        raise ThumbnailError("Cannot decode {} screenshot".format(mimeType))
+    return image.scaled(width, height, Qt.KeepAspectRatio,
+                        Qt.SmoothTransformation)
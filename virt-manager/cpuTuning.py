@@ -0,0 +1,200 @@
+from libvirt import VIR_DOMAIN_AFFECT_CONFIG, VIR_DOMAIN_AFFECT_LIVE, \
+    VIR_DOMAIN_NUMATUNE_MEM_STRICT, VIR_DOMAIN_NUMATUNE_MEM_PREFERRED, \
+    VIR_DOMAIN_NUMATUNE_MEM_INTERLEAVE, VIR_DOMAIN_NUMATUNE_MEM_RESTRICTIVE, \
+    virConnect, virDomain, libvirtError
+from typing import NamedTuple
+from xml.etree.ElementTree import fromstring
+
+NUMA_MODES = {"strict": VIR_DOMAIN_NUMATUNE_MEM_STRICT,
+              "preferred": VIR_DOMAIN_NUMATUNE_MEM_PREFERRED,
+              "interleave": VIR_DOMAIN_NUMATUNE_MEM_INTERLEAVE,
+              "restrictive": VIR_DOMAIN_NUMATUNE_MEM_RESTRICTIVE}
+# Guests below this CPU% are left floating by autoPlace.
+HOT_CPU_PERCENT = 20.0
+# Seconds of history averaged into the autoPlace load.
+LOAD_WINDOW = 60.0
+
+
+class HostTopology(NamedTuple):
+    cpuCount: int
+    onlineCpus: frozenset[int]
+    # NUMA cell id -> host CPU ids
+    cells: dict[int, list[int]]
+    # host CPU id -> (socket, core), hyperthread siblings share a core
+    cores: dict[int, tuple[int, int]]
+
+
+class CpuPlacement(NamedTuple):
+    vcpuPins: list[frozenset[int]]
+    emulatorPin: frozenset[int]
+    currentCpus: list[int]
+    numaMode: int | None
+    numaNodeset: str
+
+
+class PlacementPlan(NamedTuple):
+    node: int
+    vcpuPins: dict[int, frozenset[int]]
+    emulatorPin: frozenset[int]
+
+
+def parseCpuList(cpuList: str) -> frozenset[int]:
+    # "0-3,8,^2" style lists as used by libvirt and the kernel.
+    cpus = set()
+    excluded = set()
+    for part in cpuList.replace(" ", "").split(","):
+        if len(part) == 0:
+            continue
+        target = cpus
+        if part.startswith("^"):
+            target = excluded
+            part = part[1:]
+        first, _, last = part.partition("-")
+        target.update(range(int(first), int(last or first) + 1))
+    return frozenset(cpus - excluded)
+
+
+def formatCpuList(cpus) -> str:
+    ranges = []
+    for cpu in sorted(cpus):
+        if len(ranges) != 0 and ranges[-1][1] == cpu - 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(str(first) if first == last
+                    else "{}-{}".format(first, last)
+                    for first, last in ranges)
+
+
+def cpuMap(cpus, cpuCount: int) -> tuple[bool, ...]:
+    return tuple(cpu in cpus for cpu in range(cpuCount))
+
+
+def cpuSet(cpuMapping) -> frozenset[int]:
+    return frozenset(cpu for cpu, used in enumerate(cpuMapping) if used)
+
+
+def affectFlags(domain: virDomain) -> int:
+    if domain.isActive():
+        return VIR_DOMAIN_AFFECT_LIVE | VIR_DOMAIN_AFFECT_CONFIG
+    return VIR_DOMAIN_AFFECT_CONFIG
+
+
+def hostTopology(conn: virConnect) -> HostTopology:
+    cpuCount, onlineMap, _ = conn.getCPUMap()
+    cells = {}
+    cores = {}
+    capabilities = fromstring(conn.getCapabilities())
+    for cell in capabilities.iterfind("host/topology/cells/cell"):
+        cellCpus = []
+        for cpu in cell.iterfind("cpus/cpu"):
+            cpuId = int(cpu.get("id"))
+            cellCpus.append(cpuId)
+            cores[cpuId] = (int(cpu.get("socket_id", 0)),
+                            int(cpu.get("core_id", cpuId)))
+        cells[int(cell.get("id"))] = sorted(cellCpus)
+    if len(cells) == 0:
+        # No NUMA information: treat the host as a single node.
+        cells[0] = list(range(cpuCount))
+    return HostTopology(cpuCount, cpuSet(onlineMap), cells, cores)
+
+
+def cpuPlacement(domain: virDomain) -> CpuPlacement:
+    flags = VIR_DOMAIN_AFFECT_LIVE if domain.isActive() \
+        else VIR_DOMAIN_AFFECT_CONFIG
+    vcpuPins = [cpuSet(mapping) for mapping in domain.vcpuPinInfo(flags)]
+    emulatorPin = cpuSet(domain.emulatorPinInfo(flags))
+    currentCpus = []
+    if domain.isActive():
+        # Same data "info cpus" gives in the QEMU monitor, without it.
+        currentCpus = [cpu for _, _, _, cpu in domain.vcpus()[0]]
+    try:
+        numa = domain.numaParameters(flags)
+    except libvirtError:
+        numa = {}
+    return CpuPlacement(vcpuPins, emulatorPin, currentCpus,
+                        numa.get("numa_mode"), numa.get("numa_nodeset", ""))
+
+
+def applyPinning(domain: virDomain, vcpuPins: dict[int, frozenset[int]],
+                 emulatorPin: frozenset[int] | None, cpuCount: int) -> None:
+    flags = affectFlags(domain)
+    for vcpu, cpus in sorted(vcpuPins.items()):
+        domain.pinVcpuFlags(vcpu, cpuMap(cpus, cpuCount), flags)
+    if emulatorPin is not None and len(emulatorPin) != 0:
+        domain.pinEmulator(cpuMap(emulatorPin, cpuCount), flags)
+
+
+def applyNumaPolicy(domain: virDomain, mode: int | None,
+                    nodeset: str) -> None:
+    params = {"numa_nodeset": nodeset}
+    if mode is not None and not domain.isActive():
+        # QEMU cannot switch the policy of a running guest, only its nodes.
+        params["numa_mode"] = mode
+    domain.setNumaParameters(params, affectFlags(domain))
+
+
+def autoPlace(topology: HostTopology,
+              loads: dict[str, tuple[int, float]]) -> dict[str, PlacementPlan]:
+    # loads: key -> (vCPU count, CPU%). The hottest guest picks first; each
+    # goes to the NUMA node with the least load already placed on it and
+    # its vCPUs are pinned 1:1 to that node's least busy CPUs, preferring
+    # CPUs whose hyperthread sibling is idle as well.
+    nodeLoad = {node: 0.0 for node in topology.cells}
+    cpuLoad = {cpu: 0.0 for cpus in topology.cells.values() for cpu in cpus
+               if cpu in topology.onlineCpus}
+    coreLoad = {topology.cores.get(cpu, (0, cpu)): 0.0 for cpu in cpuLoad}
+    plans = {}
+    hotGuests = sorted(((cpuPercent * vcpuCount / 100, key, vcpuCount)
+                        for key, (vcpuCount, cpuPercent) in loads.items()
+                        if cpuPercent >= HOT_CPU_PERCENT and vcpuCount > 0),
+                       reverse=True)
+    for coresUsed, key, vcpuCount in hotGuests:
+        candidates = [node for node, cpus in topology.cells.items()
+                      if any(cpu in cpuLoad for cpu in cpus)]
+        if len(candidates) == 0:
+            break
+        # Prefer nodes big enough to hold every vCPU on its own core.
+        node = min(candidates, key=lambda node: (
+            len(topology.cells[node]) < vcpuCount, nodeLoad[node]))
+        nodeCpus = [cpu for cpu in topology.cells[node] if cpu in cpuLoad]
+        perVcpu = coresUsed / vcpuCount
+        vcpuPins = {}
+        for vcpu in range(vcpuCount):
+            cpu = min(nodeCpus, key=lambda cpu: (
+                cpuLoad[cpu], coreLoad[topology.cores.get(cpu, (0, cpu))],
+                cpu))
+            cpuLoad[cpu] += perVcpu
+            coreLoad[topology.cores.get(cpu, (0, cpu))] += perVcpu
+            vcpuPins[vcpu] = frozenset((cpu,))
+        nodeLoad[node] += coresUsed
+        plans[key] = PlacementPlan(node, vcpuPins, frozenset(nodeCpus))
+    return plans
+
+
+def applyPlacement(plan: PlacementPlan, cpuCount: int,
+                   domain: virDomain) -> str:
+    applyPinning(domain, plan.vcpuPins, plan.emulatorPin, cpuCount)
+    try:
+        applyNumaPolicy(domain, VIR_DOMAIN_NUMATUNE_MEM_STRICT, str(plan.node))
+    except libvirtError:
+        # Memory already allocated elsewhere; CPU pinning still helps.
+        pass
+    return "node {}".format(plan.node)
+
+
+def loadCpuTuning(domain: virDomain) -> tuple[HostTopology, CpuPlacement]:
+    return hostTopology(domain.connect()), cpuPlacement(domain)
+
+
+def planHosts(targets: list[tuple[virConnect, dict[str, virDomain],
+                                  dict[str, tuple[int, float]]]]) \
+        -> list[tuple[str, virDomain, PlacementPlan, int]]:
+    # Returns (key, domain, plan, host CPU count) for every guest worth
+    # pinning; each plan is then applied under its guest's own key.
+    placements = []
+    for conn, domains, loads in targets:
+        topology = hostTopology(conn)
+        for key, plan in autoPlace(topology, loads).items():
+            placements.append((key, domains[key], plan, topology.cpuCount))
+    return placements
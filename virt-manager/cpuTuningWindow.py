@@ -0,0 +1,125 @@
+from cpuTuning import HostTopology, CpuPlacement, NUMA_MODES, \
+    loadCpuTuning, applyPinning, applyNumaPolicy, parseCpuList, formatCpuList
+from warningDialogue import WarningDialogue
+from libvirt import virDomain
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, \
+    QTableWidget, QTableWidgetItem, QComboBox, QLineEdit, QPushButton, \
+    QHeaderView, QSizePolicy
+
+PIN_HEADERS = ("Thread", "Pinned to host CPUs", "Running on")
+
+
+def applyCpuTuning(domain: virDomain, vcpuPins: dict, emulatorPin,
+                   cpuCount: int, numaMode: int | None,
+                   numaNodeset: str) -> None:
+    applyPinning(domain, vcpuPins, emulatorPin, cpuCount)
+    if len(numaNodeset) != 0:
+        applyNumaPolicy(domain, numaMode, numaNodeset)
+
+
+class CpuTuningWindow(QWidget):
+    def __init__(self, domain: virDomain, domainKey: str,
+                 parentWindow) -> None:
+        super().__init__()
+        self.domain = domain
+        self.domainKey = domainKey
+        self.jobRunner = parentWindow.jobRunner
+        self.topology: HostTopology | None = None
+        self.placement: CpuPlacement | None = None
+        self.setWindowTitle(domain.name() + " CPU tuning")
+        self.setMinimumSize(420, 300)
+        self.mainLayout = QVBoxLayout()
+
+        self.topologyLabel = QLabel("Loading host topology...")
+        self.topologyLabel.setWordWrap(True)
+        self.mainLayout.addWidget(self.topologyLabel)
+
+        self.pinTable = QTableWidget(0, len(PIN_HEADERS))
+        self.pinTable.setHorizontalHeaderLabels(PIN_HEADERS)
+        self.pinTable.verticalHeader().setVisible(False)
+        self.pinTable.horizontalHeader().setSectionResizeMode(
+            QHeaderView.Stretch)
+        self.mainLayout.addWidget(self.pinTable)
+
+        numaLayout = QHBoxLayout()
+        numaLayout.addWidget(QLabel("NUMA memory:"))
+        self.numaModeCombo = QComboBox()
+        for name, mode in NUMA_MODES.items():
+            self.numaModeCombo.addItem(name, mode)
+        self.numaNodesetField = QLineEdit()
+        self.numaNodesetField.setPlaceholderText("nodes, e.g. 0 or 0-1")
+        numaLayout.addWidget(self.numaModeCombo)
+        numaLayout.addWidget(self.numaNodesetField)
+        self.mainLayout.addLayout(numaLayout)
+
+        self.applyButton = QPushButton("Apply")
+        self.applyButton.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        self.applyButton.setEnabled(False)
+        self.applyButton.clicked.connect(self.applyTuning)
+        self.mainLayout.addWidget(self.applyButton)
+        self.setLayout(self.mainLayout)
+        self.show()
+        self.reload()
+
+    def reload(self) -> None:
+        self.jobRunner.submit(loadCpuTuning, self.domain, key=self.domainKey,
+                              onSuccess=self.showTuning,
+                              onFailure=self.showError)
+
+    def showTuning(self, result: tuple[HostTopology, CpuPlacement]) -> None:
+        self.topology, self.placement = result
+        self.topologyLabel.setText("Host: {} CPUs, online {}; NUMA {}".format(
+            self.topology.cpuCount, formatCpuList(self.topology.onlineCpus),
+            ", ".join("node {}: {}".format(node, formatCpuList(cpus))
+                      for node, cpus in sorted(self.topology.cells.items()))))
+
+        rows = [("vCPU {}".format(vcpu), cpus,
+                 self.placement.currentCpus[vcpu]
+                 if vcpu < len(self.placement.currentCpus) else None)
+                for vcpu, cpus in enumerate(self.placement.vcpuPins)]
+        rows.append(("emulator", self.placement.emulatorPin, None))
+        self.pinTable.setRowCount(len(rows))
+        for row, (thread, cpus, current) in enumerate(rows):
+            threadItem = QTableWidgetItem(thread)
+            threadItem.setFlags(threadItem.flags() & ~Qt.ItemIsEditable)
+            currentItem = QTableWidgetItem("-" if current is None
+                                           else str(current))
+            currentItem.setFlags(currentItem.flags() & ~Qt.ItemIsEditable)
+            self.pinTable.setItem(row, 0, threadItem)
+            self.pinTable.setItem(row, 1,
+                                  QTableWidgetItem(formatCpuList(cpus)))
+            self.pinTable.setItem(row, 2, currentItem)
+
+        modeIndex = self.numaModeCombo.findData(self.placement.numaMode)
+        if modeIndex >= 0:
+            self.numaModeCombo.setCurrentIndex(modeIndex)
+        self.numaNodesetField.setText(self.placement.numaNodeset)
+        self.applyButton.setEnabled(True)
+
+    def applyTuning(self) -> None:
+        try:
+            pins = [parseCpuList(self.pinTable.item(row, 1).text())
+                    for row in range(self.pinTable.rowCount())]
+        except ValueError:
+            self.showError("CPU lists look like 0-3,8")
+            return
+        vcpuPins = {vcpu: cpus for vcpu, cpus in enumerate(pins[:-1])
+                    if cpus != self.placement.vcpuPins[vcpu]}
+        emulatorPin = pins[-1] if pins[-1] != self.placement.emulatorPin \
+            else None
+        numaNodeset = self.numaNodesetField.text().strip()
+        numaMode = self.numaModeCombo.currentData()
+        if numaNodeset == self.placement.numaNodeset \
+                and numaMode == self.placement.numaMode:
+            numaNodeset = ""
+        self.applyButton.setEnabled(False)
+        self.jobRunner.submit(applyCpuTuning, self.domain, vcpuPins,
+                              emulatorPin, self.topology.cpuCount, numaMode,
+                              numaNodeset, key=self.domainKey,
+                              onSuccess=lambda _: self.reload(),
+                              onFailure=self.showError)
+
+    def showError(self, message: str) -> None:
+        self.warning = WarningDialogue(message)
+        self.applyButton.setEnabled(self.placement is not None)
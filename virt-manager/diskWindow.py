@@ -1,37 +1,138 @@
-from libvirt import virDomain, libvirtError, \
-     VIR_DOMAIN_AFFECT_CONFIG, VIR_DOMAIN_AFFECT_LIVE
-from libvirtUtils import DiskInfo, getALlDiskInfo, detachDisk, attachDisk
+from libvirt import virDomain
+from libvirtUtils import DiskInfo, DiskSettings, VolumeSettings, \
+    BlockRates, DiskStatsCollector, detachDisk, attachNewDisk
 from warningDialogue import WarningDialogue
 from newDiskDialogue import NewDiskDialogue
-from PyQt5.QtCore import Qt
+from ioTuneDialogue import IoTuneDialogue
+from newVolumeDialogue import NewVolumeDialogue
+import resourceCache
+from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import QWidget, QLabel, QPushButton, \
     QVBoxLayout, QHBoxLayout, QScrollArea, QFrame, QSizePolicy
-from PyQt5.QtGui import QIcon
 from functools import partial
 
 
+IO_POLL_INTERVAL = 1000
+
+
+def formatBytes(bytesPerSec: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if bytesPerSec < 1024:
+            return "{:.1f}{}/s".format(bytesPerSec, unit)
+        bytesPerSec /= 1024
+    return "{:.1f}GB/s".format(bytesPerSec)
+
+
+def formatRates(rates: BlockRates | None) -> str:
+    if rates is None:
+        return "-"
+    return "R {:.0f} IOPS {} {:.2f}ms | W {:.0f} IOPS {} {:.2f}ms".format(
+        rates.readIops, formatBytes(rates.readBytesPerSec),
+        rates.readLatencyMs, rates.writeIops,
+        formatBytes(rates.writeBytesPerSec), rates.writeLatencyMs)
+
+
 class DiskGuiElement:
     def __init__(self, detachAttachButton: QPushButton,
-                 nameField: QLabel) -> None:
+                 nameField: QLabel, ioField: QLabel) -> None:
         self.detachAttachButton = detachAttachButton
         self.nameField = nameField
+        self.ioField = ioField
+        self.renderedRates: BlockRates | None = None
+
+    def updateRates(self, rates: BlockRates | None) -> None:
+        # setText repaints the label, so identical samples are skipped.
+        if rates == self.renderedRates:
+            return
+        self.ioField.setText(formatRates(rates))
+        self.renderedRates = rates
 
 
 class DiskWindow(QWidget):
-    def __init__(self, domain: virDomain, parentWindow) -> None:
+    def __init__(self, domain: virDomain, domainKey: str,
+                 parentWindow) -> None:
         super().__init__()
-        self.newDiskInfo = None
+        self.newDiskInfo: DiskSettings | None = None
+        self.ioTuneDialogue = None
+        self.volumeDialogue = None
         self.domain = domain
         self.parentWindow = parentWindow
+        self.jobRunner = parentWindow.jobRunner
+        self.descriptionCache = parentWindow.descriptionCache
+        self.domainKey = domainKey
+        self.domainActive = False
+        self.ioJobKey = domainKey + "/io"
+        self.statsCollector = DiskStatsCollector(domain)
         self.setWindowTitle(domain.name() + " disks")
 
-        self.allDiskInfo = getALlDiskInfo(domain)
+        self.allDiskInfo: list[DiskInfo] = []
         self.allDiskNames: set[str] = set()
-        self.allDiskGuiElements: list[DiskGuiElement] = []
+        self.allDiskGuiElements: dict[str, DiskGuiElement] = {}
         self.initUi()
+        self.reloadDisks()
+
+        self.ioTimer = QTimer(self)
+        self.ioTimer.timeout.connect(self.sampleIo)
+        self.ioTimer.start(IO_POLL_INTERVAL)
+
+    def reloadDisks(self) -> None:
+        self.jobRunner.submit(self.loadDisks, key=self.domainKey,
+                              onSuccess=self.showDisks,
+                              onFailure=self.showError)
+
+    def loadDisks(self) -> tuple[list[DiskInfo], bool]:
+        description = self.descriptionCache.get(self.domain, self.domainKey)
+        return description.allDiskInfo(), self.domain.isActive()
+
+    def showDisks(self, result: tuple[list[DiskInfo], bool]) -> None:
+        self.clearDiskLayout()
+        self.allDiskInfo, self.domainActive = result
+        self.attachButton.setEnabled(self.domainActive)
+        for diskInfo in self.allDiskInfo:
+            self.allDiskNames.add(diskInfo.name)
+            self.initDiskLayout(diskInfo)
+        counters = self.descriptionCache.counters()
+        self.cacheLabel.setText(
+            "Device XML cache: {} hits, {} misses, {} cached".format(
+                counters["hits_total"], counters["misses_total"],
+                counters["entries"]))
+
+    def sampleIo(self) -> None:
+        if not self.domainActive or self.jobRunner.isBusy(self.ioJobKey):
+            return
+        self.jobRunner.submit(self.statsCollector.sample,
+                              sorted(self.allDiskNames), key=self.ioJobKey,
+                              onSuccess=self.showRates,
+                              onFailure=self.ioFailed)
+
+    def showRates(self, allRates: dict[str, BlockRates]) -> None:
+        for name, diskGuiElement in self.allDiskGuiElements.items():
+            diskGuiElement.updateRates(allRates.get(name))
+
+    def ioFailed(self, message: str) -> None:
+        # Usually the guest just stopped; the next reload says so.
+        self.showRates({})
+
+    def clearDiskLayout(self) -> None:
+        self.allDiskNames.clear()
+        self.allDiskGuiElements.clear()
+        while self.diskLayout.count() != 0:
+            item = self.diskLayout.takeAt(0)
+            rowLayout = item.layout()
+            if rowLayout is not None:
+                while rowLayout.count() != 0:
+                    rowLayout.takeAt(0).widget().deleteLater()
+                rowLayout.deleteLater()
+            elif item.widget() is not None:
+                item.widget().deleteLater()
+
+    def showError(self, message: str) -> None:
+        self.warning = WarningDialogue(message)
+        self.newDiskInfo = None
+        self.close()
 
     def initUi(self) -> None:
-        self.setMinimumSize(250, 125)
+        self.setMinimumSize(520, 125)
         self.mainLayout = QVBoxLayout()
 
         self.scrollArea = QScrollArea()
@@ -42,25 +143,32 @@ class DiskWindow(QWidget):
 
         seperationLine = QFrame()
         seperationLine.setFrameShape(QFrame.HLine)
-        attachButton = QPushButton()
-        attachButton.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
-        attachButton.setIcon(QIcon("resources/bootButton.png"))
-        if not self.domain.isActive():
-            attachButton.setEnabled(False)
-        attachButton.clicked.connect(partial(self.makeDiskDialogue, self.domain))
-
-        self.scrollLayout.addWidget(attachButton)
-        self.scrollLayout.setAlignment(attachButton, Qt.AlignRight)
+        self.attachButton = QPushButton()
+        self.attachButton.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        self.attachButton.setIcon(resourceCache.icon("bootButton"))
+        self.attachButton.setEnabled(False)
+        self.attachButton.clicked.connect(partial(self.makeDiskDialogue,
+                                                  self.domain))
+
+        newVolumeButton = QPushButton("New volume")
+        newVolumeButton.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        newVolumeButton.clicked.connect(self.openVolumeDialogue)
+
+        buttonLayout = QHBoxLayout()
+        buttonLayout.addStretch()
+        buttonLayout.addWidget(newVolumeButton)
+        buttonLayout.addWidget(self.attachButton)
+        self.scrollLayout.addLayout(buttonLayout)
         self.scrollLayout.addWidget(seperationLine)
 
         self.diskLayout = QVBoxLayout()
-        for diskInfo in self.allDiskInfo:
-            self.allDiskNames.add(diskInfo.name)
-            self.initDiskLayout(diskInfo)
+        self.scrollLayout.addLayout(self.diskLayout)
         scrollContent.setLayout(self.scrollLayout)
         self.scrollArea.setWidget(scrollContent)
 
         self.mainLayout.addWidget(self.scrollArea)
+        self.cacheLabel = QLabel()
+        self.mainLayout.addWidget(self.cacheLabel)
         self.setLayout(self.mainLayout)
         self.show()
         self.setFocus()
@@ -72,61 +180,86 @@ class DiskWindow(QWidget):
 
         detachButton = QPushButton()
         detachButton.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
-        detachButton.setIcon(QIcon("resources/shutdownButton.png"))
-        if not self.domain.isActive():
-            detachButton.setEnabled(False)
+        detachButton.setIcon(resourceCache.icon("shutdownButton"))
+        detachButton.setEnabled(self.domainActive)
         nameField = QLabel(diskInfo.name)
+        ioField = QLabel(formatRates(None))
+
+        throttleButton = QPushButton("Limits")
+        throttleButton.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        throttleButton.clicked.connect(partial(self.openIoTuneDialogue,
+                                               diskInfo.name))
 
-        diskGuiElement = DiskGuiElement(detachButton, nameField)
-        self.allDiskGuiElements.append(diskGuiElement)
+        diskGuiElement = DiskGuiElement(detachButton, nameField, ioField)
+        self.allDiskGuiElements[diskInfo.name] = diskGuiElement
         detachButton.clicked.connect(partial(self.removeDisk,
                                                    self.domain,
                                                    diskInfo))
 
         diskInfoLayout.addWidget(detachButton)
         diskInfoLayout.addWidget(nameField)
+        diskInfoLayout.addWidget(ioField)
+        diskInfoLayout.addWidget(throttleButton)
 
         self.diskLayout.addLayout(diskInfoLayout)
         self.diskLayout.addWidget(seperationLine)
 
-        self.scrollLayout.addLayout(self.diskLayout)
-
     def removeDisk(self, domain: virDomain, diskInfo: DiskInfo) -> None:
-        try:
-            detachDisk(domain, diskInfo)
-            self.allDiskNames.remove(diskInfo.name)
-        except libvirtError as err:
-            self.warning = WarningDialogue(err.get_error_message())
-            self.close()
-    
+        self.jobRunner.submit(detachDisk, domain, diskInfo,
+                              key=self.domainKey,
+                              onSuccess=self.devicesChanged,
+                              onFailure=self.showError)
+
+    def devicesChanged(self, _=None) -> None:
+        self.descriptionCache.invalidate(self.domainKey)
+        self.reloadDisks()
+
+    def openIoTuneDialogue(self, target: str) -> None:
+        self.ioTuneDialogue = IoTuneDialogue(self, self.domain, target)
+
+    def openVolumeDialogue(self) -> None:
+        self.volumeDialogue = NewVolumeDialogue(self, self.domain.connect())
+        self.volumeDialogue.volumeCreated.connect(self.volumeCreated)
+
+    def volumeCreated(self, path: str, settings: VolumeSettings,
+                      target: str) -> None:
+        if len(target) == 0:
+            return
+        if not self.domainActive or target in self.allDiskNames:
+            self.showWarning("Created {}, but it could not be attached as "
+                             "{}.".format(path, target))
+            return
+        self.jobRunner.submit(attachNewDisk, self.domain,
+                              DiskSettings(target, path,
+                                           format=settings.format),
+                              key=self.domainKey,
+                              onSuccess=self.devicesChanged,
+                              onFailure=self.showError)
+
+    def showWarning(self, message: str) -> None:
+        self.warning = WarningDialogue(message)
+
     def makeDiskDialogue(self, domain: virDomain) -> None:
         self.diskDialogue = NewDiskDialogue(self, domain)
 
     def addDisk(self, domain: virDomain) -> None:
-        try:
-            xml = None
-            self.diskDialogue.getInfo()
-            with open("resources/diskXMLTemplate.xml", 'r') as xmlTemplate:
-                if self.newDiskInfo is None:
-                    return
-                diskName, sourcePath, isReadOnly = self.newDiskInfo
-                featuresString = ""
-                if isReadOnly:
-                    featuresString = "<readonly/>"
-                xml = xmlTemplate.read().format(sourcePath, diskName, featuresString)
-            if xml is None:
-                self.newDiskInfo = None
-                return
-            attachDisk(domain, xml)
-            newDiskInfo = DiskInfo(diskName, xml)
-            self.initDiskLayout(newDiskInfo)
-            self.newDiskInfo = None
-        except libvirtError as err:
-            self.warning = WarningDialogue(err.get_error_message())
-            self.newDiskInfo = None
-            self.close()
+        self.diskDialogue.getInfo()
+        if self.newDiskInfo is None:
+            return
+        settings = self.newDiskInfo
+        self.newDiskInfo = None
+        # Format detection may ask the host, so it runs in the job.
+        self.jobRunner.submit(attachNewDisk, domain, settings,
+                              key=self.domainKey,
+                              onSuccess=self.devicesChanged,
+                              onFailure=self.showError)
 
     def closeEvent(self, event) -> None:
+        self.ioTimer.stop()
+        if self.ioTuneDialogue is not None:
+            self.ioTuneDialogue.close()
+        if self.volumeDialogue is not None:
+            self.volumeDialogue.close()
         self.parentWindow.setEnabled(True)
         self.parentWindow.setFocus()
         event.accept()
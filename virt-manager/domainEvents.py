@@ -0,0 +1,54 @@
+import libvirt
+from instrumentation import instrument
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+class DomainEventListener(QObject):
+    lifecycleChanged = pyqtSignal(str, object, int, int)
+    domainRebooted = pyqtSignal(str, object)
+    devicesChanged = pyqtSignal(str, object, str)
+
+    def __init__(self, host: str, conn: libvirt.virConnect) -> None:
+        super().__init__()
+        self.host = host
+        self.conn = conn
+        self.callbackIds: list[int] = []
+
+    def register(self) -> bool:
+        callbacks = ((libvirt.VIR_DOMAIN_EVENT_ID_LIFECYCLE, self.onLifecycle),
+                     (libvirt.VIR_DOMAIN_EVENT_ID_REBOOT, self.onReboot),
+                     (libvirt.VIR_DOMAIN_EVENT_ID_DEVICE_ADDED,
+                      self.onDeviceChanged),
+                     (libvirt.VIR_DOMAIN_EVENT_ID_DEVICE_REMOVED,
+                      self.onDeviceChanged))
+        try:
+            for eventId, callback in callbacks:
+                self.callbackIds.append(self.conn.domainEventRegisterAny(
+                    None, eventId, callback, None))
+        except libvirt.libvirtError:
+            self.deregister()
+            return False
+        return True
+
+    def deregister(self) -> None:
+        for callbackId in self.callbackIds:
+            try:
+                self.conn.domainEventDeregisterAny(callbackId)
+            except libvirt.libvirtError:
+                pass
+        self.callbackIds = []
+
+    def isRegistered(self) -> bool:
+        return len(self.callbackIds) != 0
+
+    def onLifecycle(self, conn, domain, event, detail, opaque) -> None:
+        self.lifecycleChanged.emit(self.host,
+                                   instrument(domain, self.host),
+                                   event, detail)
+
+    def onReboot(self, conn, domain, opaque) -> None:
+        self.domainRebooted.emit(self.host, instrument(domain, self.host))
+
+    def onDeviceChanged(self, conn, domain, device, opaque) -> None:
+        self.devicesChanged.emit(self.host, instrument(domain, self.host),
+                                 device)
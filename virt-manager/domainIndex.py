@@ -0,0 +1,132 @@
+from libvirtUtils import DomainStats
+from typing import NamedTuple
+import re
+
+
+class DomainFilter(NamedTuple):
+    text: str = ""
+    regex: bool = False
+    states: frozenset[int] | None = None
+    host: str | None = None
+    minCpuPercent: float = 0.0
+    # KiB
+    minMemory: int = 0
+
+
+class DomainIndex:
+    # Keeps the keys matching the current filter up to date from each
+    # poll's changed stats, and answers a new filter from the state and
+    # host buckets and the previous name matches instead of every domain.
+    def __init__(self, cpuPercent) -> None:
+        self.cpuPercent = cpuPercent
+        self.allStats: dict[str, DomainStats] = {}
+        self.keysByState: dict[int, set[str]] = {}
+        self.keysByHost: dict[str, set[str]] = {}
+        self.foldedNames: dict[str, str] = {}
+        self.domainFilter = DomainFilter()
+        self.nameMatcher: re.Pattern | None = None
+        self.matched: set[str] = set()
+        # Keys whose name contains textQuery; while typing narrows the
+        # query only these need checking.
+        self.textQuery = ""
+        self.textMatches: set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self.allStats)
+
+    def update(self, allStats) -> tuple[set[str], set[str]]:
+        # Returns the keys that entered and left the filter.
+        entered = set()
+        left = set()
+        for stats in allStats:
+            key = stats.key
+            previous = self.allStats.get(key)
+            if previous is None or previous.state != stats.state:
+                if previous is not None:
+                    self.keysByState[previous.state].discard(key)
+                self.keysByState.setdefault(stats.state, set()).add(key)
+            if previous is None or previous.host != stats.host:
+                if previous is not None:
+                    self.keysByHost[previous.host].discard(key)
+                self.keysByHost.setdefault(stats.host, set()).add(key)
+            if previous is None or previous.name != stats.name:
+                foldedName = stats.name.casefold()
+                self.foldedNames[key] = foldedName
+                if self.textQuery in foldedName:
+                    self.textMatches.add(key)
+                else:
+                    self.textMatches.discard(key)
+            self.allStats[key] = stats
+            if self.accepts(key, stats):
+                if key not in self.matched:
+                    self.matched.add(key)
+                    entered.add(key)
+            elif key in self.matched:
+                self.matched.discard(key)
+                left.add(key)
+        return entered, left
+
+    def remove(self, key: str) -> bool:
+        stats = self.allStats.pop(key, None)
+        if stats is None:
+            return False
+        self.keysByState[stats.state].discard(key)
+        self.keysByHost[stats.host].discard(key)
+        del self.foldedNames[key]
+        self.textMatches.discard(key)
+        wasMatched = key in self.matched
+        self.matched.discard(key)
+        return wasMatched
+
+    def accepts(self, key: str, stats: DomainStats) -> bool:
+        domainFilter = self.domainFilter
+        if domainFilter.states is not None \
+                and stats.state not in domainFilter.states:
+            return False
+        if domainFilter.host is not None and stats.host != domainFilter.host:
+            return False
+        if stats.memory < domainFilter.minMemory:
+            return False
+        if domainFilter.minCpuPercent > 0 \
+                and self.cpuPercent(key) < domainFilter.minCpuPercent:
+            return False
+        if self.nameMatcher is not None:
+            return self.nameMatcher.search(stats.name) is not None
+        return len(domainFilter.text) == 0 or key in self.textMatches
+
+    def setFilter(self, domainFilter: DomainFilter) -> set[str]:
+        # Raises re.error for a bad regex; the filter bar checks first.
+        self.nameMatcher = None
+        if domainFilter.regex and len(domainFilter.text) != 0:
+            self.nameMatcher = re.compile(domainFilter.text, re.IGNORECASE)
+        textQuery = "" if domainFilter.regex \
+            else domainFilter.text.casefold()
+        if textQuery != self.textQuery:
+            # "abc" only matches names that "ab" matched.
+            pool = self.textMatches if self.textQuery in textQuery \
+                else self.foldedNames.keys()
+            self.textMatches = {key for key in pool
+                                if textQuery in self.foldedNames[key]}
+            self.textQuery = textQuery
+        self.domainFilter = domainFilter
+
+        buckets = []
+        if domainFilter.states is not None:
+            buckets.append(set().union(*(self.keysByState.get(state, ())
+                                         for state in domainFilter.states)))
+        if domainFilter.host is not None:
+            buckets.append(self.keysByHost.get(domainFilter.host, set()))
+        if len(textQuery) != 0:
+            buckets.append(self.textMatches)
+        if len(buckets) == 0:
+            candidates = set(self.allStats)
+        else:
+            # Set intersections run in C; start from the smallest bucket.
+            buckets.sort(key=len)
+            candidates = buckets[0].intersection(*buckets[1:])
+        if self.nameMatcher is not None or domainFilter.minMemory > 0 \
+                or domainFilter.minCpuPercent > 0:
+            candidates = {key for key in candidates
+                          if self.accepts(key, self.allStats[key])}
+        self.matched = candidates
+        return self.matched
@@ -0,0 +1,82 @@
+from libvirtUtils import DomainInfo, DomainStats
+from libvirt import virDomain
+from typing import NamedTuple
+
+
+class DomainEntry:
+    __slots__ = ("info", "widgets")
+
+    def __init__(self, info: DomainInfo, widgets=None) -> None:
+        self.info = info
+        # Whatever the view keeps per domain, e.g. a DomainGuiElement.
+        self.widgets = widgets
+
+
+class ReconcileResult(NamedTuple):
+    added: list[str]
+    removed: list[DomainEntry]
+    renamed: list[str]
+    updated: list[str]
+
+
+class DomainRegistry:
+    # Keyed by domainKey(host, uuid): names can change and IDs are -1 for
+    # every inactive domain, but a UUID is stable for the domain's life.
+    def __init__(self) -> None:
+        self.entries: dict[str, DomainEntry] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def __iter__(self):
+        return iter(self.entries.values())
+
+    def get(self, key: str) -> DomainEntry | None:
+        return self.entries.get(key)
+
+    def add(self, domain: virDomain, stats: DomainStats) -> DomainEntry:
+        entry = DomainEntry(DomainInfo(domain, stats))
+        self.entries[stats.key] = entry
+        return entry
+
+    def remove(self, key: str) -> DomainEntry | None:
+        return self.entries.pop(key, None)
+
+    def update(self, stats: DomainStats) -> DomainEntry | None:
+        entry = self.entries.get(stats.key)
+        if entry is not None:
+            entry.info.stats = stats
+        return entry
+
+    def reconcile(self, snapshots: dict[str, DomainStats],
+                  domains: dict[str, virDomain],
+                  removeMissing: bool = True) -> ReconcileResult:
+        # One pass over the snapshots plus one set difference, so the cost
+        # stays linear in the number of domains however many churn.
+        added = []
+        renamed = []
+        updated = []
+        for key, stats in snapshots.items():
+            entry = self.entries.get(key)
+            if entry is None:
+                self.add(domains[key], stats)
+                added.append(key)
+                continue
+            if entry.info.domain is None:
+                # Restored from the snapshot cache before the host answered.
+                entry.info.domain = domains[key]
+            lastStats = entry.info.stats
+            if lastStats == stats:
+                continue
+            if lastStats.name != stats.name:
+                renamed.append(key)
+            entry.info.stats = stats
+            updated.append(key)
+        removed = []
+        if removeMissing:
+            removed = [self.entries.pop(key)
+                       for key in self.entries.keys() - snapshots.keys()]
+        return ReconcileResult(added, removed, renamed, updated)
@@ -0,0 +1,377 @@
+from libvirt import VIR_DOMAIN_RUNNING, VIR_DOMAIN_PAUSED, \
+    VIR_DOMAIN_SHUTOFF, virDomain
+from libvirtUtils import DomainInfo, DomainStats, \
+    SUSPEND_RESUME_DISABLED_STATES, SHUTDOWN_BOOT_DISABLED_STATES
+from metricsStore import MetricsStore
+from migration import MIGRATABLE_STATES
+from domainIndex import DomainFilter, DomainIndex
+from consoleThumbnails import ThumbnailCache
+from sparkline import paintSparkline, SPARKLINE_POINTS, SPARKLINE_SIZE
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QEvent, \
+    QRect, QSize, pyqtSignal
+from PyQt5.QtWidgets import QApplication, QTableView, QHeaderView, \
+    QAbstractItemView, QStyledItemDelegate, QStyleOptionButton, QStyle
+from PyQt5.QtGui import QIcon
+import resourceCache
+
+NAME_COLUMN = 0
+HOST_COLUMN = 1
+STATE_COLUMN = 2
+CPU_COLUMN = 3
+HISTORY_COLUMN = 4
+MEMORY_COLUMN = 5
+VCPU_COLUMN = 6
+CPU_TIME_COLUMN = 7
+ACTIONS_COLUMN = 8
+COLUMN_HEADERS = ("Name", "Host", "State", "CPU", "CPU History", "Memory",
+                  "vCPUs", "Cpu Time", "")
+
+KEY_ROLE = Qt.UserRole
+STATE_ROLE = Qt.UserRole + 1
+HISTORY_ROLE = Qt.UserRole + 2
+
+ACTIONS = ("suspendResume", "shutdownBoot", "forceShutdown", "destroy",
+           "disks", "cpu", "migrate")
+BUTTON_WIDTHS = (28, 28, 28, 28, 56, 44, 64)
+BUTTON_HEIGHT = 28
+BUTTON_MARGIN = 4
+ROW_HEIGHT = BUTTON_HEIGHT + 2 * BUTTON_MARGIN
+# CPU% sorting granularity.
+SORT_LOAD_STEP = 5.0
+# Console thumbnails are captured at this size while the table is shown.
+THUMBNAIL_HEIGHT = ROW_HEIGHT - 4
+THUMBNAIL_WIDTH = THUMBNAIL_HEIGHT * 16 // 10
+
+
+def contiguousRanges(rows: list[int]) -> list[tuple[int, int]]:
+    ranges = []
+    for row in rows:
+        if len(ranges) != 0 and ranges[-1][1] == row - 1:
+            ranges[-1] = (ranges[-1][0], row)
+        else:
+            ranges.append((row, row))
+    return ranges
+
+
+class DomainTableModel(QAbstractTableModel):
+    def __init__(self, metrics: MetricsStore, parent=None) -> None:
+        super().__init__(parent)
+        self.metrics = metrics
+        # Every known domain; rows holds only those the filter lets through,
+        # so filtered-out domains never reach the view.
+        self.allDomainInfo: dict[str, DomainInfo] = {}
+        self.domainIndex = DomainIndex(metrics.cpuPercent)
+        self.rows: list[DomainInfo] = []
+        self.rowByKey: dict[str, int] = {}
+        self.sortColumn: int | None = None
+        self.sortOrder = Qt.AscendingOrder
+        # Set while console thumbnails are shown next to the names.
+        self.thumbnails: ThumbnailCache | None = None
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(COLUMN_HEADERS)
+
+    def headerData(self, section: int, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return COLUMN_HEADERS[section]
+        return None
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        domainInfo = self.rows[index.row()]
+        stats = domainInfo.stats
+        if role == KEY_ROLE:
+            return stats.key
+        if role == STATE_ROLE:
+            return stats.state
+        if role == HISTORY_ROLE:
+            return self.metrics.series(stats.key, count=SPARKLINE_POINTS)
+        column = index.column()
+        if role == Qt.DecorationRole and column == NAME_COLUMN \
+                and self.thumbnails is not None:
+            cached = self.thumbnails.get(stats.key)
+            return cached.image if cached is not None else None
+        if role != Qt.DisplayRole:
+            return None
+        if column == NAME_COLUMN:
+            return stats.name
+        if column == HOST_COLUMN:
+            return stats.host
+        if column == STATE_COLUMN:
+            return domainInfo.stateToString(stats.state)
+        if column == CPU_COLUMN:
+            return "{:.1f}%".format(self.metrics.cpuPercent(stats.key))
+        if column == MEMORY_COLUMN:
+            return "{}/{}KB".format(stats.memory, stats.maxMemory)
+        if column == VCPU_COLUMN:
+            return stats.vcpuCount
+        if column == CPU_TIME_COLUMN:
+            return "{}ns".format(stats.cpuTime)
+        return None
+
+    def domainInfo(self, key: str) -> DomainInfo | None:
+        return self.allDomainInfo.get(key)
+
+    def reconcile(self, snapshots: dict[str, DomainStats],
+                  domains: dict[str, virDomain],
+                  removeMissing: bool) -> None:
+        goneRows = []
+        if removeMissing:
+            for key in self.allDomainInfo.keys() - snapshots.keys():
+                del self.allDomainInfo[key]
+                if self.domainIndex.remove(key):
+                    goneRows.append(self.rowByKey[key])
+
+        changedStats = []
+        for key, stats in snapshots.items():
+            domainInfo = self.allDomainInfo.get(key)
+            if domainInfo is None:
+                self.allDomainInfo[key] = DomainInfo(domains[key], stats)
+                changedStats.append(stats)
+                continue
+            if domainInfo.domain is None:
+                # Restored from the snapshot cache before the host answered.
+                domainInfo.domain = domains[key]
+            if domainInfo.stats != stats:
+                domainInfo.stats = stats
+                changedStats.append(stats)
+        entered, left = self.domainIndex.update(changedStats)
+        self.removeRowList(goneRows + [self.rowByKey[key] for key in left])
+
+        changedRows = sorted(self.rowByKey[stats.key]
+                             for stats in changedStats
+                             if stats.key in self.rowByKey)
+        lastColumn = len(COLUMN_HEADERS) - 1
+        for first, last in contiguousRanges(changedRows):
+            self.dataChanged.emit(self.index(first, 0),
+                                  self.index(last, lastColumn))
+
+        if len(entered) != 0:
+            first = len(self.rows)
+            self.beginInsertRows(QModelIndex(), first,
+                                 first + len(entered) - 1)
+            for row, key in enumerate(entered, first):
+                self.rows.append(self.allDomainInfo[key])
+                self.rowByKey[key] = row
+            self.endInsertRows()
+
+        if self.sortColumn is not None \
+                and (len(changedRows) != 0 or len(entered) != 0):
+            self.sort(self.sortColumn, self.sortOrder)
+
+    def setThumbnails(self, thumbnails: ThumbnailCache | None) -> None:
+        self.thumbnails = thumbnails
+        if len(self.rows) != 0:
+            self.dataChanged.emit(self.index(0, NAME_COLUMN),
+                                  self.index(len(self.rows) - 1, NAME_COLUMN),
+                                  [Qt.DecorationRole])
+
+    def thumbnailChanged(self, key: str) -> None:
+        row = self.rowByKey.get(key)
+        if row is not None:
+            index = self.index(row, NAME_COLUMN)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def setFilter(self, domainFilter: DomainFilter) -> None:
+        matched = self.domainIndex.setFilter(domainFilter)
+        self.beginResetModel()
+        # In model order, so unsorted views do not reshuffle with the set.
+        self.rows = [domainInfo for key, domainInfo
+                     in self.allDomainInfo.items() if key in matched]
+        if self.sortColumn is not None:
+            self.rows.sort(key=self.sortKey(self.sortColumn),
+                           reverse=self.sortOrder == Qt.DescendingOrder)
+        self.rowByKey = {domainInfo.stats.key: row
+                         for row, domainInfo in enumerate(self.rows)}
+        self.endResetModel()
+
+    def sortKey(self, column: int):
+        if column == NAME_COLUMN:
+            return lambda domainInfo: domainInfo.stats.name
+        if column == HOST_COLUMN:
+            return lambda domainInfo: domainInfo.stats.host
+        if column == STATE_COLUMN:
+            return lambda domainInfo: domainInfo.stats.state
+        if column in (CPU_COLUMN, HISTORY_COLUMN):
+            # Bucketed, so jitter between ticks does not reshuffle rows;
+            # the stable sort keeps the previous order within a bucket.
+            return lambda domainInfo: round(self.metrics.cpuPercent(
+                domainInfo.stats.key) / SORT_LOAD_STEP)
+        if column == MEMORY_COLUMN:
+            return lambda domainInfo: domainInfo.stats.memory
+        if column == VCPU_COLUMN:
+            return lambda domainInfo: domainInfo.stats.vcpuCount
+        if column == CPU_TIME_COLUMN:
+            return lambda domainInfo: domainInfo.stats.cpuTime
+        return None
+
+    def sort(self, column: int, order=Qt.AscendingOrder) -> None:
+        sortKey = self.sortKey(column)
+        if sortKey is None:
+            return
+        self.sortColumn = column
+        self.sortOrder = order
+        self.layoutAboutToBeChanged.emit()
+        oldKeys = [domainInfo.stats.key for domainInfo in self.rows]
+        self.rows.sort(key=sortKey, reverse=order == Qt.DescendingOrder)
+        self.rowByKey = {domainInfo.stats.key: row
+                         for row, domainInfo in enumerate(self.rows)}
+        # Keeps the selection on the same domains after they move.
+        for index in self.persistentIndexList():
+            row = self.rowByKey[oldKeys[index.row()]]
+            self.changePersistentIndex(index,
+                                       self.index(row, index.column()))
+        self.layoutChanged.emit()
+
+    def removeDomain(self, key: str) -> None:
+        self.allDomainInfo.pop(key, None)
+        if self.domainIndex.remove(key):
+            self.removeRowList([self.rowByKey[key]])
+
+    def removeRowList(self, rows: list[int]) -> None:
+        if len(rows) == 0:
+            return
+        for first, last in reversed(contiguousRanges(sorted(rows))):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self.rows[first:last + 1]
+            self.endRemoveRows()
+        self.rowByKey = {domainInfo.stats.key: row
+                          for row, domainInfo in enumerate(self.rows)}
+
+
+class SparklineDelegate(QStyledItemDelegate):
+    def paint(self, painter, option, index: QModelIndex) -> None:
+        super().paint(painter, option, index)
+        paintSparkline(painter, option.rect.adjusted(2, 4, -2, -4),
+                       index.data(HISTORY_ROLE))
+
+    def sizeHint(self, option, index: QModelIndex) -> QSize:
+        return QSize(SPARKLINE_SIZE.width(), ROW_HEIGHT)
+
+
+class DomainActionDelegate(QStyledItemDelegate):
+    actionTriggered = pyqtSignal(str, str)
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self.icons = {name: resourceCache.icon(name)
+                      for name in resourceCache.ICON_NAMES}
+
+    def buttonRects(self, rect: QRect) -> list[QRect]:
+        rects = []
+        left = rect.left() + BUTTON_MARGIN
+        top = rect.top() + (rect.height() - BUTTON_HEIGHT) // 2
+        for width in BUTTON_WIDTHS:
+            rects.append(QRect(left, top, width, BUTTON_HEIGHT))
+            left += width + BUTTON_MARGIN
+        return rects
+
+    def buttonStates(self, state: int) -> list[tuple[QIcon | None, str, bool]]:
+        if state == VIR_DOMAIN_PAUSED:
+            suspendResumeIcon = self.icons["resumeButton"]
+        else:
+            suspendResumeIcon = self.icons["pauseButton"]
+        if state == VIR_DOMAIN_SHUTOFF:
+            shutdownBootIcon = self.icons["bootButton"]
+        else:
+            shutdownBootIcon = self.icons["shutdownButton"]
+        return [(suspendResumeIcon, "",
+                 state not in SUSPEND_RESUME_DISABLED_STATES),
+                (shutdownBootIcon, "",
+                 state not in SHUTDOWN_BOOT_DISABLED_STATES),
+                (self.icons["forceShutdownButton"], "",
+                 state == VIR_DOMAIN_RUNNING),
+                (self.icons["destroyButton"], "", True),
+                (None, "Disks", True),
+                (None, "CPU", True),
+                (None, "Migrate", state in MIGRATABLE_STATES)]
+
+    def paint(self, painter, option, index: QModelIndex) -> None:
+        widget = option.widget
+        style = widget.style() if widget is not None else QApplication.style()
+        states = self.buttonStates(index.data(STATE_ROLE))
+        for rect, (icon, text, enabled) in zip(self.buttonRects(option.rect),
+                                               states):
+            button = QStyleOptionButton()
+            button.rect = rect
+            button.text = text
+            if icon is not None:
+                button.icon = icon
+                button.iconSize = QSize(16, 16)
+            button.state = QStyle.State_Enabled if enabled \
+                else QStyle.State_None
+            style.drawControl(QStyle.CE_PushButton, button, painter, widget)
+
+    def sizeHint(self, option, index: QModelIndex) -> QSize:
+        return QSize(sum(BUTTON_WIDTHS) + BUTTON_MARGIN * (len(ACTIONS) + 1),
+                     ROW_HEIGHT)
+
+    def editorEvent(self, event, model, option, index: QModelIndex) -> bool:
+        if event.type() != QEvent.MouseButtonRelease \
+                or event.button() != Qt.LeftButton:
+            return False
+        states = self.buttonStates(index.data(STATE_ROLE))
+        for action, rect, (_, _, enabled) in zip(
+                ACTIONS, self.buttonRects(option.rect), states):
+            if enabled and rect.contains(event.pos()):
+                self.actionTriggered.emit(index.data(KEY_ROLE), action)
+                return True
+        return False
+
+
+class DomainTableView(QTableView):
+    def __init__(self, model: DomainTableModel) -> None:
+        super().__init__()
+        self.setModel(model)
+        self.actionDelegate = DomainActionDelegate(self)
+        self.setItemDelegateForColumn(ACTIONS_COLUMN, self.actionDelegate)
+        self.sparklineDelegate = SparklineDelegate(self)
+        self.setItemDelegateForColumn(HISTORY_COLUMN, self.sparklineDelegate)
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setWordWrap(False)
+        self.setIconSize(QSize(THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT))
+
+        # Fixed row heights and column widths keep Qt from measuring every
+        # row, so layout cost depends on the visible rows only.
+        verticalHeader = self.verticalHeader()
+        verticalHeader.setVisible(False)
+        verticalHeader.setSectionResizeMode(QHeaderView.Fixed)
+        verticalHeader.setDefaultSectionSize(ROW_HEIGHT)
+        self.setColumnWidth(NAME_COLUMN, 160)
+        self.setColumnWidth(HOST_COLUMN, 160)
+        self.setColumnWidth(STATE_COLUMN, 110)
+        self.setColumnWidth(CPU_COLUMN, 60)
+        self.setColumnWidth(HISTORY_COLUMN, SPARKLINE_SIZE.width())
+        self.setColumnWidth(MEMORY_COLUMN, 150)
+        self.setColumnWidth(VCPU_COLUMN, 50)
+        self.setColumnWidth(CPU_TIME_COLUMN, 140)
+        self.setColumnWidth(ACTIONS_COLUMN, sum(BUTTON_WIDTHS)
+                            + BUTTON_MARGIN * (len(ACTIONS) + 1))
+        self.horizontalHeader().setStretchLastSection(True)
+
+        # Busiest guests first; re-sorted as new samples arrive.
+        self.setSortingEnabled(True)
+        self.sortByColumn(CPU_COLUMN, Qt.DescendingOrder)
+
+    def selectedKeys(self) -> list[str]:
+        return [index.data(KEY_ROLE)
+                for index in self.selectionModel().selectedRows()]
+
+    def visibleRows(self) -> range:
+        first = self.rowAt(0)
+        if first == -1:
+            return range(0)
+        last = self.rowAt(self.viewport().height() - 1)
+        if last == -1:
+            last = self.model().rowCount() - 1
+        return range(first, last + 1)
@@ -0,0 +1,88 @@
+from domainIndex import DomainFilter
+from libvirt import VIR_DOMAIN_RUNNING, VIR_DOMAIN_BLOCKED, \
+    VIR_DOMAIN_PAUSED, VIR_DOMAIN_SHUTDOWN, VIR_DOMAIN_SHUTOFF, \
+    VIR_DOMAIN_CRASHED, VIR_DOMAIN_PMSUSPENDED
+from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtWidgets import QWidget, QHBoxLayout, QLabel, QLineEdit, \
+    QCheckBox, QComboBox, QSpinBox
+import re
+
+ANY_CHOICE = "Any"
+STATE_FILTERS = (("Running", frozenset({VIR_DOMAIN_RUNNING,
+                                        VIR_DOMAIN_BLOCKED})),
+                 ("Paused", frozenset({VIR_DOMAIN_PAUSED,
+                                       VIR_DOMAIN_PMSUSPENDED})),
+                 ("Shut off", frozenset({VIR_DOMAIN_SHUTOFF,
+                                         VIR_DOMAIN_SHUTDOWN})),
+                 ("Crashed", frozenset({VIR_DOMAIN_CRASHED})))
+INVALID_STYLE = "QLineEdit { color: red; }"
+
+
+class FilterBar(QWidget):
+    filterChanged = pyqtSignal(object)
+
+    def __init__(self, hosts: list[str]) -> None:
+        super().__init__()
+        self.mainLayout = QHBoxLayout()
+        self.mainLayout.setContentsMargins(0, 0, 0, 0)
+
+        self.textField = QLineEdit()
+        self.textField.setPlaceholderText("Filter by name")
+        self.textField.setClearButtonEnabled(True)
+        self.regexCheck = QCheckBox("Regex")
+        self.stateCombo = QComboBox()
+        self.stateCombo.addItem(ANY_CHOICE, None)
+        for text, states in STATE_FILTERS:
+            self.stateCombo.addItem(text, states)
+        self.hostCombo = QComboBox()
+        self.hostCombo.addItem(ANY_CHOICE, None)
+        for host in hosts:
+            self.hostCombo.addItem(host, host)
+        self.hostCombo.setVisible(len(hosts) > 1)
+        self.cpuSpin = QSpinBox()
+        self.cpuSpin.setRange(0, 100)
+        self.cpuSpin.setPrefix("CPU >= ")
+        self.cpuSpin.setSuffix("%")
+        self.memorySpin = QSpinBox()
+        self.memorySpin.setRange(0, 1024 * 1024)
+        self.memorySpin.setSingleStep(512)
+        self.memorySpin.setPrefix("Mem >= ")
+        self.memorySpin.setSuffix(" MiB")
+
+        self.mainLayout.addWidget(QLabel("Show:"))
+        self.mainLayout.addWidget(self.textField)
+        self.mainLayout.addWidget(self.regexCheck)
+        self.mainLayout.addWidget(self.stateCombo)
+        self.mainLayout.addWidget(self.hostCombo)
+        self.mainLayout.addWidget(self.cpuSpin)
+        self.mainLayout.addWidget(self.memorySpin)
+        self.setLayout(self.mainLayout)
+
+        self.textField.textChanged.connect(self.emitFilter)
+        self.regexCheck.toggled.connect(self.emitFilter)
+        self.stateCombo.currentIndexChanged.connect(self.emitFilter)
+        self.hostCombo.currentIndexChanged.connect(self.emitFilter)
+        self.cpuSpin.valueChanged.connect(self.emitFilter)
+        self.memorySpin.valueChanged.connect(self.emitFilter)
+
+    def domainFilter(self) -> DomainFilter:
+        return DomainFilter(self.textField.text(),
+                            self.regexCheck.isChecked(),
+                            self.stateCombo.currentData(),
+                            self.hostCombo.currentData(),
+                            float(self.cpuSpin.value()),
+                            self.memorySpin.value() * 1024)
+
+    def emitFilter(self, _=None) -> None:
+        domainFilter = self.domainFilter()
+        if domainFilter.regex:
+            try:
+                re.compile(domainFilter.text)
+            except re.error as err:
+                # Keep the last valid filter while the pattern is typed.
+                self.textField.setStyleSheet(INVALID_STYLE)
+                self.textField.setToolTip(str(err))
+                return
+        self.textField.setStyleSheet("")
+        self.textField.setToolTip("")
+        self.filterChanged.emit(domainFilter)
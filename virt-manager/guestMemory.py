@@ -0,0 +1,175 @@
+from libvirt import VIR_MEMORY_VIRTUAL, VIR_MEMORY_PHYSICAL, virDomain, \
+    libvirtError
+from collections import OrderedDict
+from typing import Iterator
+
+MEMORY_MODES = {"physical": VIR_MEMORY_PHYSICAL,
+                "virtual": VIR_MEMORY_VIRTUAL}
+# Guest pages; an unmapped virtual page fails the whole memoryPeek, so
+# scans narrow failed reads down to single pages.
+PAGE_SIZE = 4096
+# Addresses split into frame index and offset as in hw01/paging.c, just
+# with 64KiB frames; frames are the unit fetched and cached.
+FRAME_SHIFT = 16
+FRAME_SIZE = 1 << FRAME_SHIFT
+# The remote protocol caps a memoryPeek reply at 1MiB.
+MAX_PEEK = 1024 * 1024
+# Frames kept, i.e. 64MiB.
+FRAME_CACHE_SIZE = 1024
+HEXDUMP_WIDTH = 16
+# Printable ASCII stays, everything else shows as ".".
+HEXDUMP_TABLE = bytes(byte if 32 <= byte <= 126 else ord(".")
+                      for byte in range(256))
+
+
+def translateAddress(address: int) -> tuple[int, int]:
+    return address >> FRAME_SHIFT, address & (FRAME_SIZE - 1)
+
+
+class GuestMemory:
+    # Not thread safe; run every read of one guest under the same job key.
+    def __init__(self, domain: virDomain, mode: str = "physical",
+                 cacheFrames: int = FRAME_CACHE_SIZE) -> None:
+        self.domain = domain
+        self.flags = MEMORY_MODES[mode]
+        self.cacheFrames = cacheFrames
+        self.frames: OrderedDict[int, bytes] = OrderedDict()
+
+    def invalidate(self) -> None:
+        # The guest keeps running, so cached frames go stale; call this
+        # before showing fresh contents.
+        self.frames.clear()
+
+    def peek(self, address: int, size: int) -> bytes:
+        return self.domain.memoryPeek(address, size, self.flags)
+
+    def cacheFrame(self, index: int, data: bytes) -> None:
+        self.frames[index] = data
+        self.frames.move_to_end(index)
+        while len(self.frames) > self.cacheFrames:
+            self.frames.popitem(last=False)
+
+    def fetchFrames(self, first: int, last: int) -> None:
+        # Missing frames are fetched in runs of up to MAX_PEEK bytes.
+        framesPerPeek = MAX_PEEK // FRAME_SIZE
+        index = first
+        while index <= last:
+            if index in self.frames:
+                self.frames.move_to_end(index)
+                index += 1
+                continue
+            runEnd = index
+            while runEnd < last and runEnd + 1 not in self.frames \
+                    and runEnd + 1 - index < framesPerPeek:
+                runEnd += 1
+            data = self.peek(index << FRAME_SHIFT,
+                             (runEnd - index + 1) << FRAME_SHIFT)
+            for frame in range(index, runEnd + 1):
+                offset = (frame - index) << FRAME_SHIFT
+                self.cacheFrame(frame, data[offset:offset + FRAME_SIZE])
+            index = runEnd + 1
+
+    def read(self, address: int, size: int) -> memoryview:
+        # Zero-copy when the range sits in one frame, one copy otherwise.
+        if size <= 0:
+            return memoryview(b"")
+        first, offset = translateAddress(address)
+        last = translateAddress(address + size - 1)[0]
+        try:
+            self.fetchFrames(first, last)
+        except libvirtError:
+            # A frame can take in unmapped virtual pages next to mapped
+            # ones, so retry just the range asked for, uncached.
+            return memoryview(self.peek(address, size))
+        if first == last:
+            return memoryview(self.frames[first])[offset:offset + size]
+        buffer = bytearray(size)
+        position = 0
+        for index in range(first, last + 1):
+            frame = memoryview(self.frames[index])
+            part = frame[offset:offset + size - position]
+            buffer[position:position + len(part)] = part
+            position += len(part)
+            offset = 0
+        return memoryview(buffer)
+
+    def chunks(self, start: int, size: int,
+               chunkSize: int = MAX_PEEK) -> Iterator[tuple[int, bytes]]:
+        # Streams aligned chunks past the cache, so a long scan does not
+        # evict what is being looked at; unreadable pages are skipped.
+        address = start
+        end = start + size
+        while address < end:
+            chunkEnd = min((address // chunkSize + 1) * chunkSize, end)
+            try:
+                yield address, self.peek(address, chunkEnd - address)
+            except libvirtError:
+                yield from self.readableParts(address, chunkEnd)
+            address = chunkEnd
+
+    def readableParts(self, start: int,
+                      end: int) -> Iterator[tuple[int, bytes]]:
+        # Halves a failed range at page boundaries, so a hole costs a few
+        # reads instead of one per page.
+        firstPage = start // PAGE_SIZE
+        lastPage = (end - 1) // PAGE_SIZE
+        if firstPage == lastPage:
+            return
+        middle = (firstPage + (lastPage - firstPage + 1) // 2) * PAGE_SIZE
+        for partStart, partEnd in ((start, middle), (middle, end)):
+            try:
+                yield partStart, self.peek(partStart, partEnd - partStart)
+            except libvirtError:
+                yield from self.readableParts(partStart, partEnd)
+
+    def search(self, start: int, size: int, pattern: bytes,
+               onProgress=None) -> Iterator[int]:
+        # bytes.find does the scanning, so the cost is the reads; the last
+        # len(pattern) - 1 bytes are carried over to catch matches that
+        # straddle two chunks.
+        overlap = len(pattern) - 1
+        carry = b""
+        expected = start
+        for address, data in self.chunks(start, size):
+            if address != expected:
+                carry = b""
+            window = carry + data if len(carry) != 0 else data
+            base = address - len(carry)
+            position = window.find(pattern)
+            while position != -1:
+                yield base + position
+                position = window.find(pattern, position + 1)
+            carry = window[len(window) - overlap:] if overlap > 0 else b""
+            expected = address + len(data)
+            if onProgress is not None:
+                onProgress(expected - start, size)
+
+
+def findAll(memory: GuestMemory, start: int, size: int, pattern: bytes,
+            limit: int, onProgress=None) -> list[int]:
+    matches = []
+    for address in memory.search(start, size, pattern, onProgress):
+        matches.append(address)
+        if len(matches) >= limit:
+            break
+    return matches
+
+
+def hexdumpLines(data: memoryview | bytes, address: int) -> Iterator[str]:
+    # The hexdump -C layout hw01's hexdump prints, addressed from the guest
+    # address instead of 0.
+    half = HEXDUMP_WIDTH // 2
+    for offset in range(0, len(data), HEXDUMP_WIDTH):
+        row = bytes(data[offset:offset + HEXDUMP_WIDTH])
+        hexBytes = "{:<{width}}  {:<{width}}".format(
+            row[:half].hex(" "), row[half:].hex(" "), width=half * 3 - 1)
+        yield "{:016x}  {}  |{}|".format(address + offset, hexBytes,
+                                         row.translate(HEXDUMP_TABLE)
+                                         .decode("ascii"))
+
+
+def parsePattern(text: str, isHex: bool) -> bytes:
+    # Raises ValueError for malformed hex.
+    if isHex:
+        return bytes.fromhex(text)
+    return text.encode()
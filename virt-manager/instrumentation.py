@@ -0,0 +1,242 @@
+import libvirt
+from bisect import bisect_left
+from threading import Lock
+import json
+import os
+import time
+
+# Enabled once at startup; when off nothing is wrapped, so libvirt calls
+# go straight to the bindings and the hot path pays only for a bool check.
+ENABLE_VARIABLE = "VIRTMANAGER_INSTRUMENT"
+
+# Upper bounds in seconds, Prometheus "le" style; the last bucket is +Inf.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LIBVIRT_CALL_METRIC = "virtmanager_libvirt_call_seconds"
+GUI_METRIC = "virtmanager_gui_seconds"
+
+WRAPPED_TYPES = (libvirt.virConnect, libvirt.virDomain,
+                 libvirt.virStoragePool, libvirt.virStorageVol)
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "maximum", "errors")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.errors = 0
+
+    def observe(self, seconds: float, failed: bool = False) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+        if failed:
+            self.errors += 1
+
+    def quantile(self, q: float) -> float:
+        # Upper bound of the bucket holding the q-th observation.
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, self.maximum)
+        return self.maximum
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count != 0 else 0.0
+
+
+class Instrumentation:
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.lock = Lock()
+        # (metric, method, uri) -> Histogram
+        self.histograms: dict[tuple[str, str, str], Histogram] = {}
+        # (metric prefix, uri label) -> callable returning {name: value};
+        # read on every dump, names ending in "_total" are counters, the
+        # rest gauges.
+        self.counterSources: dict[tuple[str, str], object] = {}
+
+    def observe(self, metric: str, method: str, uri: str, seconds: float,
+                failed: bool = False) -> None:
+        key = (metric, method, uri)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = Histogram()
+                self.histograms[key] = histogram
+            histogram.observe(seconds, failed)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.histograms.clear()
+
+    def snapshot(self) -> list[tuple[tuple[str, str, str], Histogram]]:
+        with self.lock:
+            return sorted((key, self.copyHistogram(histogram))
+                          for key, histogram in self.histograms.items())
+
+    def registerCounters(self, prefix: str, uri: str, source) -> str:
+        # Returns the uri label actually used; a second source for the same
+        # URIs gets a numbered label instead of replacing the first.
+        with self.lock:
+            label = uri
+            number = 2
+            while (prefix, label) in self.counterSources:
+                label = "{}#{}".format(uri, number)
+                number += 1
+            self.counterSources[(prefix, label)] = source
+        return label
+
+    def deregisterCounters(self, prefix: str, label: str) -> None:
+        with self.lock:
+            self.counterSources.pop((prefix, label), None)
+
+    def counters(self) -> list[tuple[str, str, int | float]]:
+        with self.lock:
+            sources = list(self.counterSources.items())
+        return sorted((prefix + "_" + name, label, value)
+                      for (prefix, label), source in sources
+                      for name, value in source().items())
+
+    @staticmethod
+    def copyHistogram(histogram: Histogram) -> Histogram:
+        copy = Histogram()
+        copy.counts = list(histogram.counts)
+        copy.count = histogram.count
+        copy.total = histogram.total
+        copy.maximum = histogram.maximum
+        copy.errors = histogram.errors
+        return copy
+
+    def toJson(self) -> str:
+        entries = []
+        for (metric, method, uri), histogram in self.snapshot():
+            entries.append({"metric": metric, "method": method, "uri": uri,
+                            "count": histogram.count,
+                            "errors": histogram.errors,
+                            "sum": histogram.total,
+                            "max": histogram.maximum,
+                            "p50": histogram.quantile(0.5),
+                            "p95": histogram.quantile(0.95),
+                            "buckets": dict(zip(
+                                [str(bound) for bound in LATENCY_BUCKETS]
+                                + ["+Inf"], histogram.counts))})
+        entries.extend({"metric": metric, "uri": uri, "value": value}
+                       for metric, uri, value in self.counters())
+        return json.dumps(entries, indent=2)
+
+    def toPrometheus(self) -> str:
+        lines = []
+        lastMetric = None
+        for (metric, method, uri), histogram in self.snapshot():
+            if metric != lastMetric:
+                lines.append("# TYPE {} histogram".format(metric))
+                lastMetric = metric
+            labels = 'method="{}",uri="{}"'.format(escapeLabel(method),
+                                                   escapeLabel(uri))
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",),
+                                    histogram.counts):
+                cumulative += count
+                lines.append('{}_bucket{{{},le="{}"}} {}'.format(
+                    metric, labels, bound, cumulative))
+            lines.append("{}_sum{{{}}} {}".format(metric, labels,
+                                                  histogram.total))
+            lines.append("{}_count{{{}}} {}".format(metric, labels,
+                                                    histogram.count))
+        errorLines = ['virtmanager_libvirt_call_errors_total{{method="{}",'
+                      'uri="{}"}} {}'.format(escapeLabel(method),
+                                             escapeLabel(uri),
+                                             histogram.errors)
+                      for (metric, method, uri), histogram in self.snapshot()
+                      if metric == LIBVIRT_CALL_METRIC]
+        if len(errorLines) != 0:
+            lines.append("# TYPE virtmanager_libvirt_call_errors_total "
+                         "counter")
+            lines.extend(errorLines)
+        lastMetric = None
+        for metric, uri, value in self.counters():
+            if metric != lastMetric:
+                lines.append("# TYPE {} {}".format(
+                    metric,
+                    "counter" if metric.endswith("_total") else "gauge"))
+                lastMetric = metric
+            lines.append('{}{{uri="{}"}} {}'.format(metric, escapeLabel(uri),
+                                                    value))
+        return "\n".join(lines) + "\n"
+
+
+def escapeLabel(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"') \
+        .replace("\n", "\\n")
+
+
+instrumentation = Instrumentation(os.environ.get(ENABLE_VARIABLE) == "1")
+
+
+class InstrumentedProxy:
+    # Times every method called on a libvirt object and wraps the
+    # domains, pools and volumes it hands out so their calls are timed too.
+    def __init__(self, target, uri: str) -> None:
+        self.target = target
+        self.uri = uri
+        self.typeName = type(target).__name__
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self.target, name)
+        if not callable(attribute):
+            return attribute
+        method = self.typeName + "." + name
+        uri = self.uri
+
+        def timedCall(*args, **kwargs):
+            args = [unwrap(arg) for arg in args]
+            start = time.perf_counter()
+            failed = True
+            try:
+                result = attribute(*args, **kwargs)
+                failed = False
+            finally:
+                instrumentation.observe(LIBVIRT_CALL_METRIC, method, uri,
+                                        time.perf_counter() - start, failed)
+            return wrapResult(result, uri)
+
+        # Later lookups find the bound wrapper without __getattr__.
+        setattr(self, name, timedCall)
+        return timedCall
+
+
+def unwrap(value):
+    if isinstance(value, InstrumentedProxy):
+        return value.target
+    if isinstance(value, list):
+        return [unwrap(item) for item in value]
+    return value
+
+
+def wrapResult(value, uri: str):
+    if isinstance(value, WRAPPED_TYPES):
+        return InstrumentedProxy(value, uri)
+    if isinstance(value, list):
+        return [wrapResult(item, uri) for item in value]
+    if isinstance(value, tuple):
+        return tuple(wrapResult(item, uri) for item in value)
+    return value
+
+
+def instrument(target, uri: str):
+    if not instrumentation.enabled or target is None \
+            or isinstance(target, InstrumentedProxy):
+        return target
+    return InstrumentedProxy(target, uri)
+
+
+def observeGui(method: str, seconds: float) -> None:
+    instrumentation.observe(GUI_METRIC, method, "", seconds)
@@ -0,0 +1,88 @@
+from libvirtUtils import IOTUNE_FIELDS, getBlockIoTune, setBlockIoTune
+from warningDialogue import WarningDialogue
+from PyQt5.QtCore import QRegularExpression
+from PyQt5.QtGui import QRegularExpressionValidator
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QFormLayout, QLineEdit, \
+    QPushButton, QSizePolicy
+
+KIB = 1024
+# Byte limits are edited in KiB/s, IOPS limits as they are.
+FIELD_LABELS = {"total_bytes_sec": "Total KiB/s:",
+                "read_bytes_sec": "Read KiB/s:",
+                "write_bytes_sec": "Write KiB/s:",
+                "total_iops_sec": "Total IOPS:",
+                "read_iops_sec": "Read IOPS:",
+                "write_iops_sec": "Write IOPS:"}
+
+
+def fieldScale(name: str) -> int:
+    return KIB if name.endswith("bytes_sec") else 1
+
+
+class IoTuneDialogue(QWidget):
+    def __init__(self, parentWindow, domain, target: str) -> None:
+        super().__init__()
+        self.parentWindow = parentWindow
+        self.jobRunner = parentWindow.jobRunner
+        self.domain = domain
+        self.target = target
+        self.setWindowTitle("{} I/O limits".format(target))
+        self.mainLayout = QVBoxLayout()
+
+        formLayout = QFormLayout()
+        validator = QRegularExpressionValidator(QRegularExpression(r"\d*"),
+                                                self)
+        self.fields: dict[str, QLineEdit] = {}
+        # Text each field was loaded with; untouched fields are not sent,
+        # so a limit that is no whole number of KiB/s survives as it is.
+        self.shownText: dict[str, str] = {}
+        for name in IOTUNE_FIELDS:
+            field = QLineEdit()
+            field.setValidator(validator)
+            field.setPlaceholderText("unlimited")
+            field.setEnabled(False)
+            formLayout.addRow(FIELD_LABELS[name], field)
+            self.fields[name] = field
+
+        self.applyButton = QPushButton("Apply")
+        self.applyButton.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        self.applyButton.setEnabled(False)
+        self.applyButton.clicked.connect(self.applyLimits)
+
+        self.mainLayout.addLayout(formLayout)
+        self.mainLayout.addWidget(self.applyButton)
+        self.setLayout(self.mainLayout)
+        self.show()
+
+        self.jobRunner.submit(getBlockIoTune, domain, target,
+                              key=parentWindow.domainKey,
+                              onSuccess=self.showLimits,
+                              onFailure=self.showError)
+
+    def showLimits(self, limits: dict[str, int]) -> None:
+        for name, field in self.fields.items():
+            value = limits.get(name, 0) // fieldScale(name)
+            field.setText(str(value) if value != 0 else "")
+            field.setEnabled(True)
+            self.shownText[name] = field.text()
+        self.applyButton.setEnabled(True)
+
+    def applyLimits(self) -> None:
+        limits = {name: int(field.text() or 0) * fieldScale(name)
+                  for name, field in self.fields.items()
+                  if field.text() != self.shownText.get(name)}
+        if len(limits) == 0:
+            self.close()
+            return
+        self.applyButton.setEnabled(False)
+        self.jobRunner.submit(setBlockIoTune, self.domain, self.target,
+                              limits, key=self.parentWindow.domainKey,
+                              onSuccess=self.limitsApplied,
+                              onFailure=self.showError)
+
+    def limitsApplied(self, _=None) -> None:
+        self.close()
+
+    def showError(self, message: str) -> None:
+        self.warning = WarningDialogue(message)
+        self.applyButton.setEnabled(True)
@@ -0,0 +1,161 @@
+from libvirt import libvirtError
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, \
+    pyqtSignal, pyqtSlot
+from collections import deque
+from itertools import count
+from threading import Lock
+
+
+class Job(QRunnable):
+    def __init__(self, runner, jobId: int, key, func, args,
+                 reportsProgress: bool, pool: QThreadPool) -> None:
+        super().__init__()
+        self.runner = runner
+        self.jobId = jobId
+        self.key = key
+        self.func = func
+        self.args = args
+        self.reportsProgress = reportsProgress
+        self.pool = pool
+
+    def reportProgress(self, *progress) -> None:
+        self.runner.jobProgress.emit(self.jobId, progress)
+
+    def run(self) -> None:
+        try:
+            if self.reportsProgress:
+                result = self.func(*self.args, onProgress=self.reportProgress)
+            else:
+                result = self.func(*self.args)
+        except libvirtError as err:
+            self.runner.jobFailed.emit(self.jobId, err.get_error_message()
+                                       or str(err))
+        except Exception as err:
+            # An exception escaping QRunnable.run aborts the process.
+            self.runner.jobFailed.emit(self.jobId, "{}: {}".format(
+                type(err).__name__, err))
+        else:
+            self.runner.jobSucceeded.emit(self.jobId, result)
+        finally:
+            self.runner.jobDone(self.key)
+
+
+class JobRunner(QObject):
+    jobSucceeded = pyqtSignal(int, object)
+    jobFailed = pyqtSignal(int, str)
+    jobProgress = pyqtSignal(int, object)
+
+    def __init__(self, maxThreadCount: int = 8,
+                 batchThreadCount: int = 32) -> None:
+        super().__init__()
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(maxThreadCount)
+        # Batch jobs can block for minutes, e.g. waiting for a guest to
+        # shut down, so they get their own threads and never hold up polls.
+        self.batchPool = QThreadPool()
+        self.batchPool.setMaxThreadCount(batchThreadCount)
+        self.jobIds = count()
+        self.callbacks: dict[int, tuple] = {}
+        self.progressCallbacks: dict[int, object] = {}
+        self.lock = Lock()
+        self.pendingJobs: dict[str, deque[Job]] = {}
+        self.jobSucceeded.connect(self.dispatchSuccess)
+        self.jobFailed.connect(self.dispatchFailure)
+        self.jobProgress.connect(self.dispatchProgress)
+
+    def submit(self, func, *args, key: str | None = None,
+               onSuccess=None, onFailure=None, onProgress=None) -> int:
+        return self.startJob(self.pool, func, args, key, onSuccess,
+                             onFailure, onProgress)
+
+    def submitBatch(self, jobs: list[tuple[str, object, object]],
+                    failureResult, concurrency: int, onSuccess=None,
+                    onProgress=None) -> None:
+        # Runs func(item) for every (key, func, item) under its own key, so
+        # each queues behind whatever else holds that key, with at most
+        # concurrency started at once; a failed job counts as
+        # failureResult(item, message). onProgress gets (done, total,
+        # result) and onSuccess every result once the last is in.
+        results = []
+        waiting = deque(jobs)
+
+        def startNext() -> None:
+            key, func, item = waiting.popleft()
+            self.startJob(self.batchPool, func, (item,), key, collect,
+                          lambda message: collect(failureResult(item,
+                                                                message)),
+                          None)
+
+        def collect(result) -> None:
+            results.append(result)
+            if onProgress is not None:
+                onProgress(len(results), len(jobs), result)
+            if len(waiting) != 0:
+                startNext()
+            elif len(results) == len(jobs) and onSuccess is not None:
+                onSuccess(results)
+
+        if len(jobs) == 0 and onSuccess is not None:
+            onSuccess(results)
+        for _ in range(min(concurrency, len(jobs))):
+            startNext()
+
+    def startJob(self, pool: QThreadPool, func, args, key: str | None,
+                 onSuccess, onFailure, onProgress) -> int:
+        jobId = next(self.jobIds)
+        self.callbacks[jobId] = (onSuccess, onFailure)
+        if onProgress is not None:
+            self.progressCallbacks[jobId] = onProgress
+        job = Job(self, jobId, key, func, args, onProgress is not None, pool)
+        if key is not None:
+            with self.lock:
+                if key in self.pendingJobs:
+                    self.pendingJobs[key].append(job)
+                    return jobId
+                self.pendingJobs[key] = deque()
+        pool.start(job)
+        return jobId
+
+    def jobDone(self, key: str | None) -> None:
+        if key is None:
+            return
+        with self.lock:
+            queue = self.pendingJobs[key]
+            if len(queue) == 0:
+                del self.pendingJobs[key]
+                return
+            job = queue.popleft()
+        job.pool.start(job)
+
+    def isBusy(self, key: str) -> bool:
+        with self.lock:
+            return key in self.pendingJobs
+
+    @pyqtSlot(int, object)
+    def dispatchProgress(self, jobId: int, progress: tuple) -> None:
+        onProgress = self.progressCallbacks.get(jobId)
+        if onProgress is not None:
+            onProgress(*progress)
+
+    @pyqtSlot(int, object)
+    def dispatchSuccess(self, jobId: int, result) -> None:
+        self.progressCallbacks.pop(jobId, None)
+        onSuccess, _ = self.callbacks.pop(jobId)
+        if onSuccess is not None:
+            onSuccess(result)
+
+    @pyqtSlot(int, str)
+    def dispatchFailure(self, jobId: int, message: str) -> None:
+        self.progressCallbacks.pop(jobId, None)
+        _, onFailure = self.callbacks.pop(jobId)
+        if onFailure is not None:
+            onFailure(message)
+
+    def shutdown(self, timeout: int = 5000) -> None:
+        with self.lock:
+            for queue in self.pendingJobs.values():
+                queue.clear()
+        self.pool.clear()
+        self.batchPool.clear()
+        self.pool.waitForDone(timeout)
+        self.batchPool.waitForDone(timeout)
@@ -16,7 +16,7 @@ class LaunchWindow(QWidget):
         inputLayout.setSpacing(0)
 
         self.textField = QLineEdit()
-        label = QLabel("Connection URI:")
+        label = QLabel("Connection URIs (comma separated):")
         label.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
 
         inputLayout.addWidget(label)
@@ -1,14 +1,211 @@
 from libvirt import VIR_DOMAIN_RUNNING, VIR_DOMAIN_BLOCKED, \
     VIR_DOMAIN_PAUSED, VIR_DOMAIN_SHUTDOWN, VIR_DOMAIN_SHUTOFF, \
     VIR_DOMAIN_CRASHED, VIR_DOMAIN_PMSUSPENDED, \
-    VIR_DOMAIN_AFFECT_CONFIG, VIR_DOMAIN_AFFECT_LIVE, \
-    virConnect, virDomain, libvirtError
-from xml.etree.ElementTree import fromstring, tostring
+    VIR_DOMAIN_NOSTATE, VIR_DOMAIN_AFFECT_CONFIG, VIR_DOMAIN_AFFECT_LIVE, \
+    VIR_DOMAIN_STATS_STATE, VIR_DOMAIN_STATS_CPU_TOTAL, \
+    VIR_DOMAIN_STATS_BALLOON, VIR_DOMAIN_STATS_VCPU, VIR_DOMAIN_STATS_BLOCK, \
+    VIR_ERR_NO_SUPPORT, \
+    VIR_ERR_NO_DOMAIN, VIR_CONNECT_LIST_DOMAINS_ACTIVE, \
+    VIR_CONNECT_LIST_STORAGE_POOLS_ACTIVE, \
+    VIR_STORAGE_VOL_CREATE_PREALLOC_METADATA, \
+    virConnect, virDomain, virStoragePool, virStorageVol, libvirtError
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from threading import Lock, Thread
+from typing import NamedTuple
+from urllib.parse import urlparse
+from xml.etree.ElementTree import Element, SubElement, fromstring, tostring
+from xml.sax.saxutils import escape
+import resourceCache
+import time
+
+DOMAIN_STATS_FLAGS = VIR_DOMAIN_STATS_STATE | VIR_DOMAIN_STATS_CPU_TOTAL | \
+    VIR_DOMAIN_STATS_BALLOON | VIR_DOMAIN_STATS_VCPU
+
+CACHE_MODES = ("none", "writeback", "writethrough", "directsync", "unsafe")
+IO_MODES = ("native", "threads", "io_uring")
+DISCARD_MODES = ("unmap", "ignore")
+IMAGE_FORMATS = ("raw", "qcow2")
+QCOW2_MAGIC = b"QFI\xfb"
+# falloc asks for allocation == capacity; the storage backend then uses
+# fallocate where it can and writes zeroes otherwise.
+PREALLOCATION_MODES = ("sparse", "metadata", "falloc")
+# setBlockIoTune parameters; 0 removes the limit.
+IOTUNE_FIELDS = ("total_bytes_sec", "read_bytes_sec", "write_bytes_sec",
+                 "total_iops_sec", "read_iops_sec", "write_iops_sec")
+
+# KiB; ballooning a guest below this tends to get it OOM-killed.
+BALLOON_FLOOR = 256 * 1024
+# Seconds between guest memory stat updates once enabled.
+MEMORY_STATS_PERIOD = 5
+
+SUSPEND_RESUME_DISABLED_STATES = {VIR_DOMAIN_SHUTDOWN, VIR_DOMAIN_PMSUSPENDED,
+                                  VIR_DOMAIN_CRASHED, VIR_DOMAIN_SHUTOFF,
+                                  VIR_DOMAIN_BLOCKED}
+SHUTDOWN_BOOT_DISABLED_STATES = {VIR_DOMAIN_SHUTDOWN, VIR_DOMAIN_PAUSED,
+                                 VIR_DOMAIN_PMSUSPENDED, VIR_DOMAIN_CRASHED,
+                                 VIR_DOMAIN_BLOCKED}
+
+
+def domainKey(host: str, uuid: str) -> str:
+    return host + "/" + uuid
+
+
+class MemoryStats(NamedTuple):
+    # KiB as reported by the balloon driver; None when the guest does not
+    # report the value (no balloon stats period or no guest driver).
+    actual: int
+    unused: int | None
+    available: int | None
+    usable: int | None
+    rss: int | None
+    majorFaults: int | None
+    swapIn: int | None
+    swapOut: int | None
+
+    @property
+    def pressure(self) -> float | None:
+        # Share of the balloon the guest cannot give back without swapping.
+        free = self.usable if self.usable is not None else self.unused
+        if free is None or self.actual == 0:
+            return None
+        return max(0.0, 1 - free / self.actual)
+
+
+def memoryStatsFromRecord(record: dict) -> MemoryStats | None:
+    if "balloon.current" not in record:
+        return None
+    return MemoryStats(record["balloon.current"],
+                       record.get("balloon.unused"),
+                       record.get("balloon.available"),
+                       record.get("balloon.usable"),
+                       record.get("balloon.rss"),
+                       record.get("balloon.major_fault"),
+                       record.get("balloon.swap_in"),
+                       record.get("balloon.swap_out"))
+
+
+def memoryStatsFromDict(memoryStats: dict) -> MemoryStats | None:
+    if "actual" not in memoryStats:
+        return None
+    return MemoryStats(memoryStats["actual"], memoryStats.get("unused"),
+                       memoryStats.get("available"),
+                       memoryStats.get("usable"), memoryStats.get("rss"),
+                       memoryStats.get("major_fault"),
+                       memoryStats.get("swap_in"),
+                       memoryStats.get("swap_out"))
+
+
+class DomainStats(NamedTuple):
+    uuid: str
+    name: str
+    state: int
+    maxMemory: int
+    memory: int
+    vcpuCount: int
+    cpuTime: int
+    host: str = ""
+    memoryStats: MemoryStats | None = None
+
+    @property
+    def key(self) -> str:
+        return domainKey(self.host, self.uuid)
+
+
+def statsFromRecord(domain: virDomain, record: dict,
+                    host: str = "") -> DomainStats:
+    maxMemory = record.get("balloon.maximum", 0)
+    return DomainStats(domain.UUIDString(), domain.name(),
+                       record.get("state.state", VIR_DOMAIN_NOSTATE),
+                       maxMemory,
+                       record.get("balloon.current", maxMemory),
+                       record.get("vcpu.current", 0),
+                       record.get("cpu.time", 0), host,
+                       memoryStatsFromRecord(record))
+
+
+def statsFromInfo(domain: virDomain, host: str = "") -> DomainStats:
+    state, maxMemory, memory, vcpuCount, cpuTime = domain.info()
+    memoryStats = None
+    if state == VIR_DOMAIN_RUNNING:
+        try:
+            memoryStats = memoryStatsFromDict(domain.memoryStats())
+        except libvirtError:
+            pass
+    return DomainStats(domain.UUIDString(), domain.name(), state,
+                       maxMemory, memory, vcpuCount, cpuTime, host,
+                       memoryStats)
+
+
+class DomainStatsRefresher:
+    def __init__(self, conn: virConnect, host: str | None = None) -> None:
+        self.conn = conn
+        self.host = host if host is not None else conn.getURI()
+        self.bulkSupported = True
+        self.domains: dict[str, virDomain] = {}
+
+    def fetch(self, listFlags: int = 0) -> list[tuple[virDomain, DomainStats]]:
+        if self.bulkSupported:
+            try:
+                records = self.conn.getAllDomainStats(DOMAIN_STATS_FLAGS,
+                                                      listFlags)
+                return [(domain, statsFromRecord(domain, record, self.host))
+                        for domain, record in records]
+            except libvirtError as err:
+                if err.get_error_code() != VIR_ERR_NO_SUPPORT:
+                    raise
+                self.bulkSupported = False
+        return [(domain, statsFromInfo(domain, self.host))
+                for domain in self.conn.listAllDomains(listFlags)]
+
+    def refresh(self) -> dict[str, DomainStats]:
+        return self.collect(self.fetch(), {})
+
+    def refreshActive(self) -> dict[str, DomainStats]:
+        return self.collect(self.fetch(VIR_CONNECT_LIST_DOMAINS_ACTIVE),
+                            dict(self.domains))
+
+    def refreshDomain(self, domain: virDomain) -> DomainStats | None:
+        key = domainKey(self.host, domain.UUIDString())
+        try:
+            pairs = self.fetchDomain(domain)
+        except libvirtError as err:
+            if err.get_error_code() != VIR_ERR_NO_DOMAIN:
+                raise
+            pairs = []
+        if len(pairs) == 0:
+            self.domains.pop(key, None)
+            return None
+        return self.collect(pairs, dict(self.domains))[key]
+
+    def fetchDomain(self, domain: virDomain) \
+            -> list[tuple[virDomain, DomainStats]]:
+        if self.bulkSupported:
+            try:
+                records = self.conn.domainListGetStats([domain],
+                                                       DOMAIN_STATS_FLAGS)
+                return [(domain, statsFromRecord(domain, record, self.host))
+                        for domain, record in records]
+            except libvirtError as err:
+                if err.get_error_code() != VIR_ERR_NO_SUPPORT:
+                    raise
+                self.bulkSupported = False
+        return [(domain, statsFromInfo(domain, self.host))]
+
+    def collect(self, pairs: list[tuple[virDomain, DomainStats]],
+                domains: dict[str, virDomain]) -> dict[str, DomainStats]:
+        snapshots = {}
+        for domain, stats in pairs:
+            snapshots[stats.key] = stats
+            domains[stats.key] = self.domains.get(stats.key, domain)
+        self.domains = domains
+        return snapshots
 
 
 class DomainInfo:
-    def __init__(self, domain: virDomain) -> None:
+    def __init__(self, domain: virDomain, stats: DomainStats) -> None:
         self.domain = domain
+        self.stats = stats
 
     def stateToString(self, state: int) -> str:
         if state == VIR_DOMAIN_RUNNING:
@@ -26,38 +223,249 @@ class DomainInfo:
         if state == VIR_DOMAIN_PMSUSPENDED:
             return "Suspended by PM"
 
-    def toString(self) -> str:
-        state, maxMemory, memory, vcpuCount, cpuTime = self.domain.info()
+    def description(self, cache=None) -> "DomainDescription":
+        # Device details come from the one-pass XML index; with a
+        # DomainDescriptionCache the XML is parsed once per definition.
+        if cache is not None:
+            return cache.get(self.domain, self.stats.key)
+        return getDomainDescription(self.domain)
+
+    def allDiskInfo(self, cache=None) -> "list[DiskInfo]":
+        return self.description(cache).allDiskInfo()
+
+    def toString(self, cpuPercent: float = 0.0) -> str:
+        stats = self.stats
+        pressure = None if stats.memoryStats is None \
+            else stats.memoryStats.pressure
         return """
+        Host: {}
         State: {}
-        Memory: {}/{}KB
+        CPU: {:.1f}%
+        Memory: {}/{}KB{}
         Number of vCPUs: {}
-        Cpu Time: {}ns""".format(self.stateToString(state), memory, maxMemory,
-                                 vcpuCount, cpuTime)
+        Cpu Time: {}ns""".format(stats.host, self.stateToString(stats.state),
+                                 cpuPercent, stats.memory, stats.maxMemory,
+                                 "" if pressure is None
+                                 else " ({:.0f}% in use)".format(
+                                     pressure * 100),
+                                 stats.vcpuCount, stats.cpuTime)
 
 
 class DiskInfo:
-    def __init__(self, name, xml) -> None:
+    def __init__(self, name, xml=None, element: Element | None = None,
+                 bus: str | None = None, source: str | None = None) -> None:
         self.name = name
-        self.xml = xml
+        self.element = element
+        self.bus = bus
+        self.source = source
+        self.cachedXml = xml
 
+    @property
+    def xml(self) -> str:
+        if self.cachedXml is None:
+            self.cachedXml = tostring(self.element, encoding="unicode")
+        return self.cachedXml
 
-def getAllDomainInfo(conn: virConnect) -> list[DomainInfo]:
-    domains: list[virDomain] = conn.listAllDomains()
-    return [DomainInfo(domain) for domain in domains]
+
+def deviceSource(device: Element) -> str | None:
+    source = device.find("source")
+    if source is None:
+        return None
+    for attribute in ("file", "dev", "name", "volume", "dir"):
+        if attribute in source.attrib:
+            return source.attrib[attribute]
+    return None
+
+
+class DomainDescription:
+    def __init__(self, xml: str) -> None:
+        self.tree = fromstring(xml)
+        self.name = self.tree.findtext("name")
+        self.uuid = self.tree.findtext("uuid")
+        self.devicesByType: dict[str, list[Element]] = {}
+        self.deviceByTarget: dict[str, Element] = {}
+        self.devicesByBus: dict[str, list[Element]] = {}
+        self.devicesBySource: dict[str, list[Element]] = {}
+
+        devices = self.tree.find("devices")
+        if devices is None:
+            return
+        for device in devices:
+            self.devicesByType.setdefault(device.tag, []).append(device)
+            target = device.find("target")
+            if target is None:
+                continue
+            if "dev" in target.attrib:
+                self.deviceByTarget[target.attrib["dev"]] = device
+            if "bus" in target.attrib:
+                self.devicesByBus.setdefault(target.attrib["bus"],
+                                             []).append(device)
+            source = deviceSource(device)
+            if source is not None:
+                self.devicesBySource.setdefault(source, []).append(device)
+
+    def devices(self, deviceType: str) -> list[Element]:
+        return self.devicesByType.get(deviceType, [])
+
+    def diskInfo(self, device: Element) -> DiskInfo:
+        target = device.find("target")
+        return DiskInfo(target.attrib["dev"], element=device,
+                        bus=target.attrib.get("bus"),
+                        source=deviceSource(device))
+
+    def allDiskInfo(self) -> list[DiskInfo]:
+        return [self.diskInfo(device) for device in self.devices("disk")
+                if device.attrib.get("device", "disk") == "disk"
+                and device.find("target") is not None]
+
+
+class BlockStats(NamedTuple):
+    name: str
+    readReqs: int
+    readBytes: int
+    readTime: int
+    writeReqs: int
+    writeBytes: int
+    writeTime: int
+
+
+class BlockRates(NamedTuple):
+    name: str
+    readIops: float
+    writeIops: float
+    readBytesPerSec: float
+    writeBytesPerSec: float
+    readLatencyMs: float
+    writeLatencyMs: float
+
+
+def blockStatsFromRecord(record: dict) -> dict[str, BlockStats]:
+    allBlockStats = {}
+    for idx in range(record.get("block.count", 0)):
+        prefix = "block.{}.".format(idx)
+        name = record.get(prefix + "name")
+        if name is None:
+            continue
+        allBlockStats[name] = BlockStats(
+            name, record.get(prefix + "rd.reqs", 0),
+            record.get(prefix + "rd.bytes", 0),
+            record.get(prefix + "rd.times", 0),
+            record.get(prefix + "wr.reqs", 0),
+            record.get(prefix + "wr.bytes", 0),
+            record.get(prefix + "wr.times", 0))
+    return allBlockStats
+
+
+def blockStatsFromFlags(name: str, flags: dict) -> BlockStats:
+    return BlockStats(name, flags.get("rd_operations", 0),
+                      flags.get("rd_bytes", 0),
+                      flags.get("rd_total_times", 0),
+                      flags.get("wr_operations", 0),
+                      flags.get("wr_bytes", 0),
+                      flags.get("wr_total_times", 0))
+
+
+def blockRates(previous: BlockStats, current: BlockStats,
+               elapsed: float) -> BlockRates:
+    readReqs = current.readReqs - previous.readReqs
+    writeReqs = current.writeReqs - previous.writeReqs
+    return BlockRates(
+        current.name, readReqs / elapsed, writeReqs / elapsed,
+        (current.readBytes - previous.readBytes) / elapsed,
+        (current.writeBytes - previous.writeBytes) / elapsed,
+        (current.readTime - previous.readTime) / readReqs / 1e6
+        if readReqs > 0 else 0.0,
+        (current.writeTime - previous.writeTime) / writeReqs / 1e6
+        if writeReqs > 0 else 0.0)
+
+
+class DiskStatsCollector:
+    def __init__(self, domain: virDomain) -> None:
+        self.domain = domain
+        self.bulkSupported = True
+        self.lastStats: dict[str, BlockStats] = {}
+        self.lastSampledAt = 0.0
+
+    def fetch(self, diskNames: list[str]) -> dict[str, BlockStats]:
+        # One bulk call covers every disk of the domain.
+        if self.bulkSupported:
+            try:
+                records = self.domain.connect().domainListGetStats(
+                    [self.domain], VIR_DOMAIN_STATS_BLOCK)
+                if len(records) == 0:
+                    return {}
+                return blockStatsFromRecord(records[0][1])
+            except libvirtError as err:
+                if err.get_error_code() != VIR_ERR_NO_SUPPORT:
+                    raise
+                self.bulkSupported = False
+        return {name: blockStatsFromFlags(name,
+                                          self.domain.blockStatsFlags(name))
+                for name in diskNames}
+
+    def sample(self, diskNames: list[str]) -> dict[str, BlockRates]:
+        allBlockStats = self.fetch(diskNames)
+        sampledAt = time.monotonic()
+        elapsed = sampledAt - self.lastSampledAt
+        rates = {}
+        for name, stats in allBlockStats.items():
+            previous = self.lastStats.get(name)
+            # Counters restart with the guest; skip the bogus negative delta.
+            if previous is None or stats.readReqs < previous.readReqs \
+                    or stats.writeReqs < previous.writeReqs:
+                continue
+            rates[name] = blockRates(previous, stats, elapsed)
+        self.lastStats = allBlockStats
+        self.lastSampledAt = sampledAt
+        return rates
+
+
+def getAllDomainInfo(refresher: DomainStatsRefresher) -> list[DomainInfo]:
+    snapshots = refresher.refresh()
+    return [DomainInfo(refresher.domains[key], stats)
+            for key, stats in snapshots.items()]
+
+
+def getDomainDescription(domain: virDomain) -> DomainDescription:
+    return DomainDescription(domain.XMLDesc())
 
 
 def getALlDiskInfo(domain: virDomain) -> list[DiskInfo]:
-    allDiskInfo = []
-    domainTree = fromstring(domain.XMLDesc())
-    diskNames = [disk.attrib['dev'] for disk in domainTree.findall(".//disk[@device='disk']/target")]
-    for name in diskNames:
-        diskXml = tostring(domainTree
-            .find(
-            ".//disk[@device='disk']/target[@dev='{}']/..".format(name)),
-            encoding="unicode")
-        allDiskInfo.append(DiskInfo(name, diskXml))
-    return allDiskInfo
+    return getDomainDescription(domain).allDiskInfo()
+
+
+class DomainDescriptionCache:
+    def __init__(self) -> None:
+        self.lock = Lock()
+        self.descriptions: dict[str, DomainDescription] = {}
+        self.generations: dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, domain: virDomain, key: str) -> DomainDescription:
+        with self.lock:
+            description = self.descriptions.get(key)
+            if description is not None:
+                self.hits += 1
+                return description
+            self.misses += 1
+            generation = self.generations.get(key, 0)
+        description = getDomainDescription(domain)
+        with self.lock:
+            # An invalidation while XMLDesc was in flight makes it stale.
+            if self.generations.get(key, 0) == generation:
+                self.descriptions[key] = description
+        return description
+
+    def invalidate(self, key: str) -> None:
+        with self.lock:
+            self.descriptions.pop(key, None)
+            self.generations[key] = self.generations.get(key, 0) + 1
+
+    def counters(self) -> dict[str, int]:
+        with self.lock:
+            return {"hits_total": self.hits, "misses_total": self.misses,
+                    "entries": len(self.descriptions)}
 
 
 def bootDomain(domain: virDomain) -> None:
@@ -68,6 +476,12 @@ def bootDomain(domain: virDomain) -> None:
         return
 
 
+def startDomain(domain: virDomain) -> None:
+    # bootDomain for batches, where a failed boot must show as a failure.
+    if not domain.isActive():
+        domain.create()
+
+
 def shutdownDomain(domain: virDomain) -> None:
     if domain.isActive():
         domain.shutdown()
@@ -89,6 +503,12 @@ def forceShutDown(domain: virDomain) -> None:
         domain.destroy()
 
 
+def deleteDomain(domain: virDomain) -> None:
+    # destroyDomain for batches, where a failure must show as one.
+    forceShutDown(domain)
+    domain.undefine()
+
+
 def destroyDomain(domain: virDomain) -> None:
     try:
         forceShutDown(domain)
@@ -97,9 +517,273 @@ def destroyDomain(domain: virDomain) -> None:
         return
 
 
+def setBalloon(domain: virDomain, memory: int) -> int:
+    # KiB; the balloon can only move between BALLOON_FLOOR and maxMemory.
+    memory = max(BALLOON_FLOOR, min(memory, domain.maxMemory()))
+    domain.setMemoryFlags(memory, VIR_DOMAIN_AFFECT_LIVE)
+    return memory
+
+
+def enableMemoryStats(domain: virDomain,
+                      period: int = MEMORY_STATS_PERIOD) -> None:
+    # Without a period the guest driver never reports unused/usable memory.
+    domain.setMemoryStatsPeriod(period, VIR_DOMAIN_AFFECT_LIVE)
+
+
 def detachDisk(domain: virDomain, diskInfo: DiskInfo) -> None:
     domain.detachDeviceFlags(diskInfo.xml, VIR_DOMAIN_AFFECT_LIVE | VIR_DOMAIN_AFFECT_CONFIG)
 
 
 def attachDisk(domain: virDomain, xml: str) -> None:
     domain.attachDeviceFlags(xml, VIR_DOMAIN_AFFECT_LIVE | VIR_DOMAIN_AFFECT_CONFIG)
+
+
+class DiskSettings(NamedTuple):
+    target: str
+    source: str
+    readOnly: bool = False
+    bus: str = "virtio"
+    format: str | None = None
+    cache: str | None = None
+    io: str | None = None
+    discard: str | None = None
+    iothread: int | None = None
+    queues: int | None = None
+
+
+class ImageFormatError(Exception):
+    pass
+
+
+def detectImageFormat(path: str) -> str:
+    # Only meaningful when the image lives on this machine.
+    with open(path, 'rb') as image:
+        magic = image.read(len(QCOW2_MAGIC))
+    return "qcow2" if magic == QCOW2_MAGIC else "raw"
+
+
+def resolveImageFormat(domain: virDomain, path: str) -> str:
+    conn = domain.connect()
+    try:
+        return volumeFormat(conn.storageVolLookupByPath(path))
+    except libvirtError:
+        pass
+    if urlparse(conn.getURI()).hostname is None:
+        try:
+            return detectImageFormat(path)
+        except OSError:
+            pass
+    # Guessing raw for a qcow2 image would hand the guest its metadata.
+    raise ImageFormatError("Cannot determine the format of {}; choose one "
+                           "explicitly.".format(path))
+
+
+def xmlAttribute(value) -> str:
+    return escape(str(value), {"'": "&apos;"})
+
+
+def diskXml(settings: DiskSettings) -> str:
+    # Only virtio-blk has iothreads and multiple queues.
+    virtio = settings.bus == "virtio"
+    driver = {"type": settings.format or "raw", "cache": settings.cache,
+              "io": settings.io, "discard": settings.discard,
+              "iothread": settings.iothread if virtio else None,
+              "queues": settings.queues if virtio else None,
+              "error_policy": "stop"}
+    driverAttributes = "".join(" {}='{}'".format(name, xmlAttribute(value))
+                               for name, value in driver.items()
+                               if value is not None)
+    return resourceCache.text("diskXMLTemplate.xml").format(
+        driverAttributes=driverAttributes,
+        source=xmlAttribute(settings.source),
+        target=xmlAttribute(settings.target),
+        bus=xmlAttribute(settings.bus),
+        readOnly="<readonly/>" if settings.readOnly else "")
+
+
+def attachNewDisk(domain: virDomain, settings: DiskSettings) -> None:
+    if settings.format is None:
+        settings = settings._replace(
+            format=resolveImageFormat(domain, settings.source))
+    attachDisk(domain, diskXml(settings))
+
+
+def getBlockIoTune(domain: virDomain, target: str) -> dict[str, int]:
+    flags = VIR_DOMAIN_AFFECT_LIVE if domain.isActive() \
+        else VIR_DOMAIN_AFFECT_CONFIG
+    limits = domain.blockIoTune(target, flags)
+    return {name: limits.get(name, 0) for name in IOTUNE_FIELDS}
+
+
+def setBlockIoTune(domain: virDomain, target: str,
+                   limits: dict[str, int]) -> None:
+    # Applied to the running guest and kept for the next boot.
+    flags = VIR_DOMAIN_AFFECT_CONFIG
+    if domain.isActive():
+        flags |= VIR_DOMAIN_AFFECT_LIVE
+    domain.setBlockIoTune(target, {name: limits[name]
+                                   for name in IOTUNE_FIELDS
+                                   if name in limits}, flags)
+
+
+class VolumeSettings(NamedTuple):
+    name: str
+    capacity: int
+    format: str = "qcow2"
+    preallocation: str = "sparse"
+    baseVolume: str | None = None
+    linkedClone: bool = True
+
+
+def listStoragePools(conn: virConnect) -> dict[str, list[str]]:
+    allVolumeNames = {}
+    for pool in conn.listAllStoragePools(
+            VIR_CONNECT_LIST_STORAGE_POOLS_ACTIVE):
+        try:
+            pool.refresh(0)
+        except libvirtError:
+            pass
+        allVolumeNames[pool.name()] = sorted(pool.listVolumes())
+    return allVolumeNames
+
+
+def volumeFormat(volume: virStorageVol) -> str:
+    formatElement = fromstring(volume.XMLDesc(0)).find("target/format")
+    if formatElement is None:
+        return "raw"
+    return formatElement.get("type", "raw")
+
+
+def volumeXml(settings: VolumeSettings, backingPath: str | None = None,
+              backingFormat: str | None = None) -> str:
+    volume = Element("volume")
+    SubElement(volume, "name").text = settings.name
+    SubElement(volume, "capacity", unit="bytes").text = str(settings.capacity)
+    allocation = settings.capacity \
+        if settings.preallocation == "falloc" else 0
+    SubElement(volume, "allocation", unit="bytes").text = str(allocation)
+    target = SubElement(volume, "target")
+    SubElement(target, "format", type=settings.format)
+    if backingPath is not None:
+        backingStore = SubElement(volume, "backingStore")
+        SubElement(backingStore, "path").text = backingPath
+        SubElement(backingStore, "format", type=backingFormat)
+    return tostring(volume, encoding="unicode")
+
+
+def createVolume(pool: virStoragePool, settings: VolumeSettings,
+                 pollInterval: float = 0.5, onProgress=None) -> str:
+    baseVolume = None
+    backingPath = backingFormat = None
+    if settings.baseVolume is not None:
+        baseVolume = pool.storageVolLookupByName(settings.baseVolume)
+        if settings.capacity == 0:
+            settings = settings._replace(capacity=baseVolume.info()[1])
+        if settings.linkedClone:
+            # A qcow2 overlay that reads unchanged clusters from the base;
+            # raw images have no backing chain.
+            settings = settings._replace(format="qcow2")
+            backingPath = baseVolume.path()
+            backingFormat = volumeFormat(baseVolume)
+            baseVolume = None
+    flags = 0
+    if settings.preallocation == "metadata":
+        flags |= VIR_STORAGE_VOL_CREATE_PREALLOC_METADATA
+    xml = volumeXml(settings, backingPath, backingFormat)
+    if baseVolume is not None:
+        create = partial(pool.createXMLFrom, xml, baseVolume, flags)
+    else:
+        create = partial(pool.createXML, xml, flags)
+
+    # createXML blocks until the image is written, so it runs on its own
+    # thread while this one reports how much has been allocated so far.
+    result = {}
+
+    def build() -> None:
+        try:
+            result["volume"] = create()
+        except libvirtError as err:
+            result["error"] = err
+
+    worker = Thread(target=build, name="volume-create", daemon=True)
+    worker.start()
+    expected = settings.capacity if baseVolume is not None \
+        or settings.preallocation == "falloc" else 0
+    while worker.is_alive():
+        worker.join(pollInterval)
+        if onProgress is None or expected == 0 or not worker.is_alive():
+            continue
+        try:
+            allocation = pool.storageVolLookupByName(settings.name).info()[2]
+        except libvirtError:
+            allocation = 0
+        onProgress(min(allocation, expected), expected)
+    if "error" in result:
+        raise result["error"]
+    if onProgress is not None:
+        onProgress(1, 1)
+    return result["volume"].path()
+
+
+def createPoolVolume(conn: virConnect, poolName: str,
+                     settings: VolumeSettings, onProgress=None) -> str:
+    return createVolume(conn.storagePoolLookupByName(poolName), settings,
+                        onProgress=onProgress)
+
+
+class BatchResult(NamedTuple):
+    uuid: str
+    name: str
+    outcome: str | None
+    error: str | None
+
+
+def shutdownOrDestroy(domain: virDomain, timeout: float,
+                      pollInterval: float = 0.5) -> str:
+    if not domain.isActive():
+        return "inactive"
+    domain.shutdown()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not domain.isActive():
+            return "shut down"
+        time.sleep(pollInterval)
+    try:
+        domain.destroy()
+    except libvirtError:
+        if domain.isActive():
+            raise
+        return "shut down"
+    return "destroyed"
+
+
+def runOne(action, domain: virDomain) -> BatchResult:
+    try:
+        outcome, error = action(domain) or "done", None
+    except libvirtError as err:
+        outcome, error = None, err.get_error_message()
+    return BatchResult(domain.UUIDString(), domain.name(), outcome, error)
+
+
+def failedResult(domain: virDomain, message: str) -> BatchResult:
+    return BatchResult(domain.UUIDString(), domain.name(), None, message)
+
+
+def runMany(action, domains: list[virDomain], concurrency: int = 8,
+            onProgress=None) -> list[BatchResult]:
+    results = []
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(runOne, action, domain)
+                   for domain in domains]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if onProgress is not None:
+                onProgress(len(results), len(futures), result)
+    return results
+
+
+def shutdownMany(domains: list[virDomain], concurrency: int = 8,
+                 timeout: float = 120.0, onProgress=None) -> list[BatchResult]:
+    return runMany(partial(shutdownOrDestroy, timeout=timeout), domains,
+                   concurrency, onProgress)
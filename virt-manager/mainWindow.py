@@ -1,150 +1,291 @@
 import libvirt
-from libvirtUtils import DomainInfo, getAllDomainInfo, bootDomain, \
-    shutdownDomain, resumeDomain, suspendDomain, \
-    destroyDomain, forceShutDown
+from libvirtUtils import DomainInfo, DomainStats, DomainDescriptionCache, \
+    domainKey, bootDomain, startDomain, shutdownDomain, resumeDomain, \
+    suspendDomain, destroyDomain, forceShutDown, \
+    runOne, failedResult, shutdownOrDestroy, BatchResult, \
+    SUSPEND_RESUME_DISABLED_STATES, SHUTDOWN_BOOT_DISABLED_STATES
 from warningDialogue import WarningDialogue
+from jobRunner import JobRunner
+from domainEvents import DomainEventListener
+from connectionManager import ConnectionManager, HostPoll, parseUris, \
+    startEventLoop
+from domainTableModel import DomainTableModel, DomainTableView, \
+    THUMBNAIL_WIDTH as TABLE_THUMBNAIL_WIDTH, \
+    THUMBNAIL_HEIGHT as TABLE_THUMBNAIL_HEIGHT
+from domainRegistry import DomainRegistry, DomainEntry
+from domainIndex import DomainFilter, DomainIndex
+from filterBar import FilterBar
+from snapshotCache import SAVE_INTERVAL, loadSnapshot, saveSnapshot
+from batchBar import BatchActionBar
+from metricsStore import MetricsStore
+from sparkline import SparklineWidget, SPARKLINE_POINTS
+from instrumentation import instrumentation, observeGui
+from statsPanel import StatsPanel
+import resourceCache
 from diskWindow import DiskWindow
-from PyQt5.QtCore import Qt, QTimer
+from cpuTuningWindow import CpuTuningWindow
+from cpuTuning import LOAD_WINDOW, PlacementPlan, planHosts, applyPlacement
+from memoryWindow import MemoryWindow
+from migrateDialogue import MigrateDialogue
+from memoryBalancer import MemoryBalancer, BalloonChange, BalloonPlan, \
+    REBALANCE_INTERVAL, planRebalance, grantGrowth, resizeBalloon
+from consoleThumbnails import ThumbnailCache, CaptureBudget, \
+    THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT, dueCaptures, captureThumbnail
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from PyQt5.QtGui import QPixmap
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout,  \
-    QLabel, QFrame, QSizePolicy, QScrollArea, QPushButton
-from PyQt5.QtGui import QIcon
+    QLabel, QFrame, QSizePolicy, QScrollArea, QPushButton, QCheckBox
 from functools import partial
-
-DOMAIN_NOT_FOUND_ERROR_CODE = 42
+import time
+
+POLL_INTERVAL = 1000
+MAX_COUNTER_POLL_INTERVAL = 16000
+STATS_JOB_KEY = "stats"
+DESCRIPTION_CACHE_METRIC = "virtmanager_description_cache"
+XML_CHANGING_EVENTS = {libvirt.VIR_DOMAIN_EVENT_DEFINED,
+                       libvirt.VIR_DOMAIN_EVENT_UNDEFINED,
+                       libvirt.VIR_DOMAIN_EVENT_STARTED,
+                       libvirt.VIR_DOMAIN_EVENT_STOPPED}
+TABLE_VIEW_THRESHOLD = 200
+BATCH_CONCURRENCY = 16
+BATCH_SHUTDOWN_TIMEOUT = 120.0
+BATCH_ACTIONS = {"boot": startDomain, "forceShutdown": forceShutDown,
+                 "suspend": suspendDomain, "resume": resumeDomain}
+# ms; captures are spread over the second instead of bunching on the poll.
+THUMBNAIL_TICK = 250
+
+
+def renderedFields(stats: DomainStats) -> tuple:
+    # What the state text and sparkline show; any other field can change
+    # without a repaint.
+    pressure = None if stats.memoryStats is None \
+        else stats.memoryStats.pressure
+    return (stats.host, stats.state, stats.maxMemory, stats.memory,
+            stats.vcpuCount, stats.cpuTime, pressure)
 
 
 class DomainGuiElement:
-    def __init__(self, domain,
+    def __init__(self, domainInfo: DomainInfo, window,
                  nameField: QLabel, stateField: QLabel,
                  suspendResumeButton: QPushButton,
                  shutdownBootButton: QPushButton,
                  forceShutdownButton: QPushButton,
-                 destroyButton: QPushButton) -> None:
-        self.domain = domain
+                 destroyButton: QPushButton,
+                 selectCheck: QCheckBox,
+                 sparkline: SparklineWidget,
+                 thumbnailLabel: QLabel,
+                 layout: QVBoxLayout) -> None:
+        self.domainInfo = domainInfo
+        self.window = window
         self.nameField = nameField
         self.stateField = stateField
         self.suspendResumeButton = suspendResumeButton
         self.shutdownBootButton = shutdownBootButton
         self.forceShutdownButton = forceShutdownButton
         self.destroyButton = destroyButton
+        self.selectCheck = selectCheck
+        self.sparkline = sparkline
+        self.thumbnailLabel = thumbnailLabel
+        self.layout = layout
 
         self.forceShutdownButton.setSizePolicy(QSizePolicy.Fixed,
                                                QSizePolicy.Fixed)
-        self.forceShutdownButton.setIcon(QIcon(
-            "resources/forceShutdownButton.png"))
-        self.forceShutdownButton.clicked.connect(partial(forceShutDown,
-                                                         self.domain))
+        self.forceShutdownButton.setIcon(
+            resourceCache.icon("forceShutdownButton"))
+        self.forceShutdownButton.clicked.connect(partial(
+            self.window.runDomainJob, self.domainInfo, forceShutDown))
         self.srButtonConnected = False
         self.sbButtonConnected = False
-        self.updateSuspendResume()
-        self.updateShutdownBoot()
-        self.updateForceShutdown()
-
-    def update(self, domainInfo, window) -> None:
-        self.updateName()
-        self.updateState(domainInfo)
-        self.updateSuspendResume()
-        self.updateShutdownBoot()
-        self.updateForceShutdown()
-
-    def updateSuspendResume(self) -> None:
-        state = self.domain.info()[0]
-        self.suspendResumeButton.setIcon(QIcon("resources/pauseButton.png"))
-        if state in {libvirt.VIR_DOMAIN_SHUTDOWN,
-                     libvirt.VIR_DOMAIN_PMSUSPENDED,
-                     libvirt.VIR_DOMAIN_CRASHED,
-                     libvirt.VIR_DOMAIN_SHUTOFF,
-                     libvirt.VIR_DOMAIN_BLOCKED}:
+        self.renderedStats: DomainStats | None = None
+
+    def update(self, domainInfo: DomainInfo) -> None:
+        stats = domainInfo.stats
+        lastStats = self.renderedStats
+        if stats == lastStats:
+            return
+        if lastStats is None or stats.name != lastStats.name:
+            self.updateName(domainInfo)
+        if lastStats is None or renderedFields(stats) \
+                != renderedFields(lastStats):
+            self.updateState(domainInfo)
+        if lastStats is None or stats.state != lastStats.state:
+            self.updateSuspendResume(stats.state)
+            self.updateShutdownBoot(stats.state)
+            self.updateForceShutdown(stats.state)
+        self.renderedStats = stats
+
+    def updateSuspendResume(self, state: int) -> None:
+        self.suspendResumeButton.setIcon(
+            resourceCache.icon("pauseButton"))
+        if state in SUSPEND_RESUME_DISABLED_STATES:
             self.suspendResumeButton.setEnabled(False)
             return
 
         self.suspendResumeButton.setEnabled(True)
         if state == libvirt.VIR_DOMAIN_PAUSED:
-            self.suspendResumeButton.setIcon(QIcon(
-                "resources/resumeButton.png"))
+            self.suspendResumeButton.setIcon(
+                resourceCache.icon("resumeButton"))
             if self.srButtonConnected:
                 self.suspendResumeButton.clicked.disconnect()
-            self.suspendResumeButton.clicked.connect(partial(resumeDomain,
-                                                             self.domain))
+            self.suspendResumeButton.clicked.connect(partial(
+                self.window.runDomainJob, self.domainInfo, resumeDomain))
             self.srButtonConnected = True
         else:
             if self.srButtonConnected:
                 self.suspendResumeButton.clicked.disconnect()
-            self.suspendResumeButton.clicked.connect(partial(suspendDomain,
-                                                             self.domain))
+            self.suspendResumeButton.clicked.connect(partial(
+                self.window.runDomainJob, self.domainInfo, suspendDomain))
             self.srButtonConnected = True
 
-    def updateShutdownBoot(self):
-        state = self.domain.info()[0]
-        self.shutdownBootButton.setIcon(QIcon("resources/shutdownButton.png"))
-        if state in {libvirt.VIR_DOMAIN_SHUTDOWN,
-                     libvirt.VIR_DOMAIN_PAUSED,
-                     libvirt.VIR_DOMAIN_PMSUSPENDED,
-                     libvirt.VIR_DOMAIN_CRASHED,
-                     libvirt.VIR_DOMAIN_BLOCKED}:
+    def updateShutdownBoot(self, state: int) -> None:
+        self.shutdownBootButton.setIcon(
+            resourceCache.icon("shutdownButton"))
+        if state in SHUTDOWN_BOOT_DISABLED_STATES:
             self.shutdownBootButton.setEnabled(False)
             return
 
         self.shutdownBootButton.setEnabled(True)
         if state == libvirt.VIR_DOMAIN_SHUTOFF:
-            self.shutdownBootButton.setIcon(QIcon("resources/bootButton.png"))
+            self.shutdownBootButton.setIcon(resourceCache.icon("bootButton"))
             if self.sbButtonConnected:
                 self.shutdownBootButton.clicked.disconnect()
-            self.shutdownBootButton.clicked.connect(partial(bootDomain,
-                                                            self.domain))
+            self.shutdownBootButton.clicked.connect(partial(
+                self.window.runDomainJob, self.domainInfo, bootDomain))
             self.sbButtonConnected = True
         else:
             if self.sbButtonConnected:
                 self.shutdownBootButton.clicked.disconnect()
-            self.shutdownBootButton.clicked.connect(partial(shutdownDomain,
-                                                            self.domain))
+            self.shutdownBootButton.clicked.connect(partial(
+                self.window.runDomainJob, self.domainInfo, shutdownDomain))
             self.sbButtonConnected = True
 
-    def updateForceShutdown(self):
-        state = self.domain.info()[0]
+    def updateForceShutdown(self, state: int) -> None:
         self.forceShutdownButton.setEnabled(False)
         if state == libvirt.VIR_DOMAIN_RUNNING:
             self.forceShutdownButton.setEnabled(True)
 
-    def updateName(self):
-        self.nameField.setText(self.domain.name())
+    def updateName(self, domainInfo: DomainInfo) -> None:
+        self.nameField.setText(domainInfo.stats.name)
 
     def updateState(self, domainInfo: DomainInfo):
-        self.stateField.setText(domainInfo.toString())
+        metrics = self.window.metrics
+        key = domainInfo.stats.key
+        self.stateField.setText(domainInfo.toString(metrics.cpuPercent(key)))
+        self.sparkline.setValues(metrics.series(key, count=SPARKLINE_POINTS))
+
+    def setThumbnail(self, pixmap: QPixmap | None) -> None:
+        if pixmap is None:
+            self.thumbnailLabel.clear()
+        else:
+            self.thumbnailLabel.setPixmap(pixmap)
 
 
 class MainWindow(QWidget):
-    def __init__(self, connUri: str) -> None:
+    # Emitted on a poll thread when a host (re)connects.
+    hostReconnected = pyqtSignal(str, object)
+
+    def __init__(self, connUri: str,
+                 tableViewThreshold: int = TABLE_VIEW_THRESHOLD) -> None:
         super().__init__()
-        try:
-            self.conn = libvirt.open(connUri)
-
-            self.allDomainInfo = getAllDomainInfo(self.conn)
-            self.domainIdSet = set()
-            self.allDomainGuiElements: list[DomainGuiElement] = []
-            self.initUi()
-
-            self.timer = QTimer(self)
-            self.timer.timeout.connect(self.update)
-            self.timer.start(1000)
-        except libvirt.libvirtError as err:
-            self.warning = WarningDialogue(err.get_error_message())
-            self.conn.close()
-            self.close()
+        self.tableViewThreshold = tableViewThreshold
+        self.domainModel = None
+        self.diskWindow = None
+        self.statsPanel = None
+        self.cpuTuningWindow = None
+        self.memoryWindow = None
+        self.migrateDialogue = None
+        # host -> MemoryBalancer while automatic rebalancing is on
+        self.memoryBalancers: dict[str, MemoryBalancer] | None = None
+        # Hosts with a rebalance pass in flight; each gets one at a time.
+        self.rebalancingHosts: set[str] = set()
+        self.tickStarted = 0.0
+        self.descriptionCache = DomainDescriptionCache()
+        self.counterLabel = instrumentation.registerCounters(
+            DESCRIPTION_CACHE_METRIC, connUri, self.descriptionCache.counters)
+        self.metrics = MetricsStore()
+        self.jobRunner = JobRunner()
+        self.timer = QTimer(self)
+        self.pollInFlight = False
+        self.pollRequested = False
+        self.domainsSynced = False
+        self.lastSnapshotSave: float | None = None
+        self.eventListeners: dict[str, DomainEventListener] = {}
+        self.thumbnailsShown = False
+        self.thumbnailCache = ThumbnailCache()
+        self.captureBudget = CaptureBudget()
+        # Hosts with a capture in flight; each gets one at a time.
+        self.capturingHosts: set[str] = set()
+        self.thumbnailTimer = QTimer(self)
+        self.thumbnailTimer.timeout.connect(self.captureThumbnails)
+
+        startEventLoop()
+        self.hostReconnected.connect(self.hostConnected, Qt.QueuedConnection)
+        self.connectionManager = ConnectionManager(parseUris(connUri),
+                                                   self.hostReconnected.emit)
+        self.registry = DomainRegistry()
+        # Filters the widget rows; the table model keeps its own index.
+        self.domainIndex = DomainIndex(self.metrics.cpuPercent)
+        self.domainFilter = DomainFilter()
+        self.initUi()
+        self.showCachedDomains()
+
+        self.timer.timeout.connect(self.update)
+        self.timer.start(POLL_INTERVAL)
+        self.update()
 
     def initUi(self) -> None:
         self.setMinimumSize(485, 160)
         self.setWindowTitle("VirtManager")
         self.mainLayout = QVBoxLayout()
 
+        toolbarLayout = QHBoxLayout()
+        self.batchBar = BatchActionBar()
+        self.batchBar.actionRequested.connect(self.runBatchAction)
+        toolbarLayout.addWidget(self.batchBar)
+        autoPlaceButton = QPushButton("Auto-place")
+        autoPlaceButton.setToolTip("Pin busy guests to their own NUMA node "
+                                   "and cores")
+        autoPlaceButton.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        autoPlaceButton.clicked.connect(self.autoPlaceDomains)
+        toolbarLayout.addWidget(autoPlaceButton)
+        memoryButton = QPushButton("Memory")
+        memoryButton.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        memoryButton.clicked.connect(self.openMemoryWindow)
+        toolbarLayout.addWidget(memoryButton)
+        evacuateButton = QPushButton("Evacuate")
+        evacuateButton.setToolTip("Live migrate every running guest off "
+                                  "a host")
+        evacuateButton.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        evacuateButton.clicked.connect(partial(self.openMigrateDialogue,
+                                               None))
+        toolbarLayout.addWidget(evacuateButton)
+        thumbnailsCheck = QCheckBox("Thumbnails")
+        thumbnailsCheck.setToolTip("Show console screenshots of the visible "
+                                   "running guests")
+        thumbnailsCheck.toggled.connect(self.setThumbnailsShown)
+        toolbarLayout.addWidget(thumbnailsCheck)
+        if instrumentation.enabled:
+            statsButton = QPushButton("Stats")
+            statsButton.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+            statsButton.clicked.connect(self.openStatsPanel)
+            toolbarLayout.addWidget(statsButton)
+        self.mainLayout.addLayout(toolbarLayout)
+
+        self.filterBar = FilterBar(list(self.connectionManager.hosts))
+        self.filterBar.filterChanged.connect(self.applyFilter)
+        self.mainLayout.addWidget(self.filterBar)
+
+        self.hostStatusLabel = QLabel()
+        self.hostStatusLabel.setVisible(False)
+        self.mainLayout.addWidget(self.hostStatusLabel)
+
         self.scrollArea = QScrollArea()
         self.scrollArea.setWidgetResizable(True)
 
         scrollContent = QWidget()
         self.scrollLayout = QVBoxLayout(scrollContent)
 
-        for domainInfo in self.allDomainInfo:
-            self.initDomainLayout(domainInfo)
+        self.showDomainRows(self.domainIndex.matched)
         scrollContent.setLayout(self.scrollLayout)
         self.scrollArea.setWidget(scrollContent)
 
@@ -152,28 +293,86 @@ class MainWindow(QWidget):
         self.setLayout(self.mainLayout)
         self.show()
 
-    def initDomainLayout(self, domainInfo: DomainInfo) -> None:
-        self.domainIdSet.add(domainInfo.domain.ID())
-
+    def initTableView(self) -> None:
+        # Thumbnails so far were captured for the larger widget rows.
+        self.thumbnailCache.clear()
+        self.domainModel = DomainTableModel(self.metrics, self)
+        if self.thumbnailsShown:
+            self.domainModel.setThumbnails(self.thumbnailCache)
+        if self.domainFilter != DomainFilter():
+            self.domainModel.setFilter(self.domainFilter)
+        self.domainView = DomainTableView(self.domainModel)
+        self.domainView.actionDelegate.actionTriggered.connect(
+            self.runTableAction)
+        self.mainLayout.replaceWidget(self.scrollArea, self.domainView)
+        self.scrollArea.deleteLater()
+
+    def domainListWidget(self) -> QWidget:
+        if self.domainModel is not None:
+            return self.domainView
+        return self.scrollArea
+
+    def showCachedDomains(self) -> None:
+        # Paints the last known domains before any host has answered; the
+        # first poll then reconciles them and enables the list.
+        snapshots = {}
+        savedAt = []
+        for uri in self.connectionManager.hosts:
+            cached = loadSnapshot(uri)
+            if cached is not None:
+                snapshots.update(cached.snapshots)
+                savedAt.append(cached.savedAt)
+        if len(snapshots) == 0:
+            return
+        if len(snapshots) >= self.tableViewThreshold:
+            self.initTableView()
+        self.reconcileDomains(snapshots, dict.fromkeys(snapshots),
+                              removeMissing=False)
+        self.domainListWidget().setEnabled(False)
+        self.hostStatusLabel.setText(
+            "Showing domains as of {}, connecting...".format(
+                time.strftime("%H:%M:%S", time.localtime(min(savedAt)))))
+        self.hostStatusLabel.setVisible(True)
+
+    def saveSnapshots(self) -> None:
+        now = time.monotonic()
+        if self.lastSnapshotSave is not None \
+                and now - self.lastSnapshotSave < SAVE_INTERVAL:
+            return
+        self.lastSnapshotSave = now
+        for uri, connection in self.connectionManager.hosts.items():
+            if len(connection.lastSnapshots) != 0:
+                self.jobRunner.submit(saveSnapshot, uri,
+                                      connection.lastSnapshots)
+
+    def initDomainLayout(self, entry: DomainEntry) -> None:
+        domainInfo = entry.info
         seperationLine = QFrame()
         seperationLine.setFrameShape(QFrame.HLine)
 
-        self.vmLayout = QVBoxLayout()
-        nameField = QLabel(domainInfo.domain.name())
-        stateField = QLabel(domainInfo.toString())
+        vmLayout = QVBoxLayout()
+        nameField = QLabel(domainInfo.stats.name)
+        stateField = QLabel(domainInfo.toString(
+            self.metrics.cpuPercent(domainInfo.stats.key)))
 
-        self.vmLayout.addWidget(nameField)
-        self.vmLayout.setAlignment(nameField, Qt.AlignCenter)
-        self.initDomainInfoLayout(stateField, nameField, domainInfo)
-        self.vmLayout.addWidget(seperationLine)
+        vmLayout.addWidget(nameField)
+        vmLayout.setAlignment(nameField, Qt.AlignCenter)
+        entry.widgets = self.initDomainInfoLayout(vmLayout, stateField,
+                                                  nameField, domainInfo)
+        vmLayout.addWidget(seperationLine)
 
-        self.scrollLayout.addLayout(self.vmLayout)
-        self.scrollLayout.setAlignment(self.vmLayout, Qt.AlignVCenter)
+        self.scrollLayout.addLayout(vmLayout)
+        self.scrollLayout.setAlignment(vmLayout, Qt.AlignVCenter)
 
-    def initDomainInfoLayout(self, stateField: QLabel, nameField: QLabel,
-                             domainInfo: DomainInfo) -> None:
+    def initDomainInfoLayout(self, vmLayout: QVBoxLayout, stateField: QLabel,
+                             nameField: QLabel,
+                             domainInfo: DomainInfo) -> DomainGuiElement:
         domainInfoLayout = QHBoxLayout()
 
+        selectCheck = QCheckBox()
+        selectCheck.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        domainInfoLayout.addWidget(selectCheck)
+
         suspendResumeButton = QPushButton()
         suspendResumeButton.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
 
@@ -183,32 +382,61 @@ class MainWindow(QWidget):
 
         destroyButton = QPushButton()
         destroyButton.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
-        destroyButton.setIcon(QIcon("resources/destroyButton.png"))
+        destroyButton.setIcon(resourceCache.icon("destroyButton"))
         domainInfoLayout.addWidget(destroyButton)
         domainInfoLayout.setAlignment(destroyButton, Qt.AlignRight)
 
         disksButton = QPushButton()
         disksButton.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
         disksButton.setText("Disks")
-        disksButton.clicked.connect(partial(self.openDiskWindow,
-                                            domainInfo.domain))
-
-        domainGuiElement = DomainGuiElement(domainInfo.domain,
+        disksButton.clicked.connect(partial(self.openDiskWindow, domainInfo))
+
+        cpuButton = QPushButton()
+        cpuButton.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        cpuButton.setText("CPU")
+        cpuButton.clicked.connect(partial(self.openCpuTuningWindow,
+                                          domainInfo))
+
+        migrateButton = QPushButton()
+        migrateButton.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        migrateButton.setText("Migrate")
+        migrateButton.clicked.connect(partial(self.openMigrateDialogue,
+                                              domainInfo))
+
+        sparkline = SparklineWidget()
+
+        thumbnailLabel = QLabel()
+        thumbnailLabel.setFixedSize(THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT)
+        thumbnailLabel.setAlignment(Qt.AlignCenter)
+        thumbnailLabel.setVisible(self.thumbnailsShown)
+        cached = self.thumbnailCache.get(domainInfo.stats.key)
+        if cached is not None and cached.image is not None:
+            thumbnailLabel.setPixmap(cached.image)
+
+        domainGuiElement = DomainGuiElement(domainInfo, self,
                                             nameField, stateField,
                                             suspendResumeButton,
                                             shutdownBootButton,
                                             forceShutdownButton,
-                                            destroyButton)
+                                            destroyButton,
+                                            selectCheck,
+                                            sparkline,
+                                            thumbnailLabel,
+                                            vmLayout)
         destroyButton.clicked.connect(partial(self.removeDomain,
                                               domainInfo,
                                               domainGuiElement))
-        self.allDomainGuiElements.append(domainGuiElement)
+        domainGuiElement.update(domainInfo)
 
+        domainInfoLayout.addWidget(thumbnailLabel)
         domainInfoLayout.addWidget(stateField)
+        domainInfoLayout.addWidget(sparkline)
         domainInfoLayout.addWidget(suspendResumeButton)
         domainInfoLayout.addWidget(shutdownBootButton)
         domainInfoLayout.addWidget(forceShutdownButton)
         domainInfoLayout.addWidget(disksButton)
+        domainInfoLayout.addWidget(cpuButton)
+        domainInfoLayout.addWidget(migrateButton)
 
         domainInfoLayout.setAlignment(stateField, Qt.AlignLeft)
         domainInfoLayout.setAlignment(suspendResumeButton, Qt.AlignRight)
@@ -216,17 +444,48 @@ class MainWindow(QWidget):
         domainInfoLayout.setAlignment(forceShutdownButton, Qt.AlignRight)
         domainInfoLayout.addStretch()
 
-        self.vmLayout.addLayout(domainInfoLayout)
-        self.vmLayout.setAlignment(domainInfoLayout, Qt.AlignCenter)
+        vmLayout.addLayout(domainInfoLayout)
+        vmLayout.setAlignment(domainInfoLayout, Qt.AlignCenter)
+        return domainGuiElement
+
+    def runDomainJob(self, domainInfo: DomainInfo, action) -> None:
+        self.jobRunner.submit(action, domainInfo.domain,
+                              key=domainInfo.stats.key,
+                              onSuccess=self.requestUpdate,
+                              onFailure=self.showWarning)
+
+    def showWarning(self, message: str) -> None:
+        self.warning = WarningDialogue(message)
 
     def removeDomain(self, domainInfo: DomainInfo,
                      domainGuiElement: DomainGuiElement) -> None:
-        destroyDomain(domainInfo.domain)
-        self.domainIdSet.remove(domainInfo.domain.ID())
-        self.allDomainGuiElements.remove(domainGuiElement)
-        self.allDomainInfo.remove(domainInfo)
-        self.removeItemsFromLayout(self.vmLayout)
-        self.scrollLayout.removeItem(self.vmLayout)
+        domainGuiElement.destroyButton.setEnabled(False)
+        self.runDomainJob(domainInfo, destroyDomain)
+
+    def removeDomainRow(self, entry: DomainEntry) -> None:
+        # The entry is already out of the registry; drop its own row.
+        self.metrics.forget(entry.info.stats.key)
+        self.thumbnailCache.remove(entry.info.stats.key)
+        self.domainIndex.remove(entry.info.stats.key)
+        self.hideDomainRow(entry)
+
+    def hideDomainRow(self, entry: DomainEntry) -> None:
+        if entry.widgets is None:
+            return
+        layout = entry.widgets.layout
+        self.removeItemsFromLayout(layout)
+        self.scrollLayout.removeItem(layout)
+        entry.widgets = None
+
+    def removeDomainByKey(self, key: str) -> None:
+        if self.domainModel is not None:
+            self.metrics.forget(key)
+            self.thumbnailCache.remove(key)
+            self.domainModel.removeDomain(key)
+            return
+        entry = self.registry.remove(key)
+        if entry is not None:
+            self.removeDomainRow(entry)
 
     def removeItemsFromLayout(self, layout: QVBoxLayout | QHBoxLayout) -> None:
         while layout.count() != 0:
@@ -240,36 +499,461 @@ class MainWindow(QWidget):
                     layout.removeItem(item)
                     item.widget().deleteLater()
 
+    def requestUpdate(self, _=None) -> None:
+        self.pollRequested = True
+        self.update()
+
     def update(self):
-        try:
-            updatedDomains = self.conn.listAllDomains()
-            if len(updatedDomains) > len(self.allDomainInfo):
-                for domain in updatedDomains:
-                    if domain.ID() not in self.domainIdSet:
-                        domainInfo = DomainInfo(domain)
-                        self.allDomainInfo.append(domainInfo)
-                        self.domainIdSet.add(domain.ID())
-                        self.initDomainLayout(domainInfo)
-        except libvirt.libvirtError as err:
-            self.warning = WarningDialogue(err.get_error_message())
-            self.close()
-            self.timer.timeout.disconnect()
-        for idx, domainGuiElement in enumerate(self.allDomainGuiElements):
-            try:
-                domainGuiElement.update(self.allDomainInfo[idx], self)
-            except libvirt.libvirtError as err:
-                if err.get_error_code() == DOMAIN_NOT_FOUND_ERROR_CODE:
-                    self.removeDomain(self.allDomainInfo[idx],
-                                      domainGuiElement)
-                else:
-                    self.warning = WarningDialogue(err.get_error_message())
-                    self.close()
-
-    def openDiskWindow(self, domain) -> None:
+        if self.pollInFlight:
+            return
+        self.pollInFlight = True
+        self.tickStarted = time.perf_counter()
+        activeOnly = self.domainsSynced and not self.pollRequested \
+            and self.eventsRegistered()
+        self.pollRequested = False
+        self.jobRunner.submit(self.connectionManager.pollAll, activeOnly,
+                              key=STATS_JOB_KEY,
+                              onSuccess=partial(self.applyHostPolls,
+                                                activeOnly),
+                              onFailure=self.pollFailed)
+
+    def eventsRegistered(self) -> bool:
+        for host in self.connectionManager.hosts:
+            listener = self.eventListeners.get(host)
+            if listener is None or not listener.isRegistered():
+                return False
+        return True
+
+    def hostConnected(self, host: str, conn: libvirt.virConnect) -> None:
+        # Queued from the poll thread, so the listener lives on this one.
+        oldListener = self.eventListeners.pop(host, None)
+        if oldListener is not None:
+            oldListener.deregister()
+        listener = DomainEventListener(host, conn)
+        listener.lifecycleChanged.connect(self.domainLifecycleChanged)
+        listener.domainRebooted.connect(self.refreshDomain)
+        listener.devicesChanged.connect(self.domainDevicesChanged)
+        listener.register()
+        self.eventListeners[host] = listener
+
+    def pollFailed(self, message: str) -> None:
+        self.pollInFlight = False
+        self.timer.timeout.disconnect()
+        self.showWarning(message)
+        self.close()
+
+    def applyHostPolls(self, activeOnly: bool,
+                       polls: list[HostPoll]) -> None:
+        self.pollInFlight = False
+        snapshots = {}
+        domains = {}
+        errors = []
+        for poll in polls:
+            self.metrics.record(poll.snapshots, poll.sampledAt)
+            snapshots.update(poll.snapshots)
+            domains.update(poll.domains)
+            if poll.error is not None:
+                errors.append("{}: {}".format(poll.host, poll.error))
+            if poll.reconnected and activeOnly:
+                # Events may have been missed while the host was away.
+                self.pollRequested = True
+        self.hostStatusLabel.setText("\n".join(errors))
+        self.hostStatusLabel.setVisible(len(errors) != 0)
+        if self.memoryBalancers is not None:
+            self.rebalanceMemory(polls)
+        if self.memoryWindow is not None and self.memoryWindow.isVisible():
+            self.memoryWindow.showSnapshots(
+                {key: stats
+                 for connection in self.connectionManager.hosts.values()
+                 for key, stats in connection.lastSnapshots.items()})
+
+        if not self.domainsSynced:
+            if len(errors) == len(polls):
+                self.pollFailed("\n".join(errors))
+                return
+            if self.domainModel is None \
+                    and len(snapshots) >= self.tableViewThreshold:
+                self.initTableView()
+            self.domainsSynced = True
+            self.domainListWidget().setEnabled(True)
+        if not activeOnly:
+            self.metrics.retain(snapshots)
+        reconcileStarted = time.perf_counter()
+        self.reconcileDomains(snapshots, domains,
+                              removeMissing=not activeOnly)
+        if instrumentation.enabled:
+            now = time.perf_counter()
+            observeGui("MainWindow.reconcileDomains", now - reconcileStarted)
+            observeGui("MainWindow.update", now - self.tickStarted)
+        if activeOnly and not any(poll.countersChanged for poll in polls):
+            # Lifecycle changes arrive as events, so idle hosts only need
+            # the counters refreshed every now and then.
+            self.timer.setInterval(min(self.timer.interval() * 2,
+                                       MAX_COUNTER_POLL_INTERVAL))
+        elif activeOnly:
+            # Busy guests keep the sparklines at full resolution.
+            self.timer.setInterval(POLL_INTERVAL)
+        self.saveSnapshots()
+        if self.pollRequested:
+            self.update()
+
+    def reconcileDomains(self, snapshots: dict, domains: dict,
+                         removeMissing: bool) -> None:
+        if self.domainModel is not None:
+            self.domainModel.reconcile(snapshots, domains, removeMissing)
+            return
+        result = self.registry.reconcile(snapshots, domains, removeMissing)
+        for entry in result.removed:
+            self.removeDomainRow(entry)
+        entered, left = self.domainIndex.update(
+            snapshots[key] for key in result.added + result.updated)
+        for key in left:
+            self.hideDomainRow(self.registry.get(key))
+        for key in result.updated:
+            entry = self.registry.get(key)
+            # Filtered-out domains have no widgets to update.
+            if entry.widgets is not None:
+                entry.widgets.update(entry.info)
+        self.showDomainRows(entered)
+
+    def showDomainRows(self, keys) -> None:
+        entries = sorted((self.registry.get(key) for key in keys),
+                         key=lambda entry: entry.info.stats.name)
+        for entry in entries:
+            self.initDomainLayout(entry)
+
+    def applyFilter(self, domainFilter: DomainFilter) -> None:
+        self.domainFilter = domainFilter
+        if self.domainModel is not None:
+            self.domainModel.setFilter(domainFilter)
+            return
+        previous = set(self.domainIndex.matched)
+        matched = self.domainIndex.setFilter(domainFilter)
+        for key in previous - matched:
+            self.hideDomainRow(self.registry.get(key))
+        self.showDomainRows(matched - previous)
+
+    def setThumbnailsShown(self, shown: bool) -> None:
+        self.thumbnailsShown = shown
+        if self.domainModel is not None:
+            self.domainModel.setThumbnails(self.thumbnailCache if shown
+                                           else None)
+        else:
+            for entry in self.registry:
+                if entry.widgets is not None:
+                    entry.widgets.thumbnailLabel.setVisible(shown)
+        if shown:
+            self.thumbnailTimer.start(THUMBNAIL_TICK)
+            self.captureThumbnails()
+        else:
+            self.thumbnailTimer.stop()
+
+    def visibleDomainInfo(self) -> list[DomainInfo]:
+        if not self.isVisible() or self.isMinimized():
+            return []
+        if self.domainModel is not None:
+            rows = self.domainModel.rows
+            return [rows[row] for row in self.domainView.visibleRows()]
+        # Rows scrolled out of the viewport have an empty visible region.
+        return [entry.info for entry in self.registry
+                if entry.widgets is not None
+                and not entry.widgets.thumbnailLabel.visibleRegion().isEmpty()]
+
+    def captureThumbnails(self) -> None:
+        if not self.domainsSynced:
+            return
+        now = time.monotonic()
+        visible = {}
+        for domainInfo in self.visibleDomainInfo():
+            stats = domainInfo.stats
+            if stats.state == libvirt.VIR_DOMAIN_RUNNING:
+                visible[stats.key] = domainInfo
+            elif self.thumbnailCache.remove(stats.key):
+                # A stopped guest's last screen would only mislead.
+                self.showThumbnail(stats.key, None)
+        if self.domainModel is not None:
+            size = (TABLE_THUMBNAIL_WIDTH, TABLE_THUMBNAIL_HEIGHT)
+        else:
+            size = (THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT)
+        for stats in dueCaptures((domainInfo.stats
+                                  for domainInfo in visible.values()),
+                                 self.thumbnailCache, self.captureBudget,
+                                 self.capturingHosts, now):
+            self.capturingHosts.add(stats.host)
+            self.jobRunner.submit(
+                captureThumbnail, visible[stats.key].domain, *size,
+                onSuccess=partial(self.thumbnailCaptured, stats.key,
+                                  stats.host, now),
+                onFailure=partial(self.thumbnailFailed, stats.key,
+                                  stats.host, now))
+
+    def thumbnailCaptured(self, key: str, host: str, capturedAt: float,
+                          image) -> None:
+        self.capturingHosts.discard(host)
+        if not self.thumbnailsShown:
+            return
+        # Converted once here; QPixmap only lives on the GUI thread.
+        pixmap = QPixmap.fromImage(image)
+        self.thumbnailCache.put(key, pixmap, capturedAt)
+        self.showThumbnail(key, pixmap)
+
+    def thumbnailFailed(self, key: str, host: str, capturedAt: float,
+                        message: str) -> None:
+        # Many guests have no graphics console; no dialogue for each one,
+        # the failure is cached so the guest waits out a refresh interval.
+        self.capturingHosts.discard(host)
+        if self.thumbnailCache.peek(key) is not None:
+            self.showThumbnail(key, None)
+        self.thumbnailCache.put(key, None, capturedAt)
+
+    def showThumbnail(self, key: str, pixmap: QPixmap | None) -> None:
+        if self.domainModel is not None:
+            self.domainModel.thumbnailChanged(key)
+            return
+        entry = self.registry.get(key)
+        if entry is not None and entry.widgets is not None:
+            entry.widgets.setThumbnail(pixmap)
+
+    def domainLifecycleChanged(self, host: str, domain: libvirt.virDomain,
+                               event: int, detail: int) -> None:
+        if event in XML_CHANGING_EVENTS:
+            self.domainXmlChanged(host, domain)
+        self.refreshDomain(host, domain)
+
+    def domainDevicesChanged(self, host: str, domain: libvirt.virDomain,
+                             device: str) -> None:
+        self.domainXmlChanged(host, domain)
+
+    def domainXmlChanged(self, host: str, domain: libvirt.virDomain) -> None:
+        key = domainKey(host, domain.UUIDString())
+        self.descriptionCache.invalidate(key)
+        if self.diskWindow is not None and self.diskWindow.isVisible() \
+                and self.diskWindow.domainKey == key:
+            self.diskWindow.reloadDisks()
+
+    def refreshDomain(self, host: str, domain: libvirt.virDomain) -> None:
+        refresher = self.connectionManager.refresher(host)
+        if refresher is None:
+            return
+        self.timer.setInterval(POLL_INTERVAL)
+        self.jobRunner.submit(refresher.refreshDomain, domain,
+                              key=STATS_JOB_KEY,
+                              onSuccess=partial(self.applyDomainRefresh,
+                                                host, domain),
+                              onFailure=self.showWarning)
+
+    def applyDomainRefresh(self, host: str, domain: libvirt.virDomain,
+                           stats: DomainStats | None) -> None:
+        if stats is None:
+            self.removeDomainByKey(domainKey(host, domain.UUIDString()))
+            return
+        self.reconcileDomains({stats.key: stats}, {stats.key: domain},
+                              removeMissing=False)
+
+    def runTableAction(self, key: str, action: str) -> None:
+        domainInfo = self.domainModel.domainInfo(key)
+        if domainInfo is None:
+            return
+        state = domainInfo.stats.state
+        if action == "disks":
+            self.openDiskWindow(domainInfo)
+        elif action == "cpu":
+            self.openCpuTuningWindow(domainInfo)
+        elif action == "migrate":
+            self.openMigrateDialogue(domainInfo)
+        elif action == "suspendResume":
+            self.runDomainJob(domainInfo, resumeDomain
+                              if state == libvirt.VIR_DOMAIN_PAUSED
+                              else suspendDomain)
+        elif action == "shutdownBoot":
+            self.runDomainJob(domainInfo, bootDomain
+                              if state == libvirt.VIR_DOMAIN_SHUTOFF
+                              else shutdownDomain)
+        elif action == "forceShutdown":
+            self.runDomainJob(domainInfo, forceShutDown)
+        elif action == "destroy":
+            self.runDomainJob(domainInfo, destroyDomain)
+
+    def selectedDomainInfo(self) -> list[DomainInfo]:
+        if self.domainModel is not None:
+            allDomainInfo = [self.domainModel.domainInfo(key)
+                             for key in self.domainView.selectedKeys()]
+            return [domainInfo for domainInfo in allDomainInfo
+                    if domainInfo is not None]
+        return [entry.info for entry in self.registry
+                if entry.widgets is not None
+                and entry.widgets.selectCheck.isChecked()]
+
+    def runBatchAction(self, action: str) -> None:
+        allDomainInfo = self.selectedDomainInfo()
+        if len(allDomainInfo) == 0:
+            return
+        if action == "shutdown":
+            domainAction = partial(shutdownOrDestroy,
+                                   timeout=BATCH_SHUTDOWN_TIMEOUT)
+        else:
+            domainAction = BATCH_ACTIONS[action]
+        # One job per guest under its domain key, so a batch never races
+        # a per-row action on the same guest.
+        self.batchBar.startBatch(len(allDomainInfo))
+        self.jobRunner.submitBatch(
+            [(domainInfo.stats.key, partial(runOne, domainAction),
+              domainInfo.domain) for domainInfo in allDomainInfo],
+            failedResult, BATCH_CONCURRENCY,
+            onProgress=self.batchBar.setProgress,
+            onSuccess=self.batchFinished)
+
+    def batchFinished(self, results: list[BatchResult]) -> None:
+        failures = [result for result in results if result.error is not None]
+        self.batchBar.finishBatch(len(results), len(failures))
+        if len(failures) != 0:
+            self.showWarning("\n".join("{}: {}".format(result.name,
+                                                       result.error)
+                                       for result in failures))
+        self.requestUpdate()
+
+    def batchFailed(self, message: str) -> None:
+        self.batchBar.finishBatch(0, 0)
+        self.showWarning(message)
+
+    def openStatsPanel(self) -> None:
+        self.statsPanel = StatsPanel()
+
+    def openDiskWindow(self, domainInfo: DomainInfo) -> None:
         self.setEnabled(False)
-        self.diskWindow = DiskWindow(domain, self)
+        self.diskWindow = DiskWindow(domainInfo.domain, domainInfo.stats.key,
+                                     self)
+
+    def openCpuTuningWindow(self, domainInfo: DomainInfo) -> None:
+        if self.cpuTuningWindow is not None:
+            self.cpuTuningWindow.close()
+        self.cpuTuningWindow = CpuTuningWindow(domainInfo.domain,
+                                               domainInfo.stats.key, self)
+
+    def autoPlaceDomains(self) -> None:
+        targets = []
+        for connection in self.connectionManager.hosts.values():
+            if connection.conn is None:
+                continue
+            domains = dict(connection.lastDomains)
+            # Averaged over the history, not the single last tick.
+            loads = {key: (stats.vcpuCount,
+                           self.metrics.averageCpuPercent(key, LOAD_WINDOW))
+                     for key, stats in connection.lastSnapshots.items()
+                     if stats.state == libvirt.VIR_DOMAIN_RUNNING
+                     and key in domains}
+            targets.append((connection.conn, domains, loads))
+        # Busy until the plans are in and the per-guest jobs start.
+        self.batchBar.startBatch(0)
+        self.jobRunner.submit(planHosts, targets,
+                              onSuccess=self.applyPlacements,
+                              onFailure=self.batchFailed)
+
+    def applyPlacements(self, placements: list[tuple[
+            str, libvirt.virDomain, PlacementPlan, int]]) -> None:
+        self.batchBar.startBatch(len(placements))
+        self.jobRunner.submitBatch(
+            [(key, partial(runOne, partial(applyPlacement, plan, cpuCount)),
+              domain) for key, domain, plan, cpuCount in placements],
+            failedResult, BATCH_CONCURRENCY,
+            onProgress=self.batchBar.setProgress,
+            onSuccess=self.batchFinished)
+
+    def openMigrateDialogue(self, domainInfo: DomainInfo | None) -> None:
+        if self.migrateDialogue is not None:
+            self.migrateDialogue.close()
+        self.migrateDialogue = MigrateDialogue(self, domainInfo)
+
+    def openMemoryWindow(self) -> None:
+        if self.memoryWindow is not None:
+            self.memoryWindow.close()
+        self.memoryWindow = MemoryWindow(self)
+
+    def setRebalancing(self, enabled: bool) -> None:
+        self.memoryBalancers = {} if enabled else None
+
+    def rebalanceMemory(self, polls: list[HostPoll]) -> None:
+        for poll in polls:
+            connection = self.connectionManager.hosts[poll.host]
+            balancer = self.memoryBalancers.setdefault(poll.host,
+                                                       MemoryBalancer())
+            if poll.error is not None or connection.conn is None \
+                    or poll.host in self.rebalancingHosts \
+                    or poll.sampledAt - balancer.lastRebalanced \
+                    < REBALANCE_INTERVAL:
+                continue
+            balancer.lastRebalanced = poll.sampledAt
+            self.rebalancingHosts.add(poll.host)
+            domains = dict(connection.lastDomains)
+            self.jobRunner.submit(planRebalance, connection.conn, domains,
+                                  connection.lastSnapshots, balancer,
+                                  poll.sampledAt, key="balloon/" + poll.host,
+                                  onSuccess=partial(self.shrinkBalloons,
+                                                    poll.host, domains),
+                                  onFailure=partial(self.rebalanceFailed,
+                                                    poll.host))
+
+    def resizeBalloons(self, domains: dict[str, libvirt.virDomain],
+                       changes: list[BalloonChange], onSuccess) -> None:
+        # Every balloon moves under its guest's own key.
+        self.jobRunner.submitBatch(
+            [(change.key, partial(runOne, partial(resizeBalloon, change)),
+              domains[change.key]) for change in changes],
+            failedResult, BATCH_CONCURRENCY, onSuccess=onSuccess)
+
+    def shrinkBalloons(self, host: str, domains: dict[str, libvirt.virDomain],
+                       plan: BalloonPlan) -> None:
+        # Shrinks go first, so growth is only paid for with memory that
+        # was actually handed back.
+        self.resizeBalloons(domains, plan.shrinks, partial(
+            self.growBalloons, host, domains, plan))
+
+    def growBalloons(self, host: str, domains: dict[str, libvirt.virDomain],
+                     plan: BalloonPlan,
+                     shrinkResults: list[BatchResult]) -> None:
+        failed = {result.uuid for result in shrinkResults
+                  if result.error is not None}
+        freed = sum(change.current - change.target
+                    for change in plan.shrinks
+                    if domains[change.key].UUIDString() not in failed)
+        grows = grantGrowth(plan.wants, plan.spare + freed) \
+            if self.memoryBalancers is not None else []
+        self.resizeBalloons(domains, grows, lambda growResults:
+                            self.memoryRebalanced(host, shrinkResults
+                                                  + growResults))
+
+    def memoryRebalanced(self, host: str, results: list[BatchResult]) -> None:
+        self.rebalancingHosts.discard(host)
+        if self.memoryWindow is not None:
+            self.memoryWindow.showRebalance(results)
+
+    def rebalanceFailed(self, host: str, message: str) -> None:
+        self.rebalancingHosts.discard(host)
+        # Stop instead of repeating the same warning every interval.
+        self.setRebalancing(False)
+        if self.memoryWindow is not None:
+            self.memoryWindow.rebalanceCheck.setChecked(False)
+        self.showWarning(message)
 
     def closeEvent(self, event):
-        if self.conn is not None:
-            self.conn.close()
+        self.timer.stop()
+        self.thumbnailTimer.stop()
+        if self.statsPanel is not None:
+            self.statsPanel.close()
+        if self.cpuTuningWindow is not None:
+            self.cpuTuningWindow.close()
+        if self.memoryWindow is not None:
+            self.memoryWindow.close()
+        if self.migrateDialogue is not None:
+            self.migrateDialogue.close()
+        for listener in self.eventListeners.values():
+            listener.deregister()
+        instrumentation.deregisterCounters(DESCRIPTION_CACHE_METRIC,
+                                           self.counterLabel)
+        self.jobRunner.shutdown()
+        if self.domainsSynced:
+            for uri, connection in self.connectionManager.hosts.items():
+                if len(connection.lastSnapshots) != 0:
+                    saveSnapshot(uri, connection.lastSnapshots)
+        self.connectionManager.close()
         event.accept()
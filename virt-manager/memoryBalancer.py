@@ -0,0 +1,130 @@
+from libvirt import VIR_DOMAIN_RUNNING, virConnect, virDomain, libvirtError
+from libvirtUtils import DomainStats, BALLOON_FLOOR, setBalloon, \
+    enableMemoryStats
+from typing import NamedTuple
+
+# Balloon pressure (MemoryStats.pressure) every guest is steered towards.
+TARGET_PRESSURE = 0.7
+# Guests below IDLE_PRESSURE give memory back; guests above HIGH_PRESSURE,
+# or faulting pages in from disk, get more.
+IDLE_PRESSURE = 0.5
+HIGH_PRESSURE = 0.85
+MAJOR_FAULTS_PER_SECOND = 10.0
+# Largest move per pass as a share of maxMemory, so guests adapt gradually.
+MAX_STEP = 0.1
+# KiB; smaller moves are not worth disturbing the guest for.
+MIN_CHANGE = 64 * 1024
+# KiB of host memory that is never handed out to guests.
+HOST_RESERVE = 1024 * 1024
+# Seconds between passes; the balloon driver needs time to settle.
+REBALANCE_INTERVAL = 30
+
+
+class BalloonChange(NamedTuple):
+    key: str
+    current: int
+    target: int
+
+
+class BalloonPlan(NamedTuple):
+    shrinks: list[BalloonChange]
+    # Most pressured first; targets are what each guest would like.
+    wants: list[BalloonChange]
+    # KiB of free host memory above HOST_RESERVE.
+    spare: int
+
+
+class MemoryBalancer:
+    def __init__(self) -> None:
+        self.lastFaults: dict[str, tuple[int, float]] = {}
+        self.statsEnabled: set[str] = set()
+        self.lastRebalanced = 0.0
+
+    def needsStats(self, snapshots: dict[str, DomainStats]) -> list[str]:
+        keys = [key for key, stats in snapshots.items()
+                if stats.state == VIR_DOMAIN_RUNNING
+                and stats.memoryStats is not None
+                and stats.memoryStats.pressure is None
+                and key not in self.statsEnabled]
+        self.statsEnabled.update(keys)
+        return keys
+
+    def faultRate(self, key: str, majorFaults: int,
+                  timestamp: float) -> float:
+        previous = self.lastFaults.get(key)
+        self.lastFaults[key] = (majorFaults, timestamp)
+        if previous is None or timestamp <= previous[1]:
+            return 0.0
+        return max(0, majorFaults - previous[0]) / (timestamp - previous[1])
+
+    def plan(self, snapshots: dict[str, DomainStats], hostFree: int,
+             timestamp: float) -> BalloonPlan:
+        # Idle guests shrink first; what they actually give back, plus free
+        # host memory above HOST_RESERVE, goes to the most pressured guests
+        # through grantGrowth.
+        self.lastFaults = {key: faults
+                           for key, faults in self.lastFaults.items()
+                           if key in snapshots}
+        shrinks = []
+        wants = []
+        for key, stats in snapshots.items():
+            memoryStats = stats.memoryStats
+            if stats.state != VIR_DOMAIN_RUNNING or memoryStats is None:
+                continue
+            pressure = memoryStats.pressure
+            if pressure is None:
+                continue
+            faultRate = self.faultRate(key, memoryStats.majorFaults or 0,
+                                       timestamp)
+            actual = memoryStats.actual
+            step = int(stats.maxMemory * MAX_STEP)
+            desired = int(actual * pressure / TARGET_PRESSURE)
+            if pressure > HIGH_PRESSURE \
+                    or faultRate > MAJOR_FAULTS_PER_SECOND:
+                target = min(stats.maxMemory, actual + step,
+                             max(desired, actual + step // 2))
+                if target - actual >= MIN_CHANGE:
+                    wants.append((pressure, faultRate,
+                                  BalloonChange(key, actual, target)))
+            elif pressure < IDLE_PRESSURE:
+                target = max(BALLOON_FLOOR, desired, actual - step)
+                if actual - target >= MIN_CHANGE:
+                    shrinks.append(BalloonChange(key, actual, target))
+
+        wants.sort(key=lambda want: want[:2], reverse=True)
+        return BalloonPlan(shrinks, [change for _, _, change in wants],
+                           max(0, hostFree - HOST_RESERVE))
+
+
+def grantGrowth(wants: list[BalloonChange],
+                budget: int) -> list[BalloonChange]:
+    grows = []
+    for change in wants:
+        grant = min(change.target - change.current, budget)
+        if grant < MIN_CHANGE:
+            break
+        grows.append(change._replace(target=change.current + grant))
+        budget -= grant
+    return grows
+
+
+def resizeBalloon(change: BalloonChange, domain: virDomain) -> str:
+    memory = setBalloon(domain, change.target)
+    return "{} -> {} MiB".format(change.current // 1024, memory // 1024)
+
+
+def planRebalance(conn: virConnect, domains: dict[str, virDomain],
+                  snapshots: dict[str, DomainStats], balancer: MemoryBalancer,
+                  sampledAt: float) -> BalloonPlan:
+    # Guests undefined since the snapshot have no domain and sit this
+    # pass out.
+    snapshots = {key: stats for key, stats in snapshots.items()
+                 if key in domains}
+    for key in balancer.needsStats(snapshots):
+        try:
+            enableMemoryStats(domains[key])
+        except libvirtError:
+            # No balloon device; the guest simply stays out of the pool.
+            pass
+    hostFree = conn.getFreeMemory() // 1024
+    return balancer.plan(snapshots, hostFree, sampledAt)
@@ -0,0 +1,184 @@
+from guestMemory import GuestMemory, MEMORY_MODES, findAll, hexdumpLines, \
+    parsePattern
+from warningDialogue import WarningDialogue
+from libvirt import virDomain
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QFontDatabase
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, \
+    QComboBox, QLineEdit, QSpinBox, QPushButton, QPlainTextEdit, \
+    QCheckBox, QListWidget, QListWidgetItem, QProgressBar
+
+DUMP_SIZES = (256, 1024, 4096, 16384, 65536)
+MIB = 1024 * 1024
+MATCH_LIMIT = 1000
+
+
+def dumpMemory(memory: GuestMemory, address: int, size: int) -> str:
+    return "\n".join(hexdumpLines(memory.read(address, size), address))
+
+
+class MemoryInspectorWindow(QWidget):
+    def __init__(self, domain: virDomain, domainKey: str, name: str,
+                 parentWindow) -> None:
+        super().__init__()
+        self.jobRunner = parentWindow.jobRunner
+        # Every job of this window runs under one key, so the GuestMemory
+        # caches are only ever touched by one thread at a time.
+        self.jobKey = "inspect/" + domainKey
+        self.memories = {mode: GuestMemory(domain, mode)
+                         for mode in MEMORY_MODES}
+        self.setWindowTitle(name + " memory")
+        self.setMinimumSize(640, 480)
+        self.mainLayout = QVBoxLayout()
+        fixedFont = QFontDatabase.systemFont(QFontDatabase.FixedFont)
+
+        readLayout = QHBoxLayout()
+        self.modeCombo = QComboBox()
+        self.modeCombo.addItems(MEMORY_MODES)
+        self.addressField = QLineEdit("0x0")
+        self.addressField.setFont(fixedFont)
+        self.addressField.returnPressed.connect(self.readMemory)
+        self.sizeCombo = QComboBox()
+        for size in DUMP_SIZES:
+            self.sizeCombo.addItem("{} bytes".format(size), size)
+        previousButton = QPushButton("<")
+        previousButton.clicked.connect(lambda: self.step(-1))
+        nextButton = QPushButton(">")
+        nextButton.clicked.connect(lambda: self.step(1))
+        readButton = QPushButton("Read")
+        readButton.clicked.connect(self.readMemory)
+        refreshButton = QPushButton("Refresh")
+        refreshButton.setToolTip("Drop cached pages and read again")
+        refreshButton.clicked.connect(self.refresh)
+        readLayout.addWidget(self.modeCombo)
+        readLayout.addWidget(QLabel("Address:"))
+        readLayout.addWidget(self.addressField)
+        readLayout.addWidget(self.sizeCombo)
+        readLayout.addWidget(previousButton)
+        readLayout.addWidget(nextButton)
+        readLayout.addWidget(readButton)
+        readLayout.addWidget(refreshButton)
+        self.mainLayout.addLayout(readLayout)
+
+        self.dumpView = QPlainTextEdit()
+        self.dumpView.setReadOnly(True)
+        self.dumpView.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.dumpView.setFont(fixedFont)
+        self.mainLayout.addWidget(self.dumpView)
+
+        searchLayout = QHBoxLayout()
+        self.patternField = QLineEdit()
+        self.patternField.setPlaceholderText("Find text or hex bytes")
+        self.patternField.returnPressed.connect(self.search)
+        self.hexCheck = QCheckBox("Hex")
+        self.searchSizeSpin = QSpinBox()
+        self.searchSizeSpin.setRange(1, 1024 * 1024)
+        self.searchSizeSpin.setValue(256)
+        self.searchSizeSpin.setPrefix("in ")
+        self.searchSizeSpin.setSuffix(" MiB")
+        self.findButton = QPushButton("Find")
+        self.findButton.clicked.connect(self.search)
+        searchLayout.addWidget(self.patternField)
+        searchLayout.addWidget(self.hexCheck)
+        searchLayout.addWidget(self.searchSizeSpin)
+        searchLayout.addWidget(self.findButton)
+        self.mainLayout.addLayout(searchLayout)
+
+        self.searchProgress = QProgressBar()
+        self.searchProgress.setRange(0, 100)
+        self.searchProgress.setVisible(False)
+        self.mainLayout.addWidget(self.searchProgress)
+        self.matchList = QListWidget()
+        self.matchList.setFont(fixedFont)
+        self.matchList.setMaximumHeight(120)
+        self.matchList.itemActivated.connect(self.showMatch)
+        self.mainLayout.addWidget(self.matchList)
+        self.setLayout(self.mainLayout)
+        self.show()
+
+    def memory(self) -> GuestMemory:
+        return self.memories[self.modeCombo.currentText()]
+
+    def address(self) -> int | None:
+        try:
+            return int(self.addressField.text(), 0)
+        except ValueError:
+            self.showError("Invalid address: " + self.addressField.text())
+            return None
+
+    def readMemory(self) -> None:
+        address = self.address()
+        if address is None:
+            return
+        self.jobRunner.submit(dumpMemory, self.memory(), address,
+                              self.sizeCombo.currentData(), key=self.jobKey,
+                              onSuccess=self.dumpView.setPlainText,
+                              onFailure=self.showError)
+
+    def refresh(self) -> None:
+        memory = self.memory()
+        self.jobRunner.submit(memory.invalidate, key=self.jobKey)
+        self.readMemory()
+
+    def step(self, direction: int) -> None:
+        address = self.address()
+        if address is None:
+            return
+        address = max(0, address + direction * self.sizeCombo.currentData())
+        self.addressField.setText("{:#x}".format(address))
+        self.readMemory()
+
+    def search(self) -> None:
+        address = self.address()
+        if address is None:
+            return
+        try:
+            pattern = parsePattern(self.patternField.text(),
+                                   self.hexCheck.isChecked())
+        except ValueError as err:
+            self.showError("Invalid hex pattern: {}".format(err))
+            return
+        if len(pattern) == 0:
+            return
+        self.findButton.setEnabled(False)
+        self.matchList.clear()
+        self.searchProgress.setValue(0)
+        self.searchProgress.setVisible(True)
+        self.jobRunner.submit(findAll, self.memory(), address,
+                              self.searchSizeSpin.value() * MIB, pattern,
+                              MATCH_LIMIT, key=self.jobKey,
+                              onSuccess=self.showMatches,
+                              onFailure=self.searchFailed,
+                              onProgress=self.showSearchProgress)
+
+    def showSearchProgress(self, done: int, total: int) -> None:
+        self.searchProgress.setValue(done * 100 // total)
+
+    def showMatches(self, matches: list[int]) -> None:
+        self.findButton.setEnabled(True)
+        self.searchProgress.setVisible(False)
+        for address in matches:
+            item = QListWidgetItem("{:#018x}".format(address))
+            item.setData(Qt.UserRole, address)
+            self.matchList.addItem(item)
+        if len(matches) == 0:
+            self.matchList.addItem("No matches")
+        elif len(matches) >= MATCH_LIMIT:
+            self.matchList.addItem("Stopped after {} matches".format(
+                MATCH_LIMIT))
+
+    def showMatch(self, item: QListWidgetItem) -> None:
+        address = item.data(Qt.UserRole)
+        if address is None:
+            return
+        # Starts the dump on the row holding the match.
+        self.addressField.setText("{:#x}".format(address & ~0xf))
+        self.readMemory()
+
+    def searchFailed(self, message: str) -> None:
+        self.findButton.setEnabled(True)
+        self.searchProgress.setVisible(False)
+        self.showError(message)
+
+    def showError(self, message: str) -> None:
+        self.warning = WarningDialogue(message)
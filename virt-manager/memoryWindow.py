@@ -0,0 +1,177 @@
+from libvirtUtils import DomainStats, BALLOON_FLOOR, BatchResult, \
+    setBalloon, enableMemoryStats, runMany
+from memoryBalancer import HIGH_PRESSURE
+from warningDialogue import WarningDialogue
+from memoryInspectorWindow import MemoryInspectorWindow
+from libvirt import VIR_DOMAIN_RUNNING
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, \
+    QTableWidget, QTableWidgetItem, QPushButton, QHeaderView, QSpinBox, \
+    QCheckBox, QAbstractItemView
+
+MEMORY_HEADERS = ("Name", "Host", "Balloon MiB", "Max MiB", "Unused MiB",
+                  "Usable MiB", "RSS MiB", "Major faults", "Pressure")
+PRESSURE_COLUMN = 8
+
+
+def formatKib(value: int | None) -> str:
+    return "-" if value is None else str(value // 1024)
+
+
+class MemoryWindow(QWidget):
+    def __init__(self, parentWindow) -> None:
+        super().__init__()
+        self.parentWindow = parentWindow
+        self.jobRunner = parentWindow.jobRunner
+        self.inspectorWindow = None
+        self.rowKeys: list[str] = []
+        self.allStats: dict[str, DomainStats] = {}
+        self.setWindowTitle("Memory")
+        self.setMinimumSize(800, 300)
+        self.mainLayout = QVBoxLayout()
+
+        self.table = QTableWidget(0, len(MEMORY_HEADERS))
+        self.table.setHorizontalHeaderLabels(MEMORY_HEADERS)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(
+            QHeaderView.ResizeToContents)
+        self.table.itemSelectionChanged.connect(self.showSelectedBalloon)
+        self.mainLayout.addWidget(self.table)
+
+        balloonLayout = QHBoxLayout()
+        self.balloonSpin = QSpinBox()
+        self.balloonSpin.setSuffix(" MiB")
+        self.balloonSpin.setEnabled(False)
+        self.setBalloonButton = QPushButton("Set balloon")
+        self.setBalloonButton.setEnabled(False)
+        self.setBalloonButton.clicked.connect(self.resizeBalloon)
+        self.inspectButton = QPushButton("Inspect memory")
+        self.inspectButton.setEnabled(False)
+        self.inspectButton.clicked.connect(self.openInspector)
+        self.rebalanceCheck = QCheckBox("Rebalance hosts automatically")
+        self.rebalanceCheck.setChecked(parentWindow.memoryBalancers
+                                       is not None)
+        self.rebalanceCheck.toggled.connect(parentWindow.setRebalancing)
+        balloonLayout.addWidget(QLabel("Selected guest:"))
+        balloonLayout.addWidget(self.balloonSpin)
+        balloonLayout.addWidget(self.setBalloonButton)
+        balloonLayout.addWidget(self.inspectButton)
+        balloonLayout.addStretch()
+        balloonLayout.addWidget(self.rebalanceCheck)
+        self.mainLayout.addLayout(balloonLayout)
+
+        self.rebalanceLabel = QLabel()
+        self.rebalanceLabel.setWordWrap(True)
+        self.mainLayout.addWidget(self.rebalanceLabel)
+        self.setLayout(self.mainLayout)
+        self.show()
+
+        # Guests only report unused/usable memory once a period is set.
+        runningDomains = [
+            connection.lastDomains[key]
+            for connection in parentWindow.connectionManager.hosts.values()
+            for key, stats in connection.lastSnapshots.items()
+            if stats.state == VIR_DOMAIN_RUNNING
+            and key in connection.lastDomains]
+        self.jobRunner.submit(runMany, enableMemoryStats, runningDomains)
+
+    def showSnapshots(self, allStats: dict[str, DomainStats]) -> None:
+        selectedKey = self.selectedKey()
+        self.allStats = {key: stats for key, stats in allStats.items()
+                         if stats.state == VIR_DOMAIN_RUNNING}
+        self.rowKeys = sorted(self.allStats, key=lambda key: (
+            self.allStats[key].host, self.allStats[key].name))
+        self.table.blockSignals(True)
+        self.table.setRowCount(len(self.rowKeys))
+        for row, key in enumerate(self.rowKeys):
+            stats = self.allStats[key]
+            memoryStats = stats.memoryStats
+            if memoryStats is None:
+                values = (stats.name, stats.host, formatKib(stats.memory),
+                          formatKib(stats.maxMemory), "-", "-", "-", "-", "-")
+                pressure = None
+            else:
+                pressure = memoryStats.pressure
+                values = (stats.name, stats.host,
+                          formatKib(memoryStats.actual),
+                          formatKib(stats.maxMemory),
+                          formatKib(memoryStats.unused),
+                          formatKib(memoryStats.usable),
+                          formatKib(memoryStats.rss),
+                          "-" if memoryStats.majorFaults is None
+                          else str(memoryStats.majorFaults),
+                          "-" if pressure is None
+                          else "{:.0f}%".format(pressure * 100))
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(value))
+            if pressure is not None and pressure > HIGH_PRESSURE:
+                self.table.item(row, PRESSURE_COLUMN).setForeground(
+                    QColor(Qt.red))
+            if key == selectedKey:
+                self.table.selectRow(row)
+        self.table.blockSignals(False)
+        if selectedKey not in self.allStats:
+            self.showSelectedBalloon()
+
+    def selectedKey(self) -> str | None:
+        rows = self.table.selectionModel().selectedRows()
+        if len(rows) == 0 or rows[0].row() >= len(self.rowKeys):
+            return None
+        return self.rowKeys[rows[0].row()]
+
+    def showSelectedBalloon(self) -> None:
+        stats = self.allStats.get(self.selectedKey())
+        self.balloonSpin.setEnabled(stats is not None)
+        self.setBalloonButton.setEnabled(stats is not None)
+        self.inspectButton.setEnabled(stats is not None)
+        if stats is None:
+            return
+        self.balloonSpin.setRange(BALLOON_FLOOR // 1024,
+                                  stats.maxMemory // 1024)
+        self.balloonSpin.setValue(stats.memory // 1024)
+
+    def selectedDomain(self):
+        key = self.selectedKey()
+        stats = self.allStats.get(key)
+        if stats is None:
+            return None
+        connection = self.parentWindow.connectionManager.hosts.get(stats.host)
+        return connection.lastDomains.get(key) if connection else None
+
+    def resizeBalloon(self) -> None:
+        key = self.selectedKey()
+        domain = self.selectedDomain()
+        if domain is None:
+            return
+        self.jobRunner.submit(setBalloon, domain,
+                              self.balloonSpin.value() * 1024, key=key,
+                              onFailure=self.showError)
+
+    def openInspector(self) -> None:
+        key = self.selectedKey()
+        domain = self.selectedDomain()
+        if domain is None:
+            return
+        if self.inspectorWindow is not None:
+            self.inspectorWindow.close()
+        self.inspectorWindow = MemoryInspectorWindow(
+            domain, key, self.allStats[key].name, self.parentWindow)
+
+    def closeEvent(self, event):
+        if self.inspectorWindow is not None:
+            self.inspectorWindow.close()
+        event.accept()
+
+    def showRebalance(self, results: list[BatchResult]) -> None:
+        if len(results) == 0:
+            return
+        self.rebalanceLabel.setText("Last rebalance: " + ", ".join(
+            "{} {}".format(result.name, result.outcome or result.error)
+            for result in results))
+
+    def showError(self, message: str) -> None:
+        self.warning = WarningDialogue(message)
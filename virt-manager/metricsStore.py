@@ -0,0 +1,135 @@
+from libvirtUtils import DomainStats
+from array import array
+
+HISTORY_SECONDS = 3600
+SAMPLE_RATE = 1
+HISTORY_CAPACITY = HISTORY_SECONDS * SAMPLE_RATE
+
+# typecode per sampled field; memory is in KiB so 32 bits cover 4TiB guests
+FIELD_TYPECODES = (("timestamp", "d"), ("cpuPercent", "f"), ("memory", "I"),
+                   ("vcpuCount", "H"), ("state", "B"))
+
+
+class DomainHistory:
+    __slots__ = ("capacity", "start", "length", "lastCpuTime",
+                 "lastTimestamp", "buffers")
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.start = 0
+        self.length = 0
+        self.lastCpuTime: int | None = None
+        self.lastTimestamp: float | None = None
+        self.buffers = {field: array(typecode, bytes(
+            capacity * array(typecode).itemsize))
+            for field, typecode in FIELD_TYPECODES}
+
+    def append(self, timestamp: float, stats: DomainStats) -> None:
+        cpuPercent = 0.0
+        if self.lastCpuTime is not None and stats.vcpuCount > 0 \
+                and stats.cpuTime >= self.lastCpuTime:
+            elapsed = (timestamp - self.lastTimestamp) * 1e9
+            cpuPercent = 100.0 * (stats.cpuTime - self.lastCpuTime) \
+                / (elapsed * stats.vcpuCount)
+        self.lastCpuTime = stats.cpuTime
+        self.lastTimestamp = timestamp
+
+        if self.length < self.capacity:
+            slot = (self.start + self.length) % self.capacity
+            self.length += 1
+        else:
+            slot = self.start
+            self.start = (self.start + 1) % self.capacity
+        buffers = self.buffers
+        buffers["timestamp"][slot] = timestamp
+        buffers["cpuPercent"][slot] = min(cpuPercent, 100.0)
+        buffers["memory"][slot] = min(stats.memory, 0xffffffff)
+        buffers["vcpuCount"][slot] = min(stats.vcpuCount, 0xffff)
+        buffers["state"][slot] = stats.state
+
+    def latest(self, field: str):
+        if self.length == 0:
+            return None
+        return self.buffers[field][(self.start + self.length - 1)
+                                   % self.capacity]
+
+    def series(self, field: str, count: int | None = None) -> array:
+        # Oldest first; at most two slices of the ring are copied.
+        length = self.length if count is None else min(count, self.length)
+        first = (self.start + self.length - length) % self.capacity
+        buffer = self.buffers[field]
+        if first + length <= self.capacity:
+            return buffer[first:first + length]
+        return buffer[first:] + buffer[:first + length - self.capacity]
+
+    def countSince(self, cutoff: float) -> int:
+        # Samples taken after cutoff, counted back from the newest.
+        timestamps = self.buffers["timestamp"]
+        count = 0
+        while count < self.length and timestamps[
+                (self.start + self.length - 1 - count) % self.capacity] \
+                > cutoff:
+            count += 1
+        return count
+
+    def nbytes(self) -> int:
+        return sum(buffer.itemsize * len(buffer)
+                   for buffer in self.buffers.values())
+
+
+class MetricsStore:
+    def __init__(self, capacity: int = HISTORY_CAPACITY) -> None:
+        self.capacity = capacity
+        self.histories: dict[str, DomainHistory] = {}
+
+    def record(self, snapshots: dict[str, DomainStats],
+               timestamp: float) -> None:
+        for key, stats in snapshots.items():
+            history = self.histories.get(key)
+            if history is None:
+                history = DomainHistory(self.capacity)
+                self.histories[key] = history
+            elif history.lastTimestamp is not None \
+                    and timestamp <= history.lastTimestamp:
+                # Stale snapshot of an unreachable host, nothing new.
+                continue
+            history.append(timestamp, stats)
+
+    def retain(self, keys) -> None:
+        for key in self.histories.keys() - set(keys):
+            del self.histories[key]
+
+    def forget(self, key: str) -> None:
+        self.histories.pop(key, None)
+
+    def cpuPercent(self, key: str) -> float:
+        history = self.histories.get(key)
+        if history is None:
+            return 0.0
+        cpuPercent = history.latest("cpuPercent")
+        return 0.0 if cpuPercent is None else cpuPercent
+
+    def averageCpuPercent(self, key: str, seconds: float) -> float:
+        # Weighted by time, since the poll interval backs off when idle;
+        # each sample covers the interval since the one before it.
+        history = self.histories.get(key)
+        if history is None or history.length == 0:
+            return 0.0
+        count = history.countSince(history.lastTimestamp - seconds)
+        timestamps = history.series("timestamp", count + 1)
+        values = history.series("cpuPercent", len(timestamps))
+        elapsed = timestamps[-1] - timestamps[0]
+        if elapsed <= 0:
+            return 0.0
+        return sum(values[index] * (timestamps[index] - timestamps[index - 1])
+                   for index in range(1, len(values))) / elapsed
+
+    def series(self, key: str, field: str = "cpuPercent",
+               count: int | None = None) -> array:
+        history = self.histories.get(key)
+        if history is None:
+            return array(dict(FIELD_TYPECODES)[field])
+        return history.series(field, count)
+
+    def nbytes(self) -> int:
+        return sum(history.nbytes() for history in self.histories.values())
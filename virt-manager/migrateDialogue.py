@@ -0,0 +1,183 @@
+from migration import MigrationSettings, MigrationProgress, \
+    DEFAULT_CONCURRENCY, migrateDomain, migratableDomains, openDestination
+from libvirtUtils import BatchResult, DomainInfo, runOne, failedResult
+from warningDialogue import WarningDialogue
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QFormLayout, QComboBox, \
+    QCheckBox, QSpinBox, QPushButton, QProgressBar, QLabel, QSizePolicy
+from functools import partial
+
+MIB = 1024 * 1024
+
+
+class MigrateDialogue(QWidget):
+    # Migrates one domain, or every running domain of a host when
+    # domainInfo is None.
+    def __init__(self, parentWindow,
+                 domainInfo: DomainInfo | None = None) -> None:
+        super().__init__()
+        self.parentWindow = parentWindow
+        self.jobRunner = parentWindow.jobRunner
+        self.domainInfo = domainInfo
+        hosts = list(parentWindow.connectionManager.hosts)
+        if domainInfo is not None:
+            self.setWindowTitle("Migrate " + domainInfo.stats.name)
+        else:
+            self.setWindowTitle("Evacuate host")
+        self.mainLayout = QVBoxLayout()
+
+        formLayout = QFormLayout()
+        self.sourceCombo = QComboBox()
+        self.sourceCombo.addItems(hosts)
+        self.destinationCombo = QComboBox()
+        self.destinationCombo.setEditable(True)
+        self.destinationCombo.addItems(hosts)
+        if domainInfo is not None:
+            self.sourceCombo.setCurrentText(domainInfo.stats.host)
+            self.sourceCombo.setEnabled(False)
+        self.sourceCombo.currentTextChanged.connect(self.suggestDestination)
+        self.suggestDestination(self.sourceCombo.currentText())
+        self.liveCheck = QCheckBox("Live")
+        self.liveCheck.setChecked(True)
+        self.peerToPeerCheck = QCheckBox("Peer-to-peer")
+        self.compressedCheck = QCheckBox("Compressed")
+        self.autoConvergeCheck = QCheckBox("Auto-converge")
+        self.persistentCheck = QCheckBox("Move the definition as well")
+        self.persistentCheck.setChecked(True)
+        self.bandwidthSpin = QSpinBox()
+        self.bandwidthSpin.setRange(0, 100000)
+        self.bandwidthSpin.setSuffix(" MiB/s")
+        self.bandwidthSpin.setSpecialValueText("unlimited")
+        self.downtimeSpin = QSpinBox()
+        self.downtimeSpin.setRange(0, 60000)
+        self.downtimeSpin.setSuffix(" ms")
+        self.downtimeSpin.setSpecialValueText("default")
+        self.concurrencySpin = QSpinBox()
+        self.concurrencySpin.setRange(1, 16)
+        self.concurrencySpin.setValue(DEFAULT_CONCURRENCY)
+        formLayout.addRow("From:", self.sourceCombo)
+        formLayout.addRow("To:", self.destinationCombo)
+        formLayout.addRow("", self.liveCheck)
+        formLayout.addRow("", self.peerToPeerCheck)
+        formLayout.addRow("", self.compressedCheck)
+        formLayout.addRow("", self.autoConvergeCheck)
+        formLayout.addRow("", self.persistentCheck)
+        formLayout.addRow("Bandwidth:", self.bandwidthSpin)
+        formLayout.addRow("Max downtime:", self.downtimeSpin)
+        if domainInfo is None:
+            formLayout.addRow("Parallel migrations:", self.concurrencySpin)
+
+        self.progressBar = QProgressBar()
+        self.progressBar.setVisible(False)
+        self.progressLabel = QLabel()
+        self.migrateButton = QPushButton("Migrate")
+        self.migrateButton.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        self.migrateButton.clicked.connect(self.migrate)
+
+        self.mainLayout.addLayout(formLayout)
+        self.mainLayout.addWidget(self.progressBar)
+        self.mainLayout.addWidget(self.progressLabel)
+        self.mainLayout.addWidget(self.migrateButton)
+        self.setLayout(self.mainLayout)
+        self.show()
+
+    def suggestDestination(self, source: str) -> None:
+        for index in range(self.destinationCombo.count()):
+            if self.destinationCombo.itemText(index) != source:
+                self.destinationCombo.setCurrentIndex(index)
+                return
+
+    def settings(self) -> MigrationSettings:
+        return MigrationSettings(self.destinationCombo.currentText().strip(),
+                                 self.liveCheck.isChecked(),
+                                 self.peerToPeerCheck.isChecked(),
+                                 self.compressedCheck.isChecked(),
+                                 self.autoConvergeCheck.isChecked(),
+                                 self.persistentCheck.isChecked(),
+                                 self.bandwidthSpin.value(),
+                                 self.downtimeSpin.value())
+
+    def migrate(self) -> None:
+        settings = self.settings()
+        source = self.sourceCombo.currentText()
+        if len(settings.destinationUri) == 0 \
+                or settings.destinationUri == source:
+            self.showError("Pick a destination other than " + source)
+            return
+        if self.domainInfo is not None:
+            self.startProgress(0)
+            self.jobRunner.submit(migrateDomain, self.domainInfo.domain,
+                                  settings, key=self.domainInfo.stats.key,
+                                  onProgress=self.showProgress,
+                                  onSuccess=self.finish,
+                                  onFailure=self.showError)
+            return
+        connection = self.parentWindow.connectionManager.hosts[source]
+        domains = migratableDomains(connection.lastSnapshots,
+                                    connection.lastDomains)
+        if len(domains) == 0:
+            self.showError("Nothing is running on " + source)
+            return
+        self.startProgress(len(domains))
+        self.jobRunner.submit(openDestination, settings,
+                              onSuccess=partial(self.evacuate, domains,
+                                                settings),
+                              onFailure=self.showError)
+
+    def evacuate(self, domains: dict, settings: MigrationSettings,
+                 destination) -> None:
+        # Every migration shares one destination connection and runs under
+        # its guest's key, so it never races another job on that guest;
+        # the spin box bounds how many compete for the link at once.
+        migrate = partial(migrateDomain, settings=settings,
+                          destination=destination)
+        self.jobRunner.submitBatch(
+            [(key, partial(runOne, migrate), domain)
+             for key, domain in domains.items()],
+            failedResult, self.concurrencySpin.value(),
+            onProgress=self.showBatchProgress,
+            onSuccess=partial(self.finishBatch, destination))
+
+    def startProgress(self, total: int) -> None:
+        self.migrateButton.setEnabled(False)
+        self.progressBar.setRange(0, total)
+        self.progressBar.setValue(0)
+        self.progressBar.setVisible(True)
+
+    def showProgress(self, progress: MigrationProgress) -> None:
+        if progress.total == 0:
+            return
+        # Byte counts overflow QProgressBar's int range, so use percent.
+        self.progressBar.setRange(0, 100)
+        self.progressBar.setValue(progress.processed * 100 // progress.total)
+        self.progressLabel.setText(
+            "{} of {} MiB sent, {} MiB left, {:.1f}s".format(
+                progress.processed // MIB, progress.total // MIB,
+                progress.remaining // MIB, progress.elapsedMs / 1000))
+
+    def showBatchProgress(self, done: int, total: int,
+                          result: BatchResult) -> None:
+        self.progressBar.setValue(done)
+        self.progressLabel.setText("{}/{}: {} {}".format(
+            done, total, result.name, result.outcome or result.error))
+
+    def finish(self, _=None) -> None:
+        self.parentWindow.requestUpdate()
+        self.close()
+
+    def finishBatch(self, destination, results: list[BatchResult]) -> None:
+        if destination is not None:
+            self.jobRunner.submit(destination.close)
+        self.parentWindow.requestUpdate()
+        failures = [result for result in results if result.error is not None]
+        if len(failures) == 0:
+            self.close()
+            return
+        self.progressBar.setVisible(False)
+        self.migrateButton.setEnabled(True)
+        self.showError("\n".join("{}: {}".format(result.name, result.error)
+                                 for result in failures))
+
+    def showError(self, message: str) -> None:
+        self.warning = WarningDialogue(message)
+        self.progressBar.setVisible(False)
+        self.migrateButton.setEnabled(True)
@@ -0,0 +1,154 @@
+from libvirt import VIR_MIGRATE_LIVE, VIR_MIGRATE_PEER2PEER, \
+    VIR_MIGRATE_COMPRESSED, VIR_MIGRATE_AUTO_CONVERGE, \
+    VIR_MIGRATE_PERSIST_DEST, VIR_MIGRATE_UNDEFINE_SOURCE, \
+    VIR_MIGRATE_PARAM_BANDWIDTH, VIR_DOMAIN_JOB_NONE, \
+    VIR_DOMAIN_RUNNING, VIR_DOMAIN_PAUSED, \
+    virConnect, virDomain, libvirtError
+from libvirtUtils import BatchResult, DomainStats, runMany
+from functools import partial
+from threading import Thread
+from typing import NamedTuple
+import libvirt
+
+# Domains in other states have nothing to migrate live.
+MIGRATABLE_STATES = {VIR_DOMAIN_RUNNING, VIR_DOMAIN_PAUSED}
+DEFAULT_CONCURRENCY = 2
+
+
+class MigrationSettings(NamedTuple):
+    destinationUri: str
+    live: bool = True
+    peerToPeer: bool = False
+    compressed: bool = False
+    autoConverge: bool = False
+    # Define the guest on the destination and drop it from the source.
+    persistent: bool = True
+    # MiB/s, 0 leaves the hypervisor default
+    bandwidth: int = 0
+    # ms, 0 leaves the hypervisor default
+    maxDowntime: int = 0
+
+
+class MigrationProgress(NamedTuple):
+    processed: int
+    total: int
+    remaining: int
+    elapsedMs: int
+
+
+def migrationFlags(settings: MigrationSettings) -> int:
+    flags = 0
+    if settings.live:
+        flags |= VIR_MIGRATE_LIVE
+    if settings.peerToPeer:
+        flags |= VIR_MIGRATE_PEER2PEER
+    if settings.compressed:
+        flags |= VIR_MIGRATE_COMPRESSED
+    if settings.autoConverge:
+        flags |= VIR_MIGRATE_AUTO_CONVERGE
+    if settings.persistent:
+        flags |= VIR_MIGRATE_PERSIST_DEST | VIR_MIGRATE_UNDEFINE_SOURCE
+    return flags
+
+
+def migrationProgress(jobStats: dict) -> MigrationProgress | None:
+    if jobStats.get("type", VIR_DOMAIN_JOB_NONE) == VIR_DOMAIN_JOB_NONE:
+        return None
+    # data_* covers memory and any copied storage; older daemons only
+    # report memory_*.
+    total = jobStats.get("data_total", jobStats.get("memory_total", 0))
+    processed = jobStats.get("data_processed",
+                             jobStats.get("memory_processed", 0))
+    remaining = jobStats.get("data_remaining",
+                             jobStats.get("memory_remaining", 0))
+    return MigrationProgress(processed, total, remaining,
+                             jobStats.get("time_elapsed", 0))
+
+
+def migrateDomain(domain: virDomain, settings: MigrationSettings,
+                  destination: virConnect | None = None,
+                  pollInterval: float = 0.5, onProgress=None) -> str:
+    params = {}
+    if settings.bandwidth != 0:
+        params[VIR_MIGRATE_PARAM_BANDWIDTH] = settings.bandwidth
+        # Also set on the domain, so it can be changed while migrating.
+        domain.migrateSetMaxSpeed(settings.bandwidth)
+    flags = migrationFlags(settings)
+    ownsDestination = False
+    if settings.peerToPeer:
+        # The source daemon opens the destination connection itself.
+        migrate = partial(domain.migrateToURI3, settings.destinationUri,
+                          params, flags)
+    else:
+        if destination is None:
+            destination = libvirt.open(settings.destinationUri)
+            ownsDestination = True
+        migrate = partial(domain.migrate3, destination, params, flags)
+
+    # migrate3 blocks until the guest runs on the destination, so it runs
+    # on its own thread while this one polls jobStats for progress.
+    result = {}
+
+    def run() -> None:
+        try:
+            migrate()
+        except libvirtError as err:
+            result["error"] = err
+
+    try:
+        worker = Thread(target=run, name="migrate", daemon=True)
+        worker.start()
+        downtimeSet = settings.maxDowntime == 0
+        while worker.is_alive():
+            worker.join(pollInterval)
+            if not worker.is_alive():
+                break
+            try:
+                progress = migrationProgress(domain.jobStats())
+                if progress is not None and not downtimeSet:
+                    # Only accepted once the migration job exists.
+                    domain.migrateSetMaxDowntime(settings.maxDowntime)
+                    downtimeSet = True
+            except libvirtError:
+                progress = None
+            if progress is not None and onProgress is not None:
+                onProgress(progress)
+    finally:
+        if ownsDestination:
+            worker.join()
+            destination.close()
+    if "error" in result:
+        raise result["error"]
+    return "migrated to " + settings.destinationUri
+
+
+def setMigrationSpeed(domain: virDomain, bandwidth: int) -> None:
+    domain.migrateSetMaxSpeed(bandwidth)
+
+
+def migratableDomains(snapshots: dict[str, DomainStats],
+                      domains: dict[str, virDomain]) -> dict[str, virDomain]:
+    return {key: domains[key] for key, stats in snapshots.items()
+            if stats.state in MIGRATABLE_STATES and key in domains}
+
+
+def openDestination(settings: MigrationSettings) -> virConnect | None:
+    # Peer-to-peer migrations have the source daemon connect instead.
+    if settings.peerToPeer:
+        return None
+    return libvirt.open(settings.destinationUri)
+
+
+def evacuateHost(domains: list[virDomain], settings: MigrationSettings,
+                 concurrency: int = DEFAULT_CONCURRENCY,
+                 onProgress=None) -> list[BatchResult]:
+    # Every migration shares one destination connection; concurrency
+    # bounds how many guests compete for the link at once.
+    destination = openDestination(settings)
+    try:
+        return runMany(partial(migrateDomain, settings=settings,
+                               destination=destination),
+                       domains, concurrency, onProgress)
+    finally:
+        if destination is not None:
+            destination.close()
@@ -1,7 +1,13 @@
+from libvirtUtils import DiskSettings, CACHE_MODES, IO_MODES, \
+    DISCARD_MODES, IMAGE_FORMATS
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, \
-    QLabel, QLineEdit, QCheckBox, QPushButton, QSizePolicy
+    QLabel, QLineEdit, QCheckBox, QPushButton, QSizePolicy, QComboBox, \
+    QSpinBox, QFormLayout
 from functools import partial
 
+DEFAULT_CHOICE = "default"
+BUSES = ("virtio", "scsi", "sata")
+
 
 class NewDiskDialogue(QWidget):
     def __init__(self, parentWindow, domain) -> None:
@@ -10,7 +16,7 @@ class NewDiskDialogue(QWidget):
         self.parentWindow = parentWindow
         self.info = None
         self.mainLayout = QVBoxLayout()
-        
+
         nameLayout = QHBoxLayout()
         nameLayout.addWidget(QLabel("Name:"))
         self.nameTextField = QLineEdit()
@@ -26,6 +32,23 @@ class NewDiskDialogue(QWidget):
         self.readOnlyCheck = QCheckBox()
         readOnlyLayout.addWidget(self.readOnlyCheck)
 
+        driverLayout = QFormLayout()
+        self.busCombo = self.makeCombo(BUSES, withDefault=False)
+        self.formatCombo = self.makeCombo(IMAGE_FORMATS)
+        self.formatCombo.setItemText(0, "detect")
+        self.cacheCombo = self.makeCombo(CACHE_MODES)
+        self.ioCombo = self.makeCombo(IO_MODES)
+        self.discardCombo = self.makeCombo(DISCARD_MODES)
+        self.iothreadSpin = self.makeSpin(256)
+        self.queuesSpin = self.makeSpin(64)
+        driverLayout.addRow("Bus:", self.busCombo)
+        driverLayout.addRow("Format:", self.formatCombo)
+        driverLayout.addRow("Cache:", self.cacheCombo)
+        driverLayout.addRow("IO mode:", self.ioCombo)
+        driverLayout.addRow("Discard:", self.discardCombo)
+        driverLayout.addRow("IO thread:", self.iothreadSpin)
+        driverLayout.addRow("Queues (virtio):", self.queuesSpin)
+
         self.okButton = QPushButton("OK")
         self.okButton.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
         self.okButton.clicked.connect(partial(self.parentWindow.addDisk,
@@ -34,23 +57,43 @@ class NewDiskDialogue(QWidget):
         self.mainLayout.addLayout(nameLayout)
         self.mainLayout.addLayout(sourceLayout)
         self.mainLayout.addLayout(readOnlyLayout)
+        self.mainLayout.addLayout(driverLayout)
         self.mainLayout.addWidget(self.okButton)
 
         self.setLayout(self.mainLayout)
         self.show()
         self.setFocus()
 
+    @staticmethod
+    def makeCombo(choices: tuple[str, ...],
+                  withDefault: bool = True) -> QComboBox:
+        combo = QComboBox()
+        if withDefault:
+            combo.addItem(DEFAULT_CHOICE, None)
+        for choice in choices:
+            combo.addItem(choice, choice)
+        return combo
+
+    @staticmethod
+    def makeSpin(maximum: int) -> QSpinBox:
+        spin = QSpinBox()
+        spin.setRange(0, maximum)
+        spin.setSpecialValueText(DEFAULT_CHOICE)
+        return spin
+
     def getInfo(self) -> None:
         if len(self.nameTextField.text()) == 0 \
                 or self.nameTextField.text() in self.parentWindow.allDiskNames \
-                    or len(self.nameTextField.text()) == 0:
+                    or len(self.sourceTextField.text()) == 0:
             self.parentWindow.setEnabled(True)
             self.close()
+            return
 
-        self.parentWindow.newDiskInfo = (self.nameTextField.text(),
-                                         self.sourceTextField.text(),
-                                         self.readOnlyCheck.isChecked())
         self.parentWindow.setEnabled(True)
-        self.parentWindow.newDiskInfo = self.nameTextField.text(), \
-        self.sourceTextField.text(), self.readOnlyCheck.isChecked()
+        self.parentWindow.newDiskInfo = DiskSettings(
+            self.nameTextField.text(), self.sourceTextField.text(),
+            self.readOnlyCheck.isChecked(), self.busCombo.currentData(),
+            self.formatCombo.currentData(), self.cacheCombo.currentData(),
+            self.ioCombo.currentData(), self.discardCombo.currentData(),
+            self.iothreadSpin.value() or None, self.queuesSpin.value() or None)
         self.close()
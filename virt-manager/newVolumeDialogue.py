@@ -0,0 +1,131 @@
+from libvirtUtils import VolumeSettings, IMAGE_FORMATS, PREALLOCATION_MODES, \
+    listStoragePools, createPoolVolume
+from warningDialogue import WarningDialogue
+from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QFormLayout, QLineEdit, \
+    QComboBox, QDoubleSpinBox, QCheckBox, QPushButton, QProgressBar, \
+    QSizePolicy
+from functools import partial
+
+GIB = 1024 ** 3
+NO_BASE_VOLUME = "none"
+
+
+class NewVolumeDialogue(QWidget):
+    # path, settings, target dev to attach as ("" for none)
+    volumeCreated = pyqtSignal(str, object, str)
+
+    def __init__(self, parentWindow, conn) -> None:
+        super().__init__()
+        self.parentWindow = parentWindow
+        self.jobRunner = parentWindow.jobRunner
+        self.conn = conn
+        self.allVolumeNames: dict[str, list[str]] = {}
+        self.setWindowTitle("New volume")
+        self.mainLayout = QVBoxLayout()
+
+        formLayout = QFormLayout()
+        self.poolCombo = QComboBox()
+        self.poolCombo.currentTextChanged.connect(self.showBaseVolumes)
+        self.nameTextField = QLineEdit()
+        self.sizeSpin = QDoubleSpinBox()
+        self.sizeSpin.setRange(0, 65536)
+        self.sizeSpin.setDecimals(1)
+        self.sizeSpin.setValue(10)
+        self.sizeSpin.setSuffix(" GiB")
+        self.sizeSpin.setSpecialValueText("same as base")
+        self.formatCombo = QComboBox()
+        self.formatCombo.addItems(IMAGE_FORMATS)
+        self.formatCombo.setCurrentText("qcow2")
+        self.preallocationCombo = QComboBox()
+        self.preallocationCombo.addItems(PREALLOCATION_MODES)
+        self.baseCombo = QComboBox()
+        self.linkedCloneCheck = QCheckBox("Linked clone (backing chain)")
+        self.linkedCloneCheck.setChecked(True)
+        self.baseCombo.currentIndexChanged.connect(self.updateFormat)
+        self.linkedCloneCheck.toggled.connect(self.updateFormat)
+        self.targetTextField = QLineEdit()
+        self.targetTextField.setPlaceholderText("e.g. vdb, empty to skip")
+        formLayout.addRow("Pool:", self.poolCombo)
+        formLayout.addRow("Name:", self.nameTextField)
+        formLayout.addRow("Size:", self.sizeSpin)
+        formLayout.addRow("Format:", self.formatCombo)
+        formLayout.addRow("Preallocation:", self.preallocationCombo)
+        formLayout.addRow("Base volume:", self.baseCombo)
+        formLayout.addRow("", self.linkedCloneCheck)
+        formLayout.addRow("Attach as:", self.targetTextField)
+
+        self.progressBar = QProgressBar()
+        self.progressBar.setVisible(False)
+        self.createButton = QPushButton("Create")
+        self.createButton.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        self.createButton.setEnabled(False)
+        self.createButton.clicked.connect(self.createVolume)
+
+        self.mainLayout.addLayout(formLayout)
+        self.mainLayout.addWidget(self.progressBar)
+        self.mainLayout.addWidget(self.createButton)
+        self.setLayout(self.mainLayout)
+        self.show()
+
+        self.jobRunner.submit(listStoragePools, conn,
+                              onSuccess=self.showPools,
+                              onFailure=self.showError)
+
+    def showPools(self, allVolumeNames: dict[str, list[str]]) -> None:
+        self.allVolumeNames = allVolumeNames
+        self.poolCombo.addItems(sorted(allVolumeNames))
+        self.createButton.setEnabled(len(allVolumeNames) != 0)
+
+    def showBaseVolumes(self, poolName: str) -> None:
+        self.baseCombo.clear()
+        self.baseCombo.addItem(NO_BASE_VOLUME, None)
+        for volumeName in self.allVolumeNames.get(poolName, []):
+            self.baseCombo.addItem(volumeName, volumeName)
+
+    def updateFormat(self) -> None:
+        # Linked clones are always qcow2 overlays.
+        linked = self.baseCombo.currentData() is not None \
+            and self.linkedCloneCheck.isChecked()
+        if linked:
+            self.formatCombo.setCurrentText("qcow2")
+        self.formatCombo.setEnabled(not linked)
+
+    def createVolume(self) -> None:
+        name = self.nameTextField.text()
+        poolName = self.poolCombo.currentText()
+        baseVolume = self.baseCombo.currentData()
+        if len(name) == 0 or name in self.allVolumeNames.get(poolName, []):
+            self.warning = WarningDialogue("Volume name is empty or taken.")
+            return
+        if self.sizeSpin.value() == 0 and baseVolume is None:
+            self.warning = WarningDialogue("A new volume needs a size.")
+            return
+        settings = VolumeSettings(name, int(self.sizeSpin.value() * GIB),
+                                  self.formatCombo.currentText(),
+                                  self.preallocationCombo.currentText(),
+                                  baseVolume,
+                                  self.linkedCloneCheck.isChecked())
+        self.createButton.setEnabled(False)
+        self.progressBar.setRange(0, 0)
+        self.progressBar.setVisible(True)
+        self.jobRunner.submit(createPoolVolume, self.conn, poolName, settings,
+                              key="volume/" + poolName + "/" + name,
+                              onProgress=self.showProgress,
+                              onSuccess=partial(self.finish,
+                                                settings=settings),
+                              onFailure=self.showError)
+
+    def showProgress(self, done: int, total: int) -> None:
+        # Byte counts overflow QProgressBar's int range, so use percent.
+        self.progressBar.setRange(0, 100)
+        self.progressBar.setValue(done * 100 // total)
+
+    def finish(self, path: str, settings: VolumeSettings) -> None:
+        self.volumeCreated.emit(path, settings, self.targetTextField.text())
+        self.close()
+
+    def showError(self, message: str) -> None:
+        self.warning = WarningDialogue(message)
+        self.progressBar.setVisible(False)
+        self.createButton.setEnabled(len(self.allVolumeNames) != 0)
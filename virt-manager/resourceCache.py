@@ -0,0 +1,72 @@
+import os
+import sys
+
+RESOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "resources")
+QRC_PREFIX = ":/resources"
+ICON_NAMES = ("bootButton", "destroyButton", "forceShutdownButton",
+              "pauseButton", "resumeButton", "shutdownButton")
+
+# PyQt5 is only imported once an icon or a compiled resource is needed, so
+# the command line tools can read text resources without loading Qt.
+compiledResourcesLoaded: bool | None = None
+iconCache: dict = {}
+textCache: dict[str, str] = {}
+
+
+def useCompiledResources() -> bool:
+    global compiledResourcesLoaded
+    if compiledResourcesLoaded is None:
+        try:
+            # Generated with:
+            # pyrcc5 resources/resources.qrc -o compiledResources.py
+            import compiledResources  # noqa: F401
+            compiledResourcesLoaded = True
+        except ImportError:
+            compiledResourcesLoaded = False
+    return compiledResourcesLoaded
+
+
+def resourcePath(fileName: str) -> str:
+    if useCompiledResources():
+        return QRC_PREFIX + "/" + fileName
+    return os.path.join(RESOURCE_DIR, fileName)
+
+
+def icon(name: str):
+    cachedIcon = iconCache.get(name)
+    if cachedIcon is None:
+        from PyQt5.QtGui import QIcon, QPixmap
+        cachedIcon = QIcon(QPixmap(resourcePath(name + ".png")))
+        iconCache[name] = cachedIcon
+    return cachedIcon
+
+
+def readQtResource(path: str) -> str:
+    from PyQt5.QtCore import QFile, QIODevice
+    resourceFile = QFile(path)
+    if not resourceFile.open(QIODevice.ReadOnly | QIODevice.Text):
+        raise FileNotFoundError(path)
+    content = bytes(resourceFile.readAll()).decode()
+    resourceFile.close()
+    return content
+
+
+def text(fileName: str) -> str:
+    cachedText = textCache.get(fileName)
+    if cachedText is None:
+        # The GUI reads the compiled resources without touching the
+        # filesystem; the command line tools never load Qt for a file.
+        if "PyQt5.QtCore" in sys.modules and useCompiledResources():
+            cachedText = readQtResource(resourcePath(fileName))
+        else:
+            with open(os.path.join(RESOURCE_DIR, fileName)) as resourceFile:
+                cachedText = resourceFile.read()
+        textCache[fileName] = cachedText
+    return cachedText
+
+
+def preloadResources() -> None:
+    for name in ICON_NAMES:
+        icon(name)
+    text("diskXMLTemplate.xml")
@@ -0,0 +1,70 @@
+from libvirtUtils import DomainStats
+from hashlib import sha1
+from typing import NamedTuple
+import json
+import os
+import time
+
+CACHE_VARIABLE = "VIRTMANAGER_CACHE_DIR"
+CACHE_DIR = os.environ.get(CACHE_VARIABLE) or os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+    "virt-manager")
+CACHE_VERSION = 1
+# Seconds between background saves while the window is open.
+SAVE_INTERVAL = 300
+# Fields written per domain; memoryStats is live-only and not cached.
+CACHED_FIELDS = ("uuid", "name", "state", "maxMemory", "memory",
+                 "vcpuCount", "cpuTime")
+
+
+class CachedSnapshot(NamedTuple):
+    uri: str
+    savedAt: float
+    snapshots: dict[str, DomainStats]
+
+
+def cachePath(uri: str, cacheDir: str = CACHE_DIR) -> str:
+    # URIs contain slashes and may carry user names, so hash them.
+    return os.path.join(cacheDir,
+                        sha1(uri.encode()).hexdigest()[:16] + ".json")
+
+
+def saveSnapshot(uri: str, snapshots: dict[str, DomainStats],
+                 cacheDir: str = CACHE_DIR) -> bool:
+    # One row of values per domain with no repeated keys, roughly 100
+    # bytes each.
+    content = json.dumps({"version": CACHE_VERSION, "uri": uri,
+                          "savedAt": time.time(),
+                          "domains": [list(stats[:len(CACHED_FIELDS)])
+                                      for stats in snapshots.values()]},
+                         separators=(",", ":"))
+    path = cachePath(uri, cacheDir)
+    temporaryPath = path + ".tmp"
+    try:
+        os.makedirs(cacheDir, exist_ok=True)
+        with open(temporaryPath, 'w') as cacheFile:
+            cacheFile.write(content)
+        # A crash mid-write must not leave half a file for the next launch.
+        os.replace(temporaryPath, path)
+    except OSError:
+        # The cache is an optimisation; a read-only home must not break
+        # the window.
+        return False
+    return True
+
+
+def loadSnapshot(uri: str,
+                 cacheDir: str = CACHE_DIR) -> CachedSnapshot | None:
+    try:
+        with open(cachePath(uri, cacheDir)) as cacheFile:
+            content = json.load(cacheFile)
+        if content.get("version") != CACHE_VERSION \
+                or content.get("uri") != uri:
+            return None
+        allStats = (DomainStats(*values, host=uri)
+                    for values in content["domains"])
+        return CachedSnapshot(uri, content["savedAt"],
+                              {stats.key: stats for stats in allStats})
+    except (OSError, ValueError, KeyError, TypeError):
+        # A missing or damaged cache only costs the instant first paint.
+        return None
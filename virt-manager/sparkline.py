@@ -0,0 +1,41 @@
+from PyQt5.QtCore import QPointF, QRect, QSize
+from PyQt5.QtGui import QPainter, QPolygonF, QColor
+from PyQt5.QtWidgets import QWidget, QSizePolicy
+
+SPARKLINE_SIZE = QSize(120, 24)
+SPARKLINE_POINTS = 120
+SPARKLINE_COLOR = QColor(40, 120, 200)
+
+
+def paintSparkline(painter: QPainter, rect: QRect, values,
+                   maximum: float = 100.0) -> None:
+    if len(values) < 2 or maximum <= 0:
+        return
+    step = rect.width() / (len(values) - 1)
+    bottom = rect.bottom()
+    scale = rect.height() / maximum
+    polygon = QPolygonF([QPointF(rect.left() + idx * step,
+                                 bottom - min(value, maximum) * scale)
+                         for idx, value in enumerate(values)])
+    painter.save()
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.setPen(SPARKLINE_COLOR)
+    painter.drawPolyline(polygon)
+    painter.restore()
+
+
+class SparklineWidget(QWidget):
+    def __init__(self) -> None:
+        super().__init__()
+        self.values = []
+        self.setFixedSize(SPARKLINE_SIZE)
+        self.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+
+    def setValues(self, values) -> None:
+        self.values = values
+        self.update()
+
+    def paintEvent(self, event) -> None:
+        painter = QPainter(self)
+        paintSparkline(painter, self.rect().adjusted(1, 1, -1, -1),
+                       self.values)
@@ -0,0 +1,89 @@
+from instrumentation import instrumentation
+from warningDialogue import WarningDialogue
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, \
+    QTableWidget, QTableWidgetItem, QPushButton, QHeaderView, QFileDialog, \
+    QAbstractItemView
+from functools import partial
+
+REFRESH_INTERVAL = 1000
+STATS_HEADERS = ("Metric", "Method", "URI", "Count", "Errors", "Mean ms",
+                 "p50 ms", "p95 ms", "Max ms")
+
+
+class StatsPanel(QWidget):
+    def __init__(self) -> None:
+        super().__init__()
+        self.setWindowTitle("Instrumentation")
+        self.setMinimumSize(800, 300)
+        self.mainLayout = QVBoxLayout()
+
+        self.table = QTableWidget(0, len(STATS_HEADERS))
+        self.table.setHorizontalHeaderLabels(STATS_HEADERS)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(
+            QHeaderView.ResizeToContents)
+        self.mainLayout.addWidget(self.table)
+
+        buttonLayout = QHBoxLayout()
+        resetButton = QPushButton("Reset")
+        resetButton.clicked.connect(self.resetStats)
+        prometheusButton = QPushButton("Save Prometheus...")
+        prometheusButton.clicked.connect(partial(
+            self.saveDump, "Prometheus text (*.prom *.txt)",
+            instrumentation.toPrometheus))
+        jsonButton = QPushButton("Save JSON...")
+        jsonButton.clicked.connect(partial(self.saveDump, "JSON (*.json)",
+                                           instrumentation.toJson))
+        buttonLayout.addWidget(resetButton)
+        buttonLayout.addStretch()
+        buttonLayout.addWidget(prometheusButton)
+        buttonLayout.addWidget(jsonButton)
+        self.mainLayout.addLayout(buttonLayout)
+        self.setLayout(self.mainLayout)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(REFRESH_INTERVAL)
+        self.refresh()
+        self.show()
+
+    def refresh(self) -> None:
+        entries = instrumentation.snapshot()
+        counters = instrumentation.counters()
+        self.table.setRowCount(len(entries) + len(counters))
+        for row, ((metric, method, uri), histogram) in enumerate(entries):
+            values = (metric, method, uri, str(histogram.count),
+                      str(histogram.errors),
+                      "{:.2f}".format(histogram.mean() * 1000),
+                      "{:.2f}".format(histogram.quantile(0.5) * 1000),
+                      "{:.2f}".format(histogram.quantile(0.95) * 1000),
+                      "{:.2f}".format(histogram.maximum * 1000))
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(value))
+        # Plain counters fill only the Count column.
+        for row, (metric, uri, value) in enumerate(counters, len(entries)):
+            values = (metric, "", uri, str(value)) \
+                + ("",) * (len(STATS_HEADERS) - 4)
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(value))
+
+    def resetStats(self) -> None:
+        instrumentation.reset()
+        self.refresh()
+
+    def saveDump(self, fileFilter: str, render) -> None:
+        path, _ = QFileDialog.getSaveFileName(self, "Save metrics", "",
+                                              fileFilter)
+        if len(path) == 0:
+            return
+        try:
+            with open(path, 'w') as dump:
+                dump.write(render())
+        except OSError as err:
+            self.warning = WarningDialogue(str(err))
+
+    def closeEvent(self, event) -> None:
+        self.timer.stop()
+        event.accept()
@@ -1,8 +1,21 @@
-from launchWindow import LaunchWindow
+from virtctl import COMMANDS, main
 import sys
-from PyQt5.QtWidgets import QApplication
 
-if __name__ == "__main__":
+
+def runGui() -> int:
+    # Qt is imported only here so command line use stays light.
+    from launchWindow import LaunchWindow
+    from resourceCache import preloadResources
+    from PyQt5.QtWidgets import QApplication
+
     app = QApplication(sys.argv)
-    launchWindow = LaunchWindow()
-    sys.exit(app.exec_())
+    preloadResources()
+    # Kept on the application so the window is not garbage collected.
+    app.launchWindow = LaunchWindow()
+    return app.exec_()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        sys.exit(main(sys.argv[1:]))
+    sys.exit(runGui())
@@ -0,0 +1,496 @@
+from connectionManager import ConnectionManager, HostPoll, parseUris
+from libvirtUtils import DomainInfo, DomainStats, DiskSettings, BatchResult, \
+    ImageFormatError, startDomain, deleteDomain, attachNewDisk, \
+    detachDisk, getBlockIoTune, setBlockIoTune, runMany, shutdownMany, \
+    setBalloon, memoryStatsFromDict, CACHE_MODES, IO_MODES, DISCARD_MODES, \
+    IMAGE_FORMATS, IOTUNE_FIELDS
+from metricsStore import MetricsStore
+from migration import MigrationSettings, MigrationProgress, migrateDomain, \
+    migratableDomains, evacuateHost, \
+    DEFAULT_CONCURRENCY as MIGRATION_CONCURRENCY
+from guestMemory import GuestMemory, MEMORY_MODES, findAll, \
+    hexdumpLines, parsePattern
+import libvirt
+import argparse
+import json
+import os
+import sys
+import time
+
+# Nothing in this module may import PyQt5; it runs on headless hosts.
+COMMANDS = ("list", "stats", "watch", "boot", "shutdown", "destroy", "disks",
+            "attach", "detach", "iotune", "balloon", "migrate", "evacuate",
+            "peek")
+DEFAULT_URI = os.environ.get("LIBVIRT_DEFAULT_URI", "qemu:///system")
+DEFAULT_CONCURRENCY = 8
+
+
+class CliError(Exception):
+    pass
+
+
+class Fleet:
+    def __init__(self, uris: str) -> None:
+        self.manager = ConnectionManager(parseUris(uris))
+        self.metrics = MetricsStore()
+        self.snapshots: dict[str, DomainStats] = {}
+        self.domains: dict[str, libvirt.virDomain] = {}
+
+    def poll(self) -> list[HostPoll]:
+        polls = self.manager.pollAll()
+        errors = []
+        self.snapshots = {}
+        self.domains = {}
+        for poll in polls:
+            if poll.error is not None:
+                errors.append("{}: {}".format(poll.host, poll.error))
+                continue
+            self.metrics.record(poll.snapshots, poll.sampledAt)
+            self.snapshots.update(poll.snapshots)
+            self.domains.update(poll.domains)
+        for error in errors:
+            print(error, file=sys.stderr)
+        if len(errors) == len(polls):
+            raise CliError("no host could be reached")
+        return polls
+
+    def find(self, names: list[str]) -> list[DomainInfo]:
+        # Accepts names, UUIDs or "<uri>/<uuid>" keys.
+        found = []
+        for name in names:
+            matches = [stats for key, stats in self.snapshots.items()
+                       if name in (stats.name, stats.uuid, key)]
+            if len(matches) == 0:
+                raise CliError("domain not found: {}".format(name))
+            if len(matches) > 1:
+                raise CliError("{} exists on several hosts, use one of: {}"
+                               .format(name, ", ".join(stats.key
+                                                      for stats in matches)))
+            found.append(DomainInfo(self.domains[matches[0].key], matches[0]))
+        return found
+
+    def close(self) -> None:
+        self.manager.close()
+
+
+def statsRecord(domainInfo: DomainInfo, metrics: MetricsStore) -> dict:
+    stats = domainInfo.stats
+    record = stats._asdict()
+    if stats.memoryStats is not None:
+        record["memoryStats"] = stats.memoryStats._asdict()
+    record["stateName"] = domainInfo.stateToString(stats.state)
+    record["cpuPercent"] = round(metrics.cpuPercent(stats.key), 2)
+    return record
+
+
+def printTable(rows: list[tuple], headers: tuple) -> None:
+    widths = [max(len(str(value)) for value in column)
+              for column in zip(headers, *rows)]
+    for row in (headers, *rows):
+        print("  ".join(str(value).ljust(width)
+                        for value, width in zip(row, widths)).rstrip())
+
+
+def sortedDomainInfo(fleet: Fleet, names: list[str]) -> list[DomainInfo]:
+    if len(names) != 0:
+        return fleet.find(names)
+    return [DomainInfo(fleet.domains[key], stats) for key, stats in
+            sorted(fleet.snapshots.items(),
+                   key=lambda item: (item[1].host, item[1].name))]
+
+
+def listCommand(fleet: Fleet, args) -> int:
+    fleet.poll()
+    allDomainInfo = [domainInfo
+                     for domainInfo in sortedDomainInfo(fleet, [])
+                     if not args.active
+                     or domainInfo.stats.state != libvirt.VIR_DOMAIN_SHUTOFF]
+    if args.json:
+        print(json.dumps([{"name": domainInfo.stats.name,
+                           "uuid": domainInfo.stats.uuid,
+                           "host": domainInfo.stats.host,
+                           "state": domainInfo.stateToString(
+                               domainInfo.stats.state)}
+                          for domainInfo in allDomainInfo], indent=2))
+        return 0
+    printTable([(domainInfo.stats.name,
+                 domainInfo.stateToString(domainInfo.stats.state),
+                 domainInfo.stats.host, domainInfo.stats.uuid)
+                for domainInfo in allDomainInfo],
+               ("NAME", "STATE", "HOST", "UUID"))
+    return 0
+
+
+def printStats(fleet: Fleet, allDomainInfo: list[DomainInfo],
+               asJson: bool) -> None:
+    if asJson:
+        print(json.dumps([statsRecord(domainInfo, fleet.metrics)
+                          for domainInfo in allDomainInfo], indent=2))
+        return
+    rows = []
+    for domainInfo in allDomainInfo:
+        record = statsRecord(domainInfo, fleet.metrics)
+        rows.append((record["name"], record["stateName"],
+                     "{:.1f}%".format(record["cpuPercent"]),
+                     "{}/{}KB".format(record["memory"], record["maxMemory"]),
+                     record["vcpuCount"], record["cpuTime"], record["host"]))
+    printTable(rows, ("NAME", "STATE", "CPU", "MEMORY", "VCPUS",
+                      "CPU TIME (ns)", "HOST"))
+
+
+def statsCommand(fleet: Fleet, args) -> int:
+    fleet.poll()
+    if args.interval > 0:
+        # CPU% needs two samples of the cumulative cpuTime.
+        time.sleep(args.interval)
+        fleet.poll()
+    printStats(fleet, sortedDomainInfo(fleet, args.domains), args.json)
+    return 0
+
+
+def watchCommand(fleet: Fleet, args) -> int:
+    tick = 0
+    try:
+        while args.count == 0 or tick < args.count:
+            fleet.poll()
+            allDomainInfo = sortedDomainInfo(fleet, args.domains)
+            if args.json:
+                # One JSON object per line so the stream can be piped.
+                timestamp = time.time()
+                for domainInfo in allDomainInfo:
+                    record = statsRecord(domainInfo, fleet.metrics)
+                    record["timestamp"] = timestamp
+                    print(json.dumps(record), flush=True)
+            else:
+                print(time.strftime("%H:%M:%S"))
+                printStats(fleet, allDomainInfo, False)
+                print(flush=True)
+            tick += 1
+            if args.count == 0 or tick < args.count:
+                time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def printBatchResults(results: list[BatchResult], asJson: bool) -> int:
+    if asJson:
+        print(json.dumps([result._asdict() for result in results], indent=2))
+    else:
+        for result in results:
+            print("{}: {}".format(result.name, result.outcome
+                                  if result.error is None
+                                  else "failed: " + result.error))
+    return 0 if all(result.error is None for result in results) else 1
+
+
+def batchCommand(fleet: Fleet, args) -> int:
+    fleet.poll()
+    domains = [domainInfo.domain for domainInfo in fleet.find(args.domains)]
+    if args.command == "boot":
+        results = runMany(startDomain, domains, args.concurrency)
+    elif args.command == "shutdown":
+        results = shutdownMany(domains, args.concurrency, args.timeout)
+    else:
+        results = runMany(deleteDomain, domains, args.concurrency)
+    return printBatchResults(results, args.json)
+
+
+def migrationSettings(args) -> MigrationSettings:
+    return MigrationSettings(args.to, not args.offline, args.p2p,
+                             args.compressed, args.auto_converge,
+                             not args.transient, args.bandwidth,
+                             args.max_downtime)
+
+
+def printMigrationProgress(progress: MigrationProgress) -> None:
+    if progress.total != 0:
+        print("{:3d}% {} MiB left".format(
+            progress.processed * 100 // progress.total,
+            progress.remaining // (1024 * 1024)), file=sys.stderr)
+
+
+def migrateCommand(fleet: Fleet, args) -> int:
+    fleet.poll()
+    domainInfo = fleet.find([args.domain])[0]
+    outcome = migrateDomain(domainInfo.domain, migrationSettings(args),
+                            onProgress=None if args.json
+                            else printMigrationProgress)
+    return printBatchResults([BatchResult(domainInfo.stats.uuid,
+                                          domainInfo.stats.name, outcome,
+                                          None)], args.json)
+
+
+def evacuateCommand(fleet: Fleet, args) -> int:
+    fleet.poll()
+    host = fleet.manager.hosts.get(args.host)
+    if host is None:
+        raise CliError("{} is not one of --uri".format(args.host))
+    domains = migratableDomains(host.lastSnapshots, host.lastDomains)
+    results = evacuateHost(list(domains.values()), migrationSettings(args),
+                           args.concurrency)
+    return printBatchResults(results, args.json)
+
+
+def disksCommand(fleet: Fleet, args) -> int:
+    fleet.poll()
+    domainInfo = fleet.find([args.domain])[0]
+    allDiskInfo = domainInfo.allDiskInfo()
+    if args.json:
+        print(json.dumps([{"target": diskInfo.name, "bus": diskInfo.bus,
+                           "source": diskInfo.source}
+                          for diskInfo in allDiskInfo], indent=2))
+        return 0
+    printTable([(diskInfo.name, diskInfo.bus or "-", diskInfo.source or "-")
+                for diskInfo in allDiskInfo], ("TARGET", "BUS", "SOURCE"))
+    return 0
+
+
+def attachCommand(fleet: Fleet, args) -> int:
+    fleet.poll()
+    domainInfo = fleet.find([args.domain])[0]
+    attachNewDisk(domainInfo.domain, DiskSettings(
+        args.target, args.source, args.readonly, args.bus, args.format,
+        args.cache, args.io, args.discard, args.iothread, args.queues))
+    return 0
+
+
+def iotuneCommand(fleet: Fleet, args) -> int:
+    fleet.poll()
+    domainInfo = fleet.find([args.domain])[0]
+    limits = {name: getattr(args, name) for name in IOTUNE_FIELDS
+              if getattr(args, name) is not None}
+    if len(limits) != 0:
+        current = getBlockIoTune(domainInfo.domain, args.target)
+        setBlockIoTune(domainInfo.domain, args.target, {**current, **limits})
+    limits = getBlockIoTune(domainInfo.domain, args.target)
+    if args.json:
+        print(json.dumps(limits, indent=2))
+    else:
+        printTable(list(limits.items()), ("LIMIT", "VALUE"))
+    return 0
+
+
+def balloonCommand(fleet: Fleet, args) -> int:
+    fleet.poll()
+    domainInfo = fleet.find([args.domain])[0]
+    if args.size is not None:
+        setBalloon(domainInfo.domain, args.size * 1024)
+    memoryStats = memoryStatsFromDict(domainInfo.domain.memoryStats())
+    if memoryStats is None:
+        raise CliError("{} reports no balloon statistics".format(
+            domainInfo.stats.name))
+    record = {**memoryStats._asdict(), "pressure": memoryStats.pressure}
+    if args.json:
+        print(json.dumps(record, indent=2))
+    else:
+        printTable([(name, "-" if value is None else value)
+                    for name, value in record.items()], ("STAT", "VALUE"))
+    return 0
+
+
+def peekCommand(fleet: Fleet, args) -> int:
+    fleet.poll()
+    domainInfo = fleet.find([args.domain])[0]
+    memory = GuestMemory(domainInfo.domain, args.mode)
+    if args.find is not None:
+        try:
+            pattern = parsePattern(args.find, args.hex)
+        except ValueError as err:
+            raise CliError("bad hex pattern: {}".format(err))
+        if len(pattern) == 0:
+            raise CliError("empty pattern")
+        matches = findAll(memory, args.address, args.size, pattern,
+                          args.limit)
+        if args.json:
+            print(json.dumps(matches))
+        else:
+            for address in matches:
+                print("{:#x}".format(address))
+        return 0
+    data = memory.read(args.address, args.size)
+    if args.json:
+        print(json.dumps({"address": args.address, "data": data.hex()}))
+    else:
+        for line in hexdumpLines(data, args.address):
+            print(line)
+    return 0
+
+
+def detachCommand(fleet: Fleet, args) -> int:
+    fleet.poll()
+    domainInfo = fleet.find([args.domain])[0]
+    description = domainInfo.description()
+    for diskInfo in description.allDiskInfo():
+        if diskInfo.name == args.target:
+            detachDisk(domainInfo.domain, diskInfo)
+            return 0
+    raise CliError("{} has no disk {}".format(domainInfo.stats.name,
+                                              args.target))
+
+
+def buildParser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--uri", default=DEFAULT_URI,
+                        help="connection URIs, comma separated")
+    common.add_argument("--json", action="store_true",
+                        help="print JSON instead of text")
+
+    parser = argparse.ArgumentParser(
+        prog="virtctl", description="Manage libvirt domains without the GUI.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    listParser = commands.add_parser("list", parents=[common],
+                                     help="list domains")
+    listParser.add_argument("--active", action="store_true",
+                            help="skip shut off domains")
+    listParser.set_defaults(handler=listCommand)
+
+    statsParser = commands.add_parser("stats", parents=[common],
+                                      help="print domain statistics")
+    statsParser.add_argument("domains", nargs="*")
+    statsParser.add_argument("--interval", type=float, default=1.0,
+                             help="seconds between the two CPU samples, "
+                                  "0 skips CPU%%")
+    statsParser.set_defaults(handler=statsCommand)
+
+    watchParser = commands.add_parser("watch", parents=[common],
+                                      help="stream domain statistics")
+    watchParser.add_argument("domains", nargs="*")
+    watchParser.add_argument("--interval", type=float, default=1.0)
+    watchParser.add_argument("--count", type=int, default=0,
+                             help="stop after this many snapshots")
+    watchParser.set_defaults(handler=watchCommand)
+
+    for command, summary in (("boot", "start domains"),
+                             ("shutdown", "shut domains down, destroying "
+                                          "them after --timeout"),
+                             ("destroy", "force off and undefine domains")):
+        batchParser = commands.add_parser(command, parents=[common],
+                                          help=summary)
+        batchParser.add_argument("domains", nargs="+")
+        batchParser.add_argument("--concurrency", type=int,
+                                 default=DEFAULT_CONCURRENCY)
+        if command == "shutdown":
+            batchParser.add_argument("--timeout", type=float, default=120.0)
+        batchParser.set_defaults(handler=batchCommand)
+
+    disksParser = commands.add_parser("disks", parents=[common],
+                                      help="list a domain's disks")
+    disksParser.add_argument("domain")
+    disksParser.set_defaults(handler=disksCommand)
+
+    attachParser = commands.add_parser("attach", parents=[common],
+                                       help="attach a disk image")
+    attachParser.add_argument("domain")
+    attachParser.add_argument("--source", required=True,
+                              help="path of the disk image")
+    attachParser.add_argument("--target", required=True,
+                              help="target device, e.g. vdb")
+    attachParser.add_argument("--readonly", action="store_true")
+    attachParser.add_argument("--bus", default="virtio")
+    attachParser.add_argument("--format", choices=IMAGE_FORMATS,
+                              help="detected from the image when omitted")
+    attachParser.add_argument("--cache", choices=CACHE_MODES)
+    attachParser.add_argument("--io", choices=IO_MODES)
+    attachParser.add_argument("--discard", choices=DISCARD_MODES)
+    attachParser.add_argument("--iothread", type=int)
+    attachParser.add_argument("--queues", type=int,
+                              help="virtio-blk queue count")
+    attachParser.set_defaults(handler=attachCommand)
+
+    iotuneParser = commands.add_parser(
+        "iotune", parents=[common],
+        help="show or change a disk's live I/O limits")
+    iotuneParser.add_argument("domain")
+    iotuneParser.add_argument("target", help="target device, e.g. vdb")
+    for name in IOTUNE_FIELDS:
+        iotuneParser.add_argument("--" + name.replace("_", "-"), dest=name,
+                                  type=int, help="0 removes the limit")
+    iotuneParser.set_defaults(handler=iotuneCommand)
+
+    detachParser = commands.add_parser("detach", parents=[common],
+                                       help="detach a disk")
+    detachParser.add_argument("domain")
+    detachParser.add_argument("target", help="target device, e.g. vdb")
+    detachParser.set_defaults(handler=detachCommand)
+
+    balloonParser = commands.add_parser(
+        "balloon", parents=[common],
+        help="show guest memory statistics or resize the balloon")
+    balloonParser.add_argument("domain")
+    balloonParser.add_argument("--size", type=int,
+                               help="new balloon size in MiB, clamped to "
+                                    "the domain's maximum")
+    balloonParser.set_defaults(handler=balloonCommand)
+
+    peekParser = commands.add_parser(
+        "peek", parents=[common],
+        help="hexdump or search a running domain's memory")
+    peekParser.add_argument("domain")
+    peekParser.add_argument("address", type=lambda text: int(text, 0),
+                            help="start address, e.g. 0x100000")
+    peekParser.add_argument("size", type=lambda text: int(text, 0),
+                            help="bytes to dump or search")
+    peekParser.add_argument("--mode", choices=MEMORY_MODES,
+                            default="physical",
+                            help="virtual addresses go through the page "
+                                 "tables of the guest's first vCPU")
+    peekParser.add_argument("--find", metavar="PATTERN",
+                            help="print the addresses of PATTERN instead "
+                                 "of a hexdump")
+    peekParser.add_argument("--hex", action="store_true",
+                            help="PATTERN is hex, e.g. 7f454c46")
+    peekParser.add_argument("--limit", type=int, default=100,
+                            help="stop after this many matches")
+    peekParser.set_defaults(handler=peekCommand)
+
+    migration = argparse.ArgumentParser(add_help=False)
+    migration.add_argument("--to", required=True, help="destination URI")
+    migration.add_argument("--offline", action="store_true",
+                           help="pause the guest instead of a live copy")
+    migration.add_argument("--p2p", action="store_true",
+                           help="let the source daemon connect directly")
+    migration.add_argument("--compressed", action="store_true")
+    migration.add_argument("--auto-converge", action="store_true")
+    migration.add_argument("--transient", action="store_true",
+                           help="keep the definition on the source")
+    migration.add_argument("--bandwidth", type=int, default=0,
+                           help="MiB/s, 0 for unlimited")
+    migration.add_argument("--max-downtime", type=int, default=0,
+                           help="ms, 0 for the hypervisor default")
+
+    migrateParser = commands.add_parser("migrate",
+                                        parents=[common, migration],
+                                        help="migrate a domain to another "
+                                             "host")
+    migrateParser.add_argument("domain")
+    migrateParser.set_defaults(handler=migrateCommand)
+
+    evacuateParser = commands.add_parser("evacuate",
+                                         parents=[common, migration],
+                                         help="migrate every running domain "
+                                              "off a host")
+    evacuateParser.add_argument("host", help="one of the --uri hosts")
+    evacuateParser.add_argument("--concurrency", type=int,
+                                default=MIGRATION_CONCURRENCY)
+    evacuateParser.set_defaults(handler=evacuateCommand)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = buildParser().parse_args(argv)
+    fleet = Fleet(args.uri)
+    try:
+        return args.handler(fleet, args)
+    except (CliError, ImageFormatError, libvirt.libvirtError) as err:
+        message = err.get_error_message() \
+            if isinstance(err, libvirt.libvirtError) else str(err)
+        print("virtctl: {}".format(message), file=sys.stderr)
+        return 1
+    finally:
+        fleet.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())